@@ -1,8 +1,24 @@
 # app/celery_app.py
 from celery import Celery
+from app.core.config import settings
 
 celery = Celery(
     'tasks',
-    # broker='redis://localhost:6379/0',
-    # backend='redis://localhost:6379/0'
+    broker=settings.CELERY_BROKER_URL,
+    backend=settings.CELERY_RESULT_BACKEND,
+    include=['app.tasks'],
+)
+
+celery.conf.update(
+    task_serializer='json',
+    result_serializer='json',
+    accept_content=['json'],
+    task_track_started=True,
+    result_expires=settings.CELERY_RESULT_EXPIRES,
+    # Extraction is long and CPU-bound: take one job at a time per process
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+    # Local testing without a broker: run tasks inline and keep their results
+    task_always_eager=settings.CELERY_TASK_ALWAYS_EAGER,
+    task_store_eager_result=True,
 )
@@ -1,10 +1,138 @@
+import os
 from pydantic import BaseModel
 
 class Settings(BaseModel):
     APP_NAME: str = "FastAPI File Upload"
     DEBUG: bool = True
     TEMP_DIR: str = "temp_files/"
-    REDIS_URL: str = "redis://localhost"
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads/")
+    UPLOAD_CHUNK_BYTES: int = int(os.getenv("UPLOAD_CHUNK_BYTES", 1024 * 1024))
+    UPLOAD_MAX_FILE_BYTES: int = int(os.getenv("UPLOAD_MAX_FILE_BYTES", 25 * 1024 * 1024))
+    UPLOAD_MAX_REQUEST_BYTES: int = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", 100 * 1024 * 1024))
+    REDIS_URL: str = os.getenv("REDIS_URL", f"redis://{os.getenv('REDIS_HOST', 'localhost')}:6379")
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+    REDIS_HEALTH_CHECK_INTERVAL: int = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+    # In-process cache in front of Redis; 0 entries disables it
+    REDIS_L1_MAX_ENTRIES: int = int(os.getenv("REDIS_L1_MAX_ENTRIES", "0"))
+    REDIS_L1_TTL: float = float(os.getenv("REDIS_L1_TTL", "10"))
+    REDIS_L1_PREFIXES: str = os.getenv("REDIS_L1_PREFIXES", "system:,summary:")
+
+    # API worker processes (gunicorn reads WEB_CONCURRENCY too)
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    # Workers share their metrics through Redis this often, so /metrics covers all of them; 0 disables
+    METRICS_SHARE_INTERVAL: float = float(os.getenv("METRICS_SHARE_INTERVAL", "15"))
+
+    # Diagnostics: event-loop lag, blocking-call detection and on-demand profiling
+    DIAGNOSTICS_ENABLED: bool = os.getenv("DIAGNOSTICS_ENABLED", "true").lower() == "true"
+    DIAGNOSTICS_ADMIN_TOKEN: str = os.getenv("DIAGNOSTICS_ADMIN_TOKEN", "")  # empty disables /debug endpoints
+    LOOP_LAG_INTERVAL: float = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+    LOOP_BLOCK_THRESHOLD: float = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.25"))
+    PROFILE_MAX_SECONDS: float = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+    # Socket.IO
+    SOCKETIO_MESSAGE_QUEUE: str = os.getenv("SOCKETIO_MESSAGE_QUEUE", "")  # e.g. "redis://redis:6379/3"; required for >1 worker
+    SOCKETIO_CHANNEL: str = os.getenv("SOCKETIO_CHANNEL", "socketio")
+    SOCKETIO_TRANSPORTS: str = os.getenv("SOCKETIO_TRANSPORTS", "polling,websocket")
+
+    # Extraction process pool
+    EXTRACTION_WORKERS: int = int(
+        os.getenv("EXTRACTION_WORKERS", max(1, (os.cpu_count() or 1) // max(1, int(os.getenv("WEB_CONCURRENCY", "1")))))
+    )
+    EXTRACTION_QUEUE_SIZE: int = int(os.getenv("EXTRACTION_QUEUE_SIZE", "32"))
+    EXTRACTION_TIMEOUT: float = float(os.getenv("EXTRACTION_TIMEOUT", "120"))
+    PDF_MIN_PAGES_PER_JOB: int = int(os.getenv("PDF_MIN_PAGES_PER_JOB", "4"))
+
+    # OCR
+    OCR_LANG: str = os.getenv("OCR_LANG", "eng")
+    OCR_TARGET_DPI: int = int(os.getenv("OCR_TARGET_DPI", "300"))
+    OCR_MIN_SIDE: int = int(os.getenv("OCR_MIN_SIDE", "1000"))
+    OCR_MAX_SIDE: int = int(os.getenv("OCR_MAX_SIDE", "3500"))
+    OCR_TILE_HEIGHT: int = int(os.getenv("OCR_TILE_HEIGHT", "1600"))
+
+    # Image thumbnails, near-duplicate reuse and OCR skipping
+    IMAGE_THUMBNAIL_SIZE: int = int(os.getenv("IMAGE_THUMBNAIL_SIZE", "256"))
+    IMAGE_MIN_TEXT_SCORE: float = float(os.getenv("IMAGE_MIN_TEXT_SCORE", "0.01"))  # 0 always runs OCR
+    IMAGE_DUPLICATE_DISTANCE: int = int(os.getenv("IMAGE_DUPLICATE_DISTANCE", "2"))  # bits of 256; -1 disables reuse
+    IMAGE_DUPLICATE_PIXEL_TOLERANCE: int = int(os.getenv("IMAGE_DUPLICATE_PIXEL_TOLERANCE", "24"))  # gray levels
+    IMAGE_INDEX_MAX_ENTRIES: int = int(os.getenv("IMAGE_INDEX_MAX_ENTRIES", "10000"))
+
+    # Extraction result cache
+    EXTRACTION_CACHE_MAX_BYTES: int = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    EXTRACTION_CACHE_TTL: int = int(os.getenv("EXTRACTION_CACHE_TTL", 7 * 24 * 3600))
+
+    # Ollama
+    OLLAMA_URL: str = os.getenv("OLLAMA_URL", "http://ollama:11434")
+    OLLAMA_MODEL: str = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
+    OLLAMA_MAX_CONCURRENCY: int = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2"))
+    OLLAMA_MAX_QUEUE: int = int(os.getenv("OLLAMA_MAX_QUEUE", "32"))
+    OLLAMA_TIMEOUT: float = float(os.getenv("OLLAMA_TIMEOUT", "300"))
+    OLLAMA_RETRIES: int = int(os.getenv("OLLAMA_RETRIES", "2"))
+    OLLAMA_POOL_SIZE: int = int(os.getenv("OLLAMA_POOL_SIZE", "10"))
+    OLLAMA_KEEP_ALIVE: str = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # "-1" keeps the model loaded forever
+
+    # Ollama backends and model routing
+    OLLAMA_BACKENDS: str = os.getenv("OLLAMA_BACKENDS", "")  # e.g. "http://a:11434=llama3.1:8b|phi3:mini@4,http://b:11434@2"
+    OLLAMA_SMALL_MODEL: str = os.getenv("OLLAMA_SMALL_MODEL", "")
+    OLLAMA_SMALL_MAX_CHARS: int = int(os.getenv("OLLAMA_SMALL_MAX_CHARS", "200"))
+    OLLAMA_DOCUMENT_MODEL: str = os.getenv("OLLAMA_DOCUMENT_MODEL", "")
+    OLLAMA_EJECT_AFTER: int = int(os.getenv("OLLAMA_EJECT_AFTER", "2"))
+    OLLAMA_EJECT_SECONDS: float = float(os.getenv("OLLAMA_EJECT_SECONDS", "30"))
+    OLLAMA_HEALTH_INTERVAL: float = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10"))
+
+    # Startup warm-up
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_MODELS: str = os.getenv("WARMUP_MODELS", "")  # defaults to OLLAMA_MODEL
+    WARMUP_EXTRACTORS: str = os.getenv("WARMUP_EXTRACTORS", "")  # e.g. "pdf,docx,image"
+    WARMUP_TIMEOUT: float = float(os.getenv("WARMUP_TIMEOUT", "600"))
+
+    # Conversation history
+    HISTORY_MAX_MESSAGES: int = int(os.getenv("HISTORY_MAX_MESSAGES", "200"))
+    HISTORY_CONTEXT_MESSAGES: int = int(os.getenv("HISTORY_CONTEXT_MESSAGES", "50"))
+    HISTORY_TTL: int = int(os.getenv("HISTORY_TTL", "600"))
+    CHAT_COALESCE_WINDOW: float = float(os.getenv("CHAT_COALESCE_WINDOW", "0.2"))
+
+    # Prompt context window
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4096"))
+    CONTEXT_MODEL_BUDGETS: str = os.getenv("CONTEXT_MODEL_BUDGETS", "")  # e.g. "llama3.1:8b=8192,phi3:mini=4096"
+    CONTEXT_RESPONSE_RESERVE: int = int(os.getenv("CONTEXT_RESPONSE_RESERVE", "512"))
+    CONTEXT_SUMMARY_TOKENS: int = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "256"))
+
+    # LLM response cache
+    RESPONSE_CACHE_TTL: int = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # 0 disables the cache
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+    RESPONSE_CACHE_HISTORY_MESSAGES: int = int(os.getenv("RESPONSE_CACHE_HISTORY_MESSAGES", "4"))
+
+    # Attached document text, stored once per file_id and referenced from history
+    DOCUMENT_STORE_CODEC: str = os.getenv("DOCUMENT_STORE_CODEC", "msgpack+zstd")  # json, msgpack, +zlib or +zstd
+    DOCUMENT_STORE_TTL: int = int(os.getenv("DOCUMENT_STORE_TTL", 7 * 24 * 3600))
+
+    # Document summaries and tags (map-reduce over chunks, cached per file_id)
+    DOCUMENT_SUMMARY_ENABLED: bool = os.getenv("DOCUMENT_SUMMARY_ENABLED", "true").lower() == "true"
+    DOCUMENT_SUMMARY_MODEL: str = os.getenv("DOCUMENT_SUMMARY_MODEL", "")  # defaults to OLLAMA_MODEL
+    DOCUMENT_SUMMARY_CHUNK_WORDS: int = int(os.getenv("DOCUMENT_SUMMARY_CHUNK_WORDS", "1500"))
+    DOCUMENT_SUMMARY_TOKENS: int = int(os.getenv("DOCUMENT_SUMMARY_TOKENS", "256"))
+    DOCUMENT_SUMMARY_MAX_TAGS: int = int(os.getenv("DOCUMENT_SUMMARY_MAX_TAGS", "8"))
+    DOCUMENT_SUMMARY_CONCURRENCY: int = int(os.getenv("DOCUMENT_SUMMARY_CONCURRENCY", "2"))
+    DOCUMENT_SUMMARY_TTL: int = int(os.getenv("DOCUMENT_SUMMARY_TTL", 7 * 24 * 3600))
+
+    # Attachment chunk index
+    INDEX_DIR: str = os.getenv("INDEX_DIR", "index/")
+    INDEX_CHUNK_WORDS: int = int(os.getenv("INDEX_CHUNK_WORDS", "200"))
+    INDEX_CHUNK_OVERLAP: int = int(os.getenv("INDEX_CHUNK_OVERLAP", "40"))
+    INDEX_TOP_K: int = int(os.getenv("INDEX_TOP_K", "5"))
+    INDEX_EMBED_MODEL: str = os.getenv("INDEX_EMBED_MODEL", "")  # e.g. "nomic-embed-text"; empty uses BM25 only
+    INDEX_MAX_LOADED: int = int(os.getenv("INDEX_MAX_LOADED", "64"))
+
+    # Background ingestion (Celery)
+    CELERY_BROKER_URL: str = os.getenv(
+        "CELERY_BROKER_URL", f"redis://{os.getenv('REDIS_HOST', 'localhost')}:6379/1"
+    )
+    CELERY_RESULT_BACKEND: str = os.getenv(
+        "CELERY_RESULT_BACKEND", f"redis://{os.getenv('REDIS_HOST', 'localhost')}:6379/2"
+    )
+    CELERY_TASK_ALWAYS_EAGER: bool = os.getenv("CELERY_TASK_ALWAYS_EAGER", "false").lower() == "true"
+    CELERY_RESULT_EXPIRES: int = int(os.getenv("CELERY_RESULT_EXPIRES", 24 * 3600))
 
     class Config:
         env_file = ".env"
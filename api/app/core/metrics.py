@@ -0,0 +1,307 @@
+# app/core/metrics.py
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import math
+import time
+
+# Default latency buckets in seconds, from 1 ms to 2 minutes.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _add_labels(sample: str, labels: str) -> str:
+    """Append `labels` (already formatted pairs) to the label set of one sample line."""
+    series, value = sample.rsplit(" ", 1)
+    if series.endswith("}"):
+        return f"{series[:-1]},{labels}}} {value}"
+    return f"{series}{{{labels}}} {value}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base class: a named family of time series keyed by label values."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        if not self.labelnames and not self._values:
+            return [f"{self.name} 0"]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Metric):
+    """Value that goes up and down, or is read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function = function
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def value(self, *labels: str) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        if not self.labelnames and not self._values:
+            return [f"{self.name} 0"]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values in cumulative buckets. An observation
+    is one bisect and two additions, cheap enough for every request.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        """Observe the duration of the `with` block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def total(self, *labels: str) -> float:
+        series = self._series.get(labels)
+        return series[1] if series else 0.0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            suffix = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), function=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self, labels: Optional[Dict[str, str]] = None) -> str:
+        """Render every metric, adding `labels` (e.g. the worker) to each sample."""
+        extra = ",".join(f'{name}="{_escape(value)}"' for name, value in (labels or {}).items())
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            samples = metric.samples()
+            if extra:
+                samples = [_add_labels(sample, extra) for sample in samples]
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+def merge_renders(texts: Iterable[str]) -> str:
+    """
+    Merge renders of the same registry from several workers into one
+    exposition: each metric's HELP and TYPE once, then every worker's
+    samples. The renders must carry distinct labels (e.g. `worker`).
+    """
+    families: Dict[str, Tuple[List[str], List[str]]] = {}
+    for text in texts:
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# "):
+                family = families.setdefault(line.split(" ", 3)[2], ([], []))
+                if line not in family[0]:
+                    family[0].append(line)
+            elif line and family is not None:
+                family[1].append(line)
+    lines = [line for header, samples in families.values() for line in header + samples]
+    return "\n".join(lines) + "\n"
+
+
+# Initialize the metrics registry
+registry = Registry()
+
+PROCESS_START_TIME_SECONDS = registry.gauge(
+    "process_start_time_seconds", "Start time of the process since the Unix epoch in seconds."
+)
+PROCESS_START_TIME_SECONDS.set(time.time())
+
+EXTRACTION_SECONDS = registry.histogram(
+    "extraction_seconds", "Time to extract text from a file, including pool queueing.", ["mime_type"]
+)
+EXTRACTION_FAILURES_TOTAL = registry.counter(
+    "extraction_failures_total", "Files whose text extraction failed.", ["mime_type"]
+)
+OCR_SECONDS = registry.histogram(
+    "ocr_seconds", "Time to OCR one image, all frames and tiles included, pool queueing included."
+)
+IMAGE_OCR_SKIPPED_TOTAL = registry.counter(
+    "image_ocr_skipped_total", "Images not OCR'd, by reason (duplicate of an OCR'd image, or no_text).", ["reason"]
+)
+CACHE_REQUESTS_TOTAL = registry.counter(
+    "cache_requests_total", "Cache lookups by cache and result (l1, l2 or miss).", ["cache", "result"]
+)
+REDIS_OPERATION_SECONDS = registry.histogram(
+    "redis_operation_seconds", "Latency of Redis get/set calls.", ["operation"]
+)
+REDIS_ERRORS_TOTAL = registry.counter("redis_errors_total", "Failed Redis calls.", ["operation"])
+REDIS_VALUE_BYTES_TOTAL = registry.counter(
+    "redis_value_bytes_total", "Encoded bytes of values written and read by get/set calls.", ["operation"]
+)
+DOCUMENT_SUMMARY_SECONDS = registry.histogram(
+    "document_summary_seconds", "Time to summarize and tag a document, all map and reduce calls included."
+)
+DOCUMENT_SUMMARY_CALLS_TOTAL = registry.counter(
+    "document_summary_calls_total", "Model calls made to summarize documents, by stage (map, reduce or final).", ["stage"]
+)
+OLLAMA_QUEUE_WAIT_SECONDS = registry.histogram(
+    "ollama_queue_wait_seconds", "Time requests waited for an Ollama generation slot."
+)
+OLLAMA_TIME_TO_FIRST_TOKEN_SECONDS = registry.histogram(
+    "ollama_time_to_first_token_seconds", "Time from sending a streamed chat request to its first token."
+)
+OLLAMA_GENERATION_SECONDS = registry.histogram(
+    "ollama_generation_seconds", "Total time of a chat request to Ollama.", ["mode"]
+)
+OLLAMA_TOKENS_PER_SECOND = registry.histogram(
+    "ollama_tokens_per_second",
+    "Generation speed reported by Ollama (eval_count / eval_duration).",
+    buckets=(1, 2, 5, 10, 15, 20, 30, 40, 60, 80, 120, 200),
+)
+OLLAMA_FAILURES_TOTAL = registry.counter(
+    "ollama_failures_total", "Chat requests that failed, by reason.", ["reason"]
+)
+OLLAMA_BACKEND_ERRORS_TOTAL = registry.counter(
+    "ollama_backend_errors_total", "Failed requests per Ollama backend, including health checks.", ["backend"]
+)
+OLLAMA_BACKEND_HEALTHY = registry.gauge(
+    "ollama_backend_healthy", "1 while an Ollama backend is in rotation, 0 while ejected.", ["backend"]
+)
+EVENT_LOOP_LAG_SECONDS = registry.histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a timer scheduled for a fixed interval."
+)
+EVENT_LOOP_STALLS_TOTAL = registry.counter(
+    "event_loop_stalls_total", "Times the event loop was blocked longer than LOOP_BLOCK_THRESHOLD."
+)
+SOCKETIO_CONNECTED_CLIENTS = registry.gauge(
+    "socketio_connected_clients", "Socket.IO clients connected to this process."
+)
+CHAT_TURNS_TOTAL = registry.counter(
+    "chat_turns_total",
+    "Chat turns by outcome (completed, failed, cancelled, dropped before starting, or coalesced into another).",
+    ["outcome"],
+)
@@ -0,0 +1,57 @@
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+
+class RequestTooLarge(HTTPException):
+    """Raised from `receive` once a request body passes the size limit."""
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Reject requests to `path_prefix` whose body exceeds `max_bytes` with 413.
+    A declared Content-Length is checked before the body is read; bodies
+    without one (chunked uploads) are counted as they arrive, and reading
+    stops at the first chunk past the limit.
+    """
+
+    def __init__(self, app, max_bytes: int, path_prefix: str):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request exceeds the upload limit of {self.max_bytes} bytes."
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # An HTTPException, so FastAPI's body parsing lets it through as a 413
+                    raise RequestTooLarge(status_code=413, detail=detail)
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except RequestTooLarge:
+            if response_started:
+                raise
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
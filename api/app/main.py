@@ -1,13 +1,21 @@
 from fastapi import FastAPI
 from app.core.config import settings
 from app.core.logger import logger
+from app.core.middleware import RequestSizeLimitMiddleware
 from app.sockets import sio
 from starlette.middleware import Middleware
 from starlette.middleware.cors import CORSMiddleware
 from socketio import ASGIApp
 from fastapi.staticfiles import StaticFiles
 import app.sockets.chat_socket
-from app.routers import file_upload
+from app.routers import diagnostics, file_upload, health, metrics
+from app.services.diagnostics import loop_monitor
+from app.services.extraction_executor import extraction_executor
+from app.services.ingestion import ingestion_relay
+from app.services.llm_router import llm_router
+from app.services.metrics_aggregator import metrics_aggregator
+from app.services.redis_service import redis_service
+from app.services.warmup import warmup
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -17,11 +25,15 @@ app = FastAPI(
     debug=settings.DEBUG,
     middleware=[
         Middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"]),
+        Middleware(RequestSizeLimitMiddleware, max_bytes=settings.UPLOAD_MAX_REQUEST_BYTES, path_prefix="/api/v1/uploadfile"),
     ]
 )
 
 # Include routers
 app.include_router(file_upload.router, prefix="/api/v1", tags=["File Upload"])
+app.include_router(metrics.router, tags=["Metrics"])
+app.include_router(health.router, tags=["Health"])
+app.include_router(diagnostics.router, tags=["Diagnostics"])
 sio_app = ASGIApp(sio)
 # app.mount("/static", StaticFiles(directory="static"), name="static")
 app.mount("/", sio_app)
@@ -30,12 +42,27 @@ app.mount("/", sio_app)
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting FastAPI application...")
+    if settings.DIAGNOSTICS_ENABLED:
+        loop_monitor.start()
+    await llm_router.start()
+    await ingestion_relay.start()
+    await redis_service.start()
+    await metrics_aggregator.start()
+    # Preload models and prime pools in the background; /ready reports when done
+    warmup.start()
     # Perform any startup tasks here (e.g., connecting to databases)
 
 # Application shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down FastAPI application...")
+    await warmup.stop()
+    extraction_executor.shutdown()
+    await llm_router.close()
+    await ingestion_relay.stop()
+    await metrics_aggregator.stop()
+    await redis_service.disconnect()
+    await loop_monitor.stop()
     # Perform any cleanup tasks here (e.g., closing database connections)
 
 # Root endpoint
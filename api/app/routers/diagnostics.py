@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import hmac
+from app.core.config import settings
+from app.services.diagnostics import ProfilerBusy, loop_monitor, profiler
+
+router = APIRouter()
+
+
+def check_admin_token(token: Optional[str]):
+    """
+    The debug endpoints exist only when `DIAGNOSTICS_ADMIN_TOKEN` is set,
+    and require it in the `X-Admin-Token` header.
+    """
+    if not settings.DIAGNOSTICS_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not hmac.compare_digest(token, settings.DIAGNOSTICS_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+@router.get("/debug/loop")
+def loop_status(x_admin_token: Optional[str] = Header(None)):
+    """
+    Event-loop lag of this worker and the stack of its last blocking stall.
+    """
+    check_admin_token(x_admin_token)
+    return {**loop_monitor.stats, "last_stall": loop_monitor.last_stall}
+
+
+@router.get("/debug/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10, gt=0),
+    interval: float = Query(0.005, ge=0.001, le=1),
+    all_threads: bool = False,
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Sample the stacks of the worker serving this request for `seconds`
+    (capped at `PROFILE_MAX_SECONDS`) and return them collapsed, one
+    `frame;frame;... count` line per stack, ready for flamegraph.pl or
+    speedscope. Samples the event-loop thread unless `all_threads`.
+    """
+    check_admin_token(x_admin_token)
+    try:
+        stacks = await profiler.profile(seconds, interval, all_threads)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(stacks)
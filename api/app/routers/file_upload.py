@@ -1,28 +1,134 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from typing import List
-from app.services.file_processing import process_files
+from fastapi import APIRouter, File, Query, Request, UploadFile, HTTPException
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from typing import AsyncIterator, Dict, List, Optional
+import json
+import os
+import time
+from app.core.config import settings
+from app.services.extraction_executor import ExtractionQueueFull
+from app.services.file_processing import iter_processed_files, process_files
+from app.services.ingestion import get_job_status, submit_ingestion
+from app.services.upload_store import UploadTooLarge, upload_store
 
 router = APIRouter()
 
 @router.post("/uploadfile/")
-async def upload_files(files: List[UploadFile] = File(...)):
+async def upload_files(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    mode: str = Query("sync", pattern="^(sync|async|stream)$"),
+    sid: Optional[str] = Query(None, description="Socket.IO sid on /chat-socket to notify in async mode"),
+):
     """
     Upload one or multiple files and process them.
+    Files are spooled to disk in chunks; each result carries a `file_id`
+    and a `url` to fetch the stored file.
+
+    With `mode=async` the files are queued for background extraction and
+    job IDs are returned immediately. Progress and completion events are
+    sent to `sid`, and `/jobs/{job_id}` reports each job's state.
+
+    With `mode=stream` each file's result is sent as one NDJSON line as
+    soon as it is ready, in completion order and tagged with its `index`,
+    followed by a summary line. Clients sending
+    `Accept: text/event-stream` get the same as server-sent events.
     """
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded.")
 
-    # Prepare files for processing
-    decoded_files = []
+    # Spool files to disk, enforcing the per-file and per-request limits
+    stored_files = []
+    remaining = settings.UPLOAD_MAX_REQUEST_BYTES
     for file in files:
         try:
-            data = await file.read()
-            decoded_files.append({"mime_type": file.content_type, "data": data, "file_name": file.filename})
+            stored = await upload_store.save(file, max_bytes=min(settings.UPLOAD_MAX_FILE_BYTES, remaining))
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
         except Exception as e:
             raise HTTPException(
                 status_code=500, detail=f"Error reading file {file.filename}: {e}"
             )
+        finally:
+            await file.close()
+        remaining -= stored["size"]
+        stored_files.append(stored)
+
+    if mode == "async":
+        jobs = []
+        for stored in stored_files:
+            job_id = await submit_ingestion(stored, sid)
+            jobs.append({
+                "job_id": job_id,
+                "file_name": stored["file_name"],
+                "file_id": stored["file_id"],
+                "status_url": f"/api/v1/jobs/{job_id}",
+            })
+        return JSONResponse({"jobs": jobs}, status_code=202)
 
-    # Process files asynchronously
-    results = await process_files(decoded_files)
+    if mode == "stream":
+        sse = "text/event-stream" in request.headers.get("accept", "")
+        return StreamingResponse(
+            stream_results(stored_files, sse),
+            media_type="text/event-stream" if sse else "application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    # Process files in the extraction pool; reject rather than queue when saturated
+    try:
+        results = await process_files(stored_files, block=False)
+    except ExtractionQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     return {"files": results}
+
+
+async def stream_results(stored_files: List[Dict], sse: bool) -> AsyncIterator[str]:
+    """
+    Format each file result as it completes, then a summary, as NDJSON
+    lines or server-sent events.
+    """
+    def encode(event: str, payload: Dict) -> str:
+        data = json.dumps(payload)
+        return f"event: {event}\ndata: {data}\n\n" if sse else f"{data}\n"
+
+    started = time.perf_counter()
+    failed = 0
+    async for result in iter_processed_files(stored_files):
+        failed += result["status"] == "Failed"
+        yield encode("file", result)
+    yield encode("summary", {
+        "type": "summary",
+        "files": len(stored_files),
+        "processed": len(stored_files) - failed,
+        "failed": failed,
+        "seconds": round(time.perf_counter() - started, 3),
+    })
+
+
+@router.get("/files/{file_id}")
+async def get_file(file_id: str):
+    """
+    Fetch a previously uploaded file by its `file_id`.
+    """
+    path = upload_store.path_for(file_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="File not found.")
+    return FileResponse(path)
+
+
+@router.get("/files/{file_id}/thumbnail")
+async def get_thumbnail(file_id: str):
+    """
+    Fetch the JPEG thumbnail of an uploaded image.
+    """
+    path = upload_store.thumbnail_path(file_id)
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Thumbnail not found.")
+    return FileResponse(path, media_type="image/jpeg")
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Report the state of a background ingestion job.
+    """
+    return await get_job_status(job_id)
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.services.warmup import warmup
+
+router = APIRouter()
+
+@router.get("/health")
+def health():
+    """
+    Liveness: the process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+@router.get("/ready")
+def ready():
+    """
+    Readiness: 200 once the startup warm-up has finished, 503 before.
+    """
+    return JSONResponse(warmup.status(), status_code=200 if warmup.ready else 503)
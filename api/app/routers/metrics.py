@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.services.metrics_aggregator import metrics_aggregator
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Expose the metrics of every API worker in the Prometheus text format,
+    each sample labelled with its `worker`.
+    """
+    return PlainTextResponse(await metrics_aggregator.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,130 @@
+# app/services/codecs.py
+
+from typing import Any, Union
+import json
+import logging
+import zlib
+
+try:  # Compact binary encoding
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:  # Faster, tighter compression than zlib
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class Codec:
+    """
+    Serializes values stored in Redis. Text codecs produce `str`; binary
+    codecs produce `bytes` and must be used with a client that does not
+    decode responses.
+    """
+
+    name = ""
+    binary = False
+
+    def dumps(self, value: Any) -> Union[str, bytes]:
+        raise NotImplementedError
+
+    def loads(self, raw: Union[str, bytes]) -> Any:
+        raise NotImplementedError
+
+
+class JSONCodec(Codec):
+    name = "json"
+
+    def dumps(self, value: Any) -> str:
+        return json.dumps(value)
+
+    def loads(self, raw: Union[str, bytes]) -> Any:
+        return json.loads(raw)
+
+
+class MsgpackCodec(Codec):
+    name = "msgpack"
+    binary = True
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError("msgpack is not installed.")
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, raw: bytes) -> Any:
+        return msgpack.unpackb(raw, raw=False)
+
+
+class CompressedCodec(Codec):
+    """
+    Compresses the output of another codec with zlib or zstd. Reads
+    recognize either format, so the compression can be changed without
+    invalidating stored values.
+    """
+
+    binary = True
+
+    def __init__(self, inner: Codec, compression: str = "zlib", level: int = 3):
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstandard is not installed.")
+        if compression not in ("zlib", "zstd"):
+            raise ValueError(f"Unknown compression '{compression}'.")
+        self.inner = inner
+        self.compression = compression
+        self.level = level
+        self.name = f"{inner.name}+{compression}"
+
+    def dumps(self, value: Any) -> bytes:
+        data = self.inner.dumps(value)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return zlib.compress(data, self.level)
+
+    def loads(self, raw: bytes) -> Any:
+        """Decompress and decode `raw`; corrupt or truncated data raises `ValueError`."""
+        if raw[:4] == ZSTD_MAGIC:
+            if zstandard is None:
+                raise ValueError("Value is zstd-compressed but zstandard is not installed.")
+            try:
+                data = zstandard.ZstdDecompressor().decompress(raw)
+            except zstandard.ZstdError as e:
+                raise ValueError(f"Invalid zstd data: {e}") from e
+        else:
+            try:
+                data = zlib.decompress(raw)
+            except zlib.error as e:
+                raise ValueError(f"Invalid zlib data: {e}") from e
+        return self.inner.loads(data if self.inner.binary else data.decode("utf-8"))
+
+
+def make_codec(spec: str) -> Codec:
+    """
+    Build a codec from `format[+compression]`, e.g. `json`, `msgpack`,
+    `json+zlib` or `msgpack+zstd`. Missing optional packages fall back to
+    JSON and zlib, with a warning.
+    """
+    name, _, compression = spec.strip().lower().partition("+")
+    inner: Codec = JSONCodec()
+    if name == "msgpack":
+        try:
+            inner = MsgpackCodec()
+        except ImportError as e:
+            logger.warning(f"Codec '{spec}': {e} Falling back to JSON.")
+    elif name not in ("", "json"):
+        raise ValueError(f"Unknown codec '{name}'.")
+    if not compression:
+        return inner
+    try:
+        return CompressedCodec(inner, compression)
+    except ImportError as e:
+        logger.warning(f"Codec '{spec}': {e} Falling back to zlib.")
+        return CompressedCodec(inner, "zlib")
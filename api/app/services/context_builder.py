@@ -0,0 +1,238 @@
+# app/services/context_builder.py
+
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import logging
+import math
+import re
+
+from app.core.config import settings
+from app.services.document_store import document_store
+from app.services.history_store import history_store
+from app.services.llm_router import llm_router
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the conversation below for use as context in later turns. "
+    "Keep names, numbers, decisions and open questions. Reply with the summary only."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate the number of model tokens in `text`.
+    Counts words and punctuation, with a floor of one token per four characters.
+    """
+    if not text:
+        return 0
+    return max(len(_TOKEN_PATTERN.findall(text)), math.ceil(len(text) / 4))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` so that its estimated token count fits `max_tokens`."""
+    if max_tokens <= 0:
+        return ""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    cut = int(len(text) * max_tokens / tokens)
+    while cut > 0 and estimate_tokens(text[:cut]) > max_tokens:
+        cut = int(cut * 0.9)
+    return text[:cut]
+
+
+def parse_model_budgets(spec: str) -> Dict[str, int]:
+    """Parse `model=tokens,model=tokens` into a dict."""
+    budgets = {}
+    for item in spec.split(","):
+        if "=" in item:
+            model, tokens = item.rsplit("=", 1)
+            budgets[model.strip()] = int(tokens)
+    return budgets
+
+
+class ContextBuilder:
+    """
+    Builds the message list sent to Ollama for a turn within a token budget.
+
+    The conversation's system prompt appears exactly once, at the top. The
+    most recent history messages are kept verbatim while they fit; older
+    messages are folded into a rolling summary that is cached in Redis and
+    extended incrementally, so each message is summarized only once. The
+    user message is truncated only if it alone would overflow the budget.
+
+    The summary is never computed on the request path: `build` uses the
+    cached one and remembers what it is missing, and `update_summary`
+    (called once the response cache has been checked) folds that in with a
+    background task, one per conversation at a time.
+    """
+
+    def __init__(
+        self,
+        default_budget: int,
+        model_budgets: Dict[str, int],
+        response_reserve: int,
+        summary_tokens: int,
+        ttl: int,
+    ):
+        self.default_budget = default_budget
+        self.model_budgets = model_budgets
+        self.response_reserve = response_reserve
+        self.summary_tokens = summary_tokens
+        self.ttl = ttl
+        self._pending: Dict[str, Tuple[List[Dict], int]] = {}
+        self._updating: Dict[str, asyncio.Task] = {}
+
+    def budget_for(self, model: str) -> int:
+        return self.model_budgets.get(model, self.default_budget)
+
+    async def build(
+        self,
+        conversation_id,
+        user_message: str,
+        prompt: str = "",
+        model: Optional[str] = None,
+        question: Optional[str] = None,
+        documents: Iterable[Dict] = (),
+    ) -> Tuple[List[Dict], Dict]:
+        """
+        Return the messages to send and the user message to store in history
+        (possibly truncated). When the message attaches `documents`, history
+        gets `question` with the document references instead of the
+        excerpts in `user_message`; stored references are expanded back into
+        excerpts when the message is replayed as history, or into the
+        documents' summaries when the excerpts do not fit.
+        """
+        model = model or settings.OLLAMA_MODEL
+        system_prompt = await self._system_prompt(conversation_id, prompt)
+        available = self.budget_for(model) - self.response_reserve - estimate_tokens(system_prompt)
+
+        user_message = truncate_to_tokens(user_message, available - self.summary_tokens)
+        user_entry = {"role": "user", "content": user_message}
+        available -= estimate_tokens(user_message)
+        documents = list(documents)
+        history_entry = user_entry
+        if documents:
+            content = question if question is not None else user_message
+            history_entry = {"role": "user", "content": content, "documents": documents}
+
+        history, offset = await history_store.get_recent_with_offset(
+            conversation_id, settings.HISTORY_CONTEXT_MESSAGES
+        )
+        history = [message for message in history if message.get("role") != "system"]
+
+        # Walk back from the newest message keeping whole messages that fit,
+        # leaving room for the summary of everything older.
+        recent_budget = available - self.summary_tokens
+        split = len(history)
+        while split > 0:
+            message = await document_store.expand(history[split - 1])
+            cost = estimate_tokens(message.get("content", ""))
+            if cost > recent_budget and history[split - 1].get("documents"):
+                # Too long with passages; fall back to the documents' summaries
+                message = await document_store.expand(history[split - 1], brief=True)
+                cost = estimate_tokens(message.get("content", ""))
+            if cost > recent_budget:
+                break
+            history[split - 1] = message
+            recent_budget -= cost
+            split -= 1
+
+        summary = await self._cached_summary(conversation_id, history[:split], offset)
+
+        system_parts = [system_prompt] if system_prompt else []
+        if summary:
+            system_parts.append(f"Summary of the earlier conversation:\n{summary}")
+        messages = []
+        if system_parts:
+            messages.append({"role": "system", "content": "\n\n".join(system_parts)})
+        messages.extend(history[split:])
+        messages.append(user_entry)
+        return messages, history_entry
+
+    async def _system_prompt(self, conversation_id, prompt: str) -> str:
+        """Remember the latest prompt for the conversation and return it."""
+        key = f"system:{conversation_id}"
+        if prompt:
+            try:
+                await redis_service.set(key, prompt, expire=self.ttl)
+            except Exception as e:
+                logger.warning(f"Failed to store system prompt for '{conversation_id}': {e}")
+            return prompt
+        stored = await redis_service.get(key)
+        return stored if isinstance(stored, str) else ""
+
+    async def _cached_summary(self, conversation_id, older: List[Dict], offset: int) -> str:
+        """
+        Return the cached summary. When it does not cover every message
+        before `offset + len(older)`, the missing ones are kept for
+        `update_summary`.
+        """
+        cached = await redis_service.get(f"summary:{conversation_id}") or {}
+        covered = cached.get("covered", 0)
+        pending = older[max(0, covered - offset):]
+        if offset + len(older) > covered and pending:
+            self._pending[conversation_id] = (pending, offset + len(older))
+        else:
+            self._pending.pop(conversation_id, None)
+        return cached.get("text", "")
+
+    def update_summary(self, conversation_id):
+        """
+        Fold the messages the last `build` found missing from the summary
+        into it, in the background. Skipped while an update for the
+        conversation is still running; the next turn picks up the rest.
+        """
+        pending = self._pending.pop(conversation_id, None)
+        if pending is None or conversation_id in self._updating:
+            return
+        task = asyncio.create_task(self._summarize(conversation_id, *pending))
+        self._updating[conversation_id] = task
+        task.add_done_callback(lambda _: self._updating.pop(conversation_id, None))
+
+    async def _summarize(self, conversation_id, pending: List[Dict], end: int):
+        """Extend the cached summary with `pending`, the messages before `end` it misses."""
+        key = f"summary:{conversation_id}"
+        cached = await redis_service.get(key) or {}
+        summary = cached.get("text", "")
+        covered = cached.get("covered", 0)
+        pending = pending[max(0, len(pending) - (end - covered)):]
+        if end <= covered or not pending:
+            return
+
+        transcript = "\n".join(f"{m.get('role')}: {m.get('content', '')}" for m in pending)
+        if summary:
+            transcript = f"Existing summary:\n{summary}\n\nNew messages:\n{transcript}"
+        try:
+            data = await llm_router.chat({
+                "model": settings.OLLAMA_MODEL,
+                "messages": [
+                    {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                    {"role": "user", "content": transcript},
+                ],
+                "options": {"num_predict": self.summary_tokens},
+            })
+            summary = data.get("message", {}).get("content", "").strip() or summary
+        except Exception as e:
+            logger.warning(f"Failed to summarize history for '{conversation_id}': {e}")
+            return
+
+        summary = truncate_to_tokens(summary, self.summary_tokens)
+        try:
+            await redis_service.set(key, {"text": summary, "covered": end}, expire=self.ttl)
+        except Exception as e:
+            logger.warning(f"Failed to cache summary for '{conversation_id}': {e}")
+
+
+# Initialize the context builder
+context_builder = ContextBuilder(
+    default_budget=settings.CONTEXT_TOKEN_BUDGET,
+    model_budgets=parse_model_budgets(settings.CONTEXT_MODEL_BUDGETS),
+    response_reserve=settings.CONTEXT_RESPONSE_RESERVE,
+    summary_tokens=settings.CONTEXT_SUMMARY_TOKENS,
+    ttl=settings.HISTORY_TTL,
+)
@@ -0,0 +1,132 @@
+# app/services/conversation_scheduler.py
+
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.core.metrics import CHAT_TURNS_TOTAL, registry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Turn:
+    """One chat turn: the client's message(s) for a conversation."""
+
+    sid: str
+    conversation_id: str
+    text: str
+    attachments: List[Dict] = field(default_factory=list)
+    prompt: str = ""
+    stream: bool = False
+    use_cache: bool = True
+    merged: int = 1
+
+    def merge(self, later: "Turn"):
+        """Fold a follow-up sent before this turn started into it."""
+        self.text = "\n\n".join(part for part in (self.text, later.text) if part)
+        self.attachments = self.attachments + later.attachments
+        self.prompt = later.prompt or self.prompt
+        self.stream = later.stream
+        self.use_cache = self.use_cache and later.use_cache
+        self.sid = later.sid
+        self.merged += later.merged
+
+
+@dataclass
+class _Conversation:
+    pending: Optional[Turn] = None
+    running: Optional[Turn] = None
+    task: Optional[asyncio.Task] = None
+    worker: Optional[asyncio.Task] = None
+
+
+class ConversationScheduler:
+    """
+    Runs chat turns one at a time per conversation, in the order they arrive.
+
+    A turn waits `coalesce_window` seconds before it starts; follow-ups that
+    arrive before it starts (including while the previous turn is still
+    generating) are merged into it, so a burst of messages gets one reply.
+    Turns can be cancelled per socket (on disconnect) or per conversation
+    (on a stop request); cancellation reaches the running Ollama request and
+    any extraction jobs that have not started yet.
+    """
+
+    def __init__(self, coalesce_window: float):
+        self.coalesce_window = coalesce_window
+        self._conversations: Dict[str, _Conversation] = {}
+
+    def submit(self, turn: Turn, run: Callable[[Turn], Awaitable[None]]):
+        """Queue `turn`; `run(turn)` is called when its conversation is free."""
+        conversation = self._conversations.setdefault(turn.conversation_id, _Conversation())
+        if conversation.pending is not None:
+            conversation.pending.merge(turn)
+            CHAT_TURNS_TOTAL.inc("coalesced")
+            logger.info(f"Merged follow-up into the pending turn of '{turn.conversation_id}'")
+        else:
+            conversation.pending = turn
+        if conversation.worker is None:
+            conversation.worker = asyncio.create_task(self._work(turn.conversation_id, conversation, run))
+
+    async def _work(self, conversation_id: str, conversation: _Conversation, run):
+        try:
+            while conversation.pending is not None:
+                if self.coalesce_window > 0:
+                    await asyncio.sleep(self.coalesce_window)
+                turn, conversation.pending = conversation.pending, None
+                if turn is None:
+                    continue
+                conversation.running = turn
+                conversation.task = asyncio.create_task(run(turn))
+                try:
+                    await conversation.task
+                    CHAT_TURNS_TOTAL.inc("completed")
+                except asyncio.CancelledError:
+                    if not conversation.task.cancelled():
+                        raise  # the worker itself is being cancelled
+                    CHAT_TURNS_TOTAL.inc("cancelled")
+                    logger.info(f"Cancelled turn of '{conversation_id}'")
+                except Exception as e:
+                    CHAT_TURNS_TOTAL.inc("failed")
+                    logger.error(f"Turn of '{conversation_id}' failed: {e}")
+                finally:
+                    conversation.running = None
+                    conversation.task = None
+        finally:
+            if self._conversations.get(conversation_id) is conversation:
+                del self._conversations[conversation_id]
+
+    def cancel(self, conversation_id: str, sid: Optional[str] = None) -> bool:
+        """
+        Drop the pending turn and cancel the running one of a conversation
+        (only turns from `sid` when given). Returns whether anything stopped.
+        """
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None:
+            return False
+        stopped = False
+        if conversation.pending is not None and sid in (None, conversation.pending.sid):
+            conversation.pending = None
+            CHAT_TURNS_TOTAL.inc("dropped")
+            stopped = True
+        if conversation.task is not None and sid in (None, conversation.running.sid):
+            conversation.task.cancel()
+            stopped = True
+        return stopped
+
+    def cancel_sid(self, sid: str) -> int:
+        """Cancel every turn submitted by a socket; returns how many conversations stopped."""
+        return sum(self.cancel(conversation_id, sid) for conversation_id in list(self._conversations))
+
+    def active(self) -> Set[str]:
+        """Conversations with a running or pending turn."""
+        return set(self._conversations)
+
+
+# Initialize the conversation scheduler
+conversation_scheduler = ConversationScheduler(coalesce_window=settings.CHAT_COALESCE_WINDOW)
+registry.gauge("chat_conversations_active", "Conversations with a running or pending chat turn.",
+               function=lambda: len(conversation_scheduler.active()))
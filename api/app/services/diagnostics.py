@@ -0,0 +1,174 @@
+# app/services/diagnostics.py
+
+from collections import Counter
+from typing import Dict, Iterable, Optional
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+from app.core.config import settings
+from app.core.metrics import EVENT_LOOP_LAG_SECONDS, EVENT_LOOP_STALLS_TOTAL, registry
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+
+class LoopMonitor:
+    """
+    Watches the event loop of this worker for blocking work.
+
+    A task sleeps for `interval` and records how late it wakes up: the
+    event-loop lag. A watchdog thread checks that task's heartbeat; when
+    the loop has not run for `threshold` seconds beyond the interval, it
+    logs the stack of the loop thread at that moment, which points at the
+    synchronous code holding the loop, and the task running it. Each stall
+    is reported once, while it is still happening.
+    """
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self.stats = {"samples": 0, "last_lag": 0.0, "max_lag": 0.0, "stalls": 0}
+        self.last_stall: Optional[Dict] = None
+        self._beat = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start measuring. Called from the app startup event."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        """Stop the lag task and the watchdog. Called from the app shutdown event."""
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join, self.threshold + 1)
+            self._watchdog = None
+
+    async def _measure(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(0.0, now - expected)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+            self.stats["samples"] += 1
+            self.stats["last_lag"] = lag
+            self.stats["max_lag"] = max(self.stats["max_lag"], lag)
+
+    def _watch(self):
+        reported = None
+        while not self._stopping.wait(self.threshold / 2):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.threshold or beat == reported:
+                continue
+            reported = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            task = asyncio.current_task(self._loop)
+            task_name = task.get_name() if task is not None else None
+            EVENT_LOOP_STALLS_TOTAL.inc()
+            self.stats["stalls"] += 1
+            self.last_stall = {"time": time.time(), "blocked_seconds": blocked, "task": task_name, "stack": stack}
+            logger.warning(
+                f"Event loop blocked for over {blocked:.2f}s in task {task_name}; "
+                f"stack of the blocking code:\n{stack}"
+            )
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    label = f"{code.co_name} ({os.path.relpath(code.co_filename)}:{code.co_firstlineno})"
+    return label.replace(";", ":")
+
+
+def sample_stacks(seconds: float, interval: float, thread_ids: Optional[Iterable[int]] = None) -> Counter:
+    """
+    Sample the Python stacks of this process's threads (all but the caller,
+    or only `thread_ids`) every `interval` seconds for `seconds`, and count
+    each distinct stack as `thread;outermost;...;innermost`.
+    """
+    me = threading.get_ident()
+    wanted = set(thread_ids) if thread_ids is not None else None
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    counts: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me or (wanted is not None and ident not in wanted):
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, f"thread-{ident}").replace(";", ":"))
+            counts[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+    return counts
+
+
+def collapse_stacks(counts: Counter) -> str:
+    """Render stack counts in the collapsed format read by flamegraph.pl and speedscope."""
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+class SamplingProfiler:
+    """
+    On-demand sampling profiler for a live worker. Samples run in a
+    thread, so the event loop keeps serving (and can be caught blocking)
+    while it is profiled. One profile runs at a time.
+    """
+
+    def __init__(self, max_seconds: float):
+        self.max_seconds = max_seconds
+        self._running = False
+
+    async def profile(self, seconds: float, interval: float, all_threads: bool = False) -> str:
+        """
+        Profile for `seconds` (capped at `max_seconds`) and return collapsed
+        stacks. Only the event-loop thread is sampled unless `all_threads`.
+        Raises `ProfilerBusy` while another profile is running.
+        """
+        if self._running:
+            raise ProfilerBusy("A profile is already running.")
+        self._running = True
+        try:
+            threads = None if all_threads else [threading.get_ident()]
+            counts = await asyncio.to_thread(sample_stacks, min(seconds, self.max_seconds), interval, threads)
+        finally:
+            self._running = False
+        return collapse_stacks(counts)
+
+
+# Initialize the loop monitor and profiler
+loop_monitor = LoopMonitor(
+    interval=settings.LOOP_LAG_INTERVAL,
+    threshold=settings.LOOP_BLOCK_THRESHOLD,
+)
+profiler = SamplingProfiler(max_seconds=settings.PROFILE_MAX_SECONDS)
+registry.gauge("event_loop_lag_max_seconds", "Largest event-loop lag seen by this worker.",
+               function=lambda: loop_monitor.stats["max_lag"])
@@ -0,0 +1,285 @@
+# app/services/document_index.py
+
+from collections import Counter, OrderedDict
+from typing import Iterable, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import re
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.llm_router import llm_router
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 1
+
+_TERM_PATTERN = re.compile(r"\w+")
+_FILE_ID_PATTERN = re.compile(r"[0-9A-Za-z_-]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TERM_PATTERN.findall(text.lower())
+
+
+def chunk_text(text: str, chunk_words: int, overlap: int) -> List[str]:
+    """Split text into windows of `chunk_words` words overlapping by `overlap` words."""
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, chunk_words - overlap)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+def bm25_scores(query_terms: List[str], chunk_terms: List[Counter], k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """Okapi BM25 score of every chunk for the query."""
+    n = len(chunk_terms)
+    scores = np.zeros(n)
+    if n == 0:
+        return scores
+    lengths = np.array([sum(terms.values()) for terms in chunk_terms], dtype=float)
+    avgdl = lengths.mean() or 1.0
+    norm = k1 * (1 - b + b * lengths / avgdl)
+    for term in set(query_terms):
+        tf = np.array([terms.get(term, 0) for terms in chunk_terms], dtype=float)
+        df = np.count_nonzero(tf)
+        if df == 0:
+            continue
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        scores += idf * tf * (k1 + 1) / (tf + norm)
+    return scores
+
+
+class IndexedDocument:
+    """
+    Chunks of one document with their term counts and optional embeddings,
+    along with the model that produced them.
+    """
+
+    def __init__(
+        self,
+        file_id: str,
+        chunks: List[str],
+        embeddings: Optional[np.ndarray] = None,
+        embed_model: Optional[str] = None,
+    ):
+        self.file_id = file_id
+        self.chunks = chunks
+        self.terms = [Counter(tokenize(chunk)) for chunk in chunks]
+        self.embeddings = embeddings
+        self.embed_model = embed_model if embeddings is not None else None
+
+
+class DocumentIndex:
+    """
+    Chunk index of extracted document text keyed by `file_id`.
+
+    Documents are chunked once and scored with BM25; when an embedding model
+    is configured, chunk embeddings from the local Ollama are combined with
+    BM25 by reciprocal rank fusion. Indexes are written to `index_dir` so
+    they survive restarts, and a bounded number are kept loaded in memory.
+
+    Each index records the embedding model and dimension it was built
+    with; embeddings from another model (or indexes that do not say) are
+    not compared with the query, and those documents are ranked by BM25.
+    Documents indexed without embeddings (before a model was configured)
+    are embedded the first time they are ranked, and saved with them.
+    """
+
+    def __init__(
+        self,
+        index_dir: str,
+        chunk_words: int,
+        overlap: int,
+        top_k: int,
+        embed_model: str,
+        max_loaded: int,
+    ):
+        self.index_dir = index_dir
+        self.chunk_words = chunk_words
+        self.overlap = overlap
+        self.top_k = top_k
+        self.embed_model = embed_model
+        self.max_loaded = max_loaded
+        self._loaded: "OrderedDict[str, IndexedDocument]" = OrderedDict()
+
+    def _paths(self, file_id: str) -> Tuple[str, str]:
+        if not _FILE_ID_PATTERN.fullmatch(file_id):
+            raise ValueError(f"Invalid file_id: {file_id!r}")
+        base = os.path.join(self.index_dir, file_id)
+        return f"{base}.json", f"{base}.npy"
+
+    def _remember(self, document: IndexedDocument):
+        self._loaded[document.file_id] = document
+        self._loaded.move_to_end(document.file_id)
+        while len(self._loaded) > self.max_loaded:
+            self._loaded.popitem(last=False)
+
+    async def get(self, file_id: str) -> Optional[IndexedDocument]:
+        """Return the index for `file_id` from memory or disk, if it exists."""
+        document = self._loaded.get(file_id)
+        if document is not None:
+            self._loaded.move_to_end(file_id)
+            return document
+        document = await asyncio.to_thread(self._load, file_id)
+        if document is not None:
+            self._remember(document)
+        return document
+
+    async def add(self, file_id: str, text: str) -> IndexedDocument:
+        """Index `text` under `file_id` unless it is already indexed."""
+        document = await self.get(file_id)
+        if document is not None:
+            return document
+
+        chunks = chunk_text(text, self.chunk_words, self.overlap)
+        embeddings = await self._embed(chunks) if chunks else None
+        document = IndexedDocument(file_id, chunks, embeddings, self.embed_model)
+        try:
+            await asyncio.to_thread(self._save, document)
+        except Exception as e:
+            logger.error(f"Failed to persist document index for '{file_id}': {e}")
+        self._remember(document)
+        return document
+
+    async def retrieve(
+        self, file_ids: List[str], query: str, top_k: Optional[int] = None
+    ) -> List[Tuple[str, int, str]]:
+        """
+        Return the `top_k` chunks across `file_ids` most relevant to `query`
+        as (file_id, chunk_number, text), in document order.
+        """
+        top_k = top_k or self.top_k
+        candidates: List[Tuple[IndexedDocument, int]] = []
+        for file_id in file_ids:
+            document = await self.get(file_id)
+            if document is not None:
+                candidates.extend((document, i) for i in range(len(document.chunks)))
+        if len(candidates) <= top_k:
+            return [(d.file_id, i, d.chunks[i]) for d, i in candidates]
+
+        query_terms = tokenize(query)
+        if not query_terms:
+            # Nothing to rank by: fall back to the start of each document.
+            selected = sorted(range(len(candidates)), key=lambda c: candidates[c][1])[:top_k]
+        else:
+            await self._embed_missing({d.file_id: d for d, _ in candidates}.values())
+            scores = bm25_scores(query_terms, [d.terms[i] for d, i in candidates])
+            ranking = _rank_fusion(scores, await self._semantic_scores(candidates, query))
+            selected = list(np.argsort(-ranking, kind="stable")[:top_k])
+
+        selected.sort()
+        return [
+            (candidates[c][0].file_id, candidates[c][1], candidates[c][0].chunks[candidates[c][1]])
+            for c in selected
+        ]
+
+    async def _embed_missing(self, documents: Iterable[IndexedDocument]):
+        """Embed and persist documents that were indexed without embeddings."""
+        if not self.embed_model:
+            return
+        for document in documents:
+            if document.embeddings is not None or not document.chunks:
+                continue
+            embeddings = await self._embed(document.chunks)
+            if embeddings is None:
+                return
+            document.embeddings = embeddings
+            document.embed_model = self.embed_model
+            try:
+                await asyncio.to_thread(self._save, document)
+            except Exception as e:
+                logger.error(f"Failed to persist embeddings for '{document.file_id}': {e}")
+
+    async def _semantic_scores(
+        self, candidates: List[Tuple[IndexedDocument, int]], query: str
+    ) -> Optional[np.ndarray]:
+        if not self.embed_model or any(
+            d.embeddings is None or d.embed_model != self.embed_model for d, _ in candidates
+        ):
+            return None
+        query_vector = await self._embed([query])
+        if query_vector is None:
+            return None
+        if any(d.embeddings.shape[1] != query_vector.shape[1] for d, _ in candidates):
+            logger.warning(f"Embedding dimension of '{self.embed_model}' changed, using BM25 only")
+            return None
+        matrix = np.stack([d.embeddings[i] for d, i in candidates])
+        return matrix @ query_vector[0]
+
+    async def _embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Unit-normalized embeddings from Ollama, or None when disabled or failing."""
+        if not self.embed_model:
+            return None
+        try:
+            data = await llm_router.post_json("/api/embed", {"model": self.embed_model, "input": texts})
+            vectors = np.asarray(data["embeddings"], dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Embedding request failed, using BM25 only: {e}")
+            return None
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _load(self, file_id: str) -> Optional[IndexedDocument]:
+        json_path, npy_path = self._paths(file_id)
+        if not os.path.exists(json_path):
+            return None
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("version") != INDEX_FORMAT_VERSION:
+                return None
+            embeddings = np.load(npy_path) if os.path.exists(npy_path) else None
+        except Exception as e:
+            logger.error(f"Failed to load document index for '{file_id}': {e}")
+            return None
+        if embeddings is not None and (embeddings.ndim != 2 or embeddings.shape[1] != stored.get("embed_dimensions")):
+            embeddings = None
+        return IndexedDocument(file_id, stored["chunks"], embeddings, stored.get("embed_model"))
+
+    def _save(self, document: IndexedDocument):
+        os.makedirs(self.index_dir, exist_ok=True)
+        json_path, npy_path = self._paths(document.file_id)
+        if document.embeddings is not None:
+            np.save(npy_path, document.embeddings)
+        # Written last and atomically: its presence marks a complete index.
+        tmp_path = f"{json_path}.tmp"
+        stored = {"version": INDEX_FORMAT_VERSION, "chunks": document.chunks}
+        if document.embeddings is not None:
+            stored["embed_model"] = document.embed_model
+            stored["embed_dimensions"] = int(document.embeddings.shape[1])
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stored, f, ensure_ascii=False)
+        os.replace(tmp_path, json_path)
+
+
+def _rank_fusion(*scores: Optional[np.ndarray], k: int = 60) -> np.ndarray:
+    """Reciprocal rank fusion of several score arrays (None entries are skipped)."""
+    fused = None
+    for score in scores:
+        if score is None:
+            continue
+        ranks = np.empty(len(score))
+        ranks[np.argsort(-score, kind="stable")] = np.arange(len(score))
+        contribution = 1.0 / (k + ranks)
+        fused = contribution if fused is None else fused + contribution
+    return fused
+
+
+# Initialize the document index
+document_index = DocumentIndex(
+    index_dir=settings.INDEX_DIR,
+    chunk_words=settings.INDEX_CHUNK_WORDS,
+    overlap=settings.INDEX_CHUNK_OVERLAP,
+    top_k=settings.INDEX_TOP_K,
+    embed_model=settings.INDEX_EMBED_MODEL,
+    max_loaded=settings.INDEX_MAX_LOADED,
+)
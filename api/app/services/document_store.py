@@ -0,0 +1,103 @@
+# app/services/document_store.py
+
+from typing import Dict, List, Optional
+import logging
+
+from app.core.config import settings
+from app.services.codecs import Codec, make_codec
+from app.services.document_index import document_index
+from app.services.document_summarizer import document_summarizer
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentStore:
+    """
+    Extracted document text stored once per `file_id` in Redis, encoded
+    with `codec` (compressed msgpack by default).
+
+    Chat history holds `{file_id, name}` references to the documents a
+    message attached instead of their passages. `expand` rebuilds the text
+    sent to the model by retrieving the passages relevant to the message,
+    re-indexing a document from the store when this worker has no index
+    for it, or, when brief, from the documents' cached summaries.
+    """
+
+    def __init__(self, codec: Codec, ttl: int, key_prefix: str = "document:"):
+        self.codec = codec
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+
+    def make_key(self, file_id: str) -> str:
+        return f"{self.key_prefix}{file_id}"
+
+    async def put(self, file_id: str, text: str) -> bool:
+        """
+        Store the text of `file_id` unless it is already stored, in which
+        case only its TTL is refreshed. Returns True if the text was written.
+        """
+        key = self.make_key(file_id)
+        redis = await redis_service.client()
+        stored = await redis.expire(key, self.ttl) if self.ttl > 0 else await redis.exists(key)
+        if stored:
+            return False
+        await redis_service.set(key, text, expire=self.ttl, codec=self.codec)
+        return True
+
+    async def get(self, file_id: str) -> Optional[str]:
+        return await redis_service.get(self.make_key(file_id), codec=self.codec)
+
+    async def excerpts(self, documents: List[Dict], query: str) -> str:
+        """
+        Return the passages of `documents` most relevant to `query`, grouped
+        per document under its name, in document order.
+        """
+        names = {document["file_id"]: document.get("name") or "Uploaded File" for document in documents}
+        for file_id in names:
+            if await document_index.get(file_id) is None:
+                text = await self.get(file_id)
+                if text:
+                    await document_index.add(file_id, text)
+
+        sections: Dict[str, List[str]] = {}
+        for file_id, _, chunk in await document_index.retrieve(list(names), query):
+            sections.setdefault(file_id, []).append(chunk)
+        return "\n\n".join(
+            f"[{names[file_id]}]\n" + "\n...\n".join(chunks) for file_id, chunks in sections.items()
+        ).strip()
+
+    async def summaries(self, documents: List[Dict]) -> str:
+        """Return the cached summaries of `documents` under their names, skipping unsummarized ones."""
+        results = await redis_service.mget([document_summarizer.make_key(d["file_id"]) for d in documents])
+        return "\n\n".join(
+            f"[{document.get('name') or 'Uploaded File'}]\n{result['summary']}"
+            for document, result in zip(documents, results)
+            if isinstance(result, dict) and result.get("summary")
+        )
+
+    async def expand(self, message: Dict, brief: bool = False) -> Dict:
+        """
+        Return `message` with its document references replaced by their
+        passages, or by their summaries when `brief`.
+        """
+        documents = message.get("documents")
+        if not documents:
+            return message
+        content = message.get("content", "")
+        try:
+            if brief:
+                excerpts = await self.summaries(documents)
+            else:
+                excerpts = await self.excerpts(documents, content)
+        except Exception as e:
+            logger.warning(f"Failed to expand document references: {e}")
+            excerpts = ""
+        return {"role": message.get("role", "user"), "content": f"{content} {excerpts}".strip()}
+
+
+# Initialize the document store
+document_store = DocumentStore(
+    codec=make_codec(settings.DOCUMENT_STORE_CODEC),
+    ttl=settings.DOCUMENT_STORE_TTL,
+)
@@ -0,0 +1,193 @@
+# app/services/document_summarizer.py
+
+from typing import Dict, List, Optional
+import asyncio
+import json
+import logging
+import time
+
+from app.core.config import settings
+from app.core.metrics import DOCUMENT_SUMMARY_CALLS_TOTAL, DOCUMENT_SUMMARY_SECONDS
+from app.services.document_index import chunk_text
+from app.services.llm_router import llm_router
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+MAP_INSTRUCTIONS = (
+    "Summarize this part of a longer document. Keep names, parties, dates, amounts, "
+    "obligations and conclusions. Reply with the summary only."
+)
+REDUCE_INSTRUCTIONS = (
+    "Combine these summaries of consecutive parts of one document into a single summary. "
+    "Keep names, parties, dates, amounts, obligations and conclusions. Reply with the summary only."
+)
+FINAL_INSTRUCTIONS = (
+    "Summarize the document below in a few sentences and list up to {max_tags} short topic tags "
+    'for it. Reply with JSON only: {{"summary": "...", "tags": ["...", "..."]}}'
+)
+
+
+class DocumentSummarizer:
+    """
+    Summarizes and tags extracted document text with a map-reduce over
+    Ollama. The text is split into chunks of `chunk_words` words that are
+    summarized concurrently, at most `concurrency` calls at a time across all
+    documents. Partial summaries are merged in groups that fit a chunk until
+    one remains, which yields the final summary and tags.
+
+    Results are cached in Redis by `file_id`, so each document is summarized
+    once; concurrent requests for the same document in a worker share one
+    run.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        chunk_words: int,
+        summary_tokens: int,
+        max_tags: int,
+        concurrency: int,
+        ttl: int,
+        key_prefix: str = "document_summary:",
+    ):
+        self.model = model
+        self.chunk_words = max(1, chunk_words)
+        self.summary_tokens = summary_tokens
+        self.max_tags = max_tags
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self.concurrency = max(1, concurrency)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._running: Dict[str, asyncio.Task] = {}
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore belongs to the running loop.
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        return self._slots
+
+    def make_key(self, file_id: str) -> str:
+        return f"{self.key_prefix}{file_id}"
+
+    async def cached(self, file_id: str) -> Optional[Dict]:
+        """Return the stored `{summary, tags}` of `file_id`, if any."""
+        result = await redis_service.get(self.make_key(file_id))
+        return result if isinstance(result, dict) else None
+
+    async def summarize(self, file_id: str, text: str, wait: Optional[float] = None) -> Optional[Dict]:
+        """
+        Return `{summary, tags}` for the document, summarizing it if needed.
+        With `wait`, give up waiting after that many seconds and return None;
+        the summary is still completed and cached for later requests. With
+        `wait=0` only the cached summary is returned and a missing one is
+        started in the background. Returns None as well when summarization fails.
+        """
+        result = await self.cached(file_id)
+        if result is not None or not text.strip():
+            return result
+
+        task = self._running.get(file_id)
+        if task is None:
+            task = asyncio.create_task(self._run(file_id, text))
+            self._running[file_id] = task
+            task.add_done_callback(lambda _: self._running.pop(file_id, None))
+        if wait is not None and wait <= 0:
+            return None
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), wait)
+        except asyncio.TimeoutError:
+            logger.info(f"Summary of '{file_id}' not ready after {wait}s; finishing in the background")
+            return None
+
+    async def _run(self, file_id: str, text: str) -> Optional[Dict]:
+        started = time.perf_counter()
+        try:
+            parts = chunk_text(text, self.chunk_words, 0)
+            if len(parts) > 1:
+                parts = await asyncio.gather(*(self._complete(MAP_INSTRUCTIONS, part, "map") for part in parts))
+            while len(parts) > 1:
+                groups = self._group(parts)
+                if len(groups) == len(parts):
+                    # Partial summaries too long to pair up; keep what fits the final call
+                    parts = [" ".join(" ".join(parts).split()[:self.chunk_words])]
+                    break
+                parts = await asyncio.gather(*(self._reduce(group) for group in groups))
+
+            reply = await self._complete(
+                FINAL_INSTRUCTIONS.format(max_tags=self.max_tags), parts[0], "final", json_format=True
+            )
+            result = self._parse(reply)
+        except Exception as e:
+            logger.warning(f"Failed to summarize document '{file_id}': {e}")
+            return None
+        DOCUMENT_SUMMARY_SECONDS.observe(time.perf_counter() - started)
+
+        try:
+            await redis_service.set(self.make_key(file_id), result, expire=self.ttl)
+        except Exception as e:
+            logger.warning(f"Failed to cache summary of '{file_id}': {e}")
+        return result
+
+    async def _reduce(self, group: List[str]) -> str:
+        if len(group) == 1:
+            return group[0]
+        return await self._complete(REDUCE_INSTRUCTIONS, "\n\n".join(group), "reduce")
+
+    def _group(self, parts: List[str]) -> List[List[str]]:
+        """Pack consecutive parts into groups of at most `chunk_words` words."""
+        groups: List[List[str]] = []
+        words = 0
+        for part in parts:
+            size = len(part.split())
+            if groups and words + size <= self.chunk_words:
+                groups[-1].append(part)
+                words += size
+            else:
+                groups.append([part])
+                words = size
+        return groups
+
+    async def _complete(self, instructions: str, text: str, stage: str, json_format: bool = False) -> str:
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": instructions},
+                {"role": "user", "content": text},
+            ],
+            "options": {"num_predict": self.summary_tokens * (2 if json_format else 1)},
+        }
+        if json_format:
+            payload["format"] = "json"
+        async with self._get_slots():
+            DOCUMENT_SUMMARY_CALLS_TOTAL.inc(stage)
+            data = await llm_router.chat(payload)
+        return data.get("message", {}).get("content", "").strip()
+
+    def _parse(self, reply: str) -> Dict:
+        """Read the final `{summary, tags}` reply, keeping plain-text replies as the summary."""
+        try:
+            data = json.loads(reply)
+        except ValueError:
+            data = {"summary": reply}
+        if not isinstance(data, dict):
+            data = {"summary": reply}
+
+        tags = []
+        raw_tags = data.get("tags")
+        for tag in raw_tags if isinstance(raw_tags, list) else []:
+            tag = str(tag).strip().strip("#").lower()
+            if tag and tag not in tags:
+                tags.append(tag)
+        return {"summary": str(data.get("summary") or "").strip(), "tags": tags[:self.max_tags]}
+
+
+# Initialize the document summarizer
+document_summarizer = DocumentSummarizer(
+    model=settings.DOCUMENT_SUMMARY_MODEL or settings.OLLAMA_MODEL,
+    chunk_words=settings.DOCUMENT_SUMMARY_CHUNK_WORDS,
+    summary_tokens=settings.DOCUMENT_SUMMARY_TOKENS,
+    max_tags=settings.DOCUMENT_SUMMARY_MAX_TAGS,
+    concurrency=settings.DOCUMENT_SUMMARY_CONCURRENCY,
+    ttl=settings.DOCUMENT_SUMMARY_TTL,
+)
@@ -0,0 +1,344 @@
+# app/services/docx_extraction.py
+
+from typing import Dict, Iterator, List, Union
+import re
+import struct
+import zipfile
+
+from lxml import etree
+
+from app.utils.file_utils import open_source
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+# Characters produced by run-level elements other than <w:t>.
+RUN_CHARACTERS = {W + "tab": "\t", W + "br": "\n", W + "cr": "\n", W + "noBreakHyphen": "-"}
+STRUCTURE_TAGS = (W + "p", W + "tr", W + "tc", W + "tbl", MC_FALLBACK)
+
+# Separates the cells of a table row in the extracted text.
+CELL_SEPARATOR = " | "
+
+ZIP_SIGNATURE = b"PK\x03\x04"
+OLE_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+RTF_SIGNATURE = b"{\\rtf"
+
+
+def _paragraph_text(paragraph) -> str:
+    # Only run children count: <w:tab> also defines tab stops in the paragraph properties.
+    parts = []
+    for run in paragraph.iter(W + "r"):
+        for node in run:
+            if node.tag == W + "t":
+                parts.append(node.text or "")
+            elif node.tag in RUN_CHARACTERS:
+                parts.append(RUN_CHARACTERS[node.tag])
+    return "".join(parts)
+
+
+def iter_part_lines(stream) -> Iterator[str]:
+    """
+    Yield the lines of a WordprocessingML part (document, header or footer)
+    in reading order: one per paragraph and one per table row, with the
+    row's cells joined by `CELL_SEPARATOR`.
+
+    The XML is parsed incrementally, reporting only the structural tags,
+    and every finished paragraph, cell, row or table is dropped from the
+    tree, so memory stays bounded by the largest paragraph rather than
+    the document.
+    """
+    cells: List[List[str]] = []  # open table cells, innermost last
+    rows: List[List[str]] = []  # open table rows, innermost last
+    fallback = 0  # depth inside mc:Fallback, which repeats the mc:Choice content
+
+    for event, element in etree.iterparse(stream, events=("start", "end"), tag=STRUCTURE_TAGS, huge_tree=True):
+        tag = element.tag
+        if event == "start":
+            if tag == MC_FALLBACK:
+                fallback += 1
+            elif fallback:
+                pass
+            elif tag == W + "tr":
+                rows.append([])
+            elif tag == W + "tc":
+                cells.append([])
+            continue
+
+        if tag == MC_FALLBACK:
+            fallback -= 1
+        elif fallback:
+            pass
+        elif tag == W + "p":
+            # Paragraphs nested in text boxes were already yielded and removed
+            line = _paragraph_text(element)
+            if cells:
+                cells[-1].append(line)
+            else:
+                yield line
+        elif tag == W + "tc":
+            text = " ".join(part for part in cells.pop() if part.strip())
+            if rows:
+                rows[-1].append(text)
+        elif tag == W + "tr":
+            row = rows.pop()
+            if any(row):
+                line = CELL_SEPARATOR.join(row)
+                if cells:  # nested table: the row becomes part of the outer cell
+                    cells[-1].append(line)
+                else:
+                    yield line
+
+        # Detach each finished element as soon as it is read: dropping a whole
+        # table at once is far slower than dropping it row by row.
+        parent = element.getparent()
+        if parent is not None:
+            parent.remove(element)
+
+
+def _part_order(name: str) -> tuple:
+    number = re.search(r"(\d+)\.xml$", name)
+    return (int(number.group(1)) if number else 0, name)
+
+
+def iter_docx_lines(stream) -> Iterator[str]:
+    """
+    Yield the lines of a DOCX file: headers, then the body, then footers.
+    A header or footer repeated across sections is yielded once.
+    """
+    with zipfile.ZipFile(stream) as archive:
+        names = archive.namelist()
+        headers = sorted((n for n in names if re.fullmatch(r"word/header\d*\.xml", n)), key=_part_order)
+        footers = sorted((n for n in names if re.fullmatch(r"word/footer\d*\.xml", n)), key=_part_order)
+
+        seen = set()
+
+        def unique(name: str) -> Iterator[str]:
+            with archive.open(name) as part:
+                block = "\n".join(iter_part_lines(part)).strip()
+            if block and block not in seen:
+                seen.add(block)
+                yield block
+
+        for name in headers:
+            yield from unique(name)
+        with archive.open("word/document.xml") as part:
+            yield from iter_part_lines(part)
+        for name in footers:
+            yield from unique(name)
+
+
+class CompoundFile:
+    """
+    Minimal reader for OLE2 compound files, the container of legacy .doc
+    files: enough to read a named stream.
+    """
+
+    FREE, END_OF_CHAIN = 0xFFFFFFFF, 0xFFFFFFFE
+
+    def __init__(self, data: bytes):
+        if data[:8] != OLE_SIGNATURE:
+            raise ValueError("Not an OLE2 compound file.")
+        self.data = data
+        self.sector_size = 1 << struct.unpack_from("<H", data, 0x1E)[0]
+        self.mini_sector_size = 1 << struct.unpack_from("<H", data, 0x20)[0]
+        (dir_start,) = struct.unpack_from("<I", data, 0x30)
+        self.mini_cutoff, minifat_start = struct.unpack_from("<II", data, 0x38)
+        difat_start, difat_count = struct.unpack_from("<II", data, 0x44)
+
+        # FAT sector numbers: 109 in the header, the rest in chained DIFAT sectors
+        fat_sectors = list(struct.unpack_from("<109I", data, 0x4C))
+        per_sector = self.sector_size // 4
+        sector = difat_start
+        for _ in range(difat_count):
+            entries = struct.unpack_from(f"<{per_sector}I", data, self._offset(sector))
+            fat_sectors.extend(entries[:-1])
+            sector = entries[-1]
+        self.fat: List[int] = []
+        for sector in fat_sectors:
+            if sector < self.END_OF_CHAIN:
+                self.fat.extend(struct.unpack_from(f"<{per_sector}I", data, self._offset(sector)))
+
+        directory = self._read_chain(dir_start, self.fat, self._sector)
+        self.entries: Dict[str, tuple] = {}
+        root = None
+        for offset in range(0, len(directory) - 127, 128):
+            name_length, kind = struct.unpack_from("<HB", directory, offset + 64)
+            start, size = struct.unpack_from("<II", directory, offset + 116)
+            name = directory[offset:offset + max(0, name_length - 2)].decode("utf-16-le", errors="replace")
+            if kind == 5:
+                root = (start, size)
+            elif kind == 2:
+                self.entries[name] = (start, size)
+
+        self.minifat: List[int] = []
+        self.mini_stream = b""
+        if root is not None and minifat_start < self.END_OF_CHAIN:
+            raw = self._read_chain(minifat_start, self.fat, self._sector)
+            self.minifat = list(struct.unpack(f"<{len(raw) // 4}I", raw))
+            self.mini_stream = self._read_chain(root[0], self.fat, self._sector)[:root[1]]
+
+    def _offset(self, sector: int) -> int:
+        return (sector + 1) * self.sector_size
+
+    def _sector(self, sector: int) -> bytes:
+        offset = self._offset(sector)
+        return self.data[offset:offset + self.sector_size]
+
+    def _mini_sector(self, sector: int) -> bytes:
+        offset = sector * self.mini_sector_size
+        return self.mini_stream[offset:offset + self.mini_sector_size]
+
+    @classmethod
+    def _read_chain(cls, start: int, table: List[int], read) -> bytes:
+        chunks = []
+        sector = start
+        while sector < cls.END_OF_CHAIN and len(chunks) <= len(table):
+            chunks.append(read(sector))
+            sector = table[sector] if sector < len(table) else cls.END_OF_CHAIN
+        return b"".join(chunks)
+
+    def stream(self, name: str) -> bytes:
+        if name not in self.entries:
+            raise ValueError(f"Stream '{name}' not found.")
+        start, size = self.entries[name]
+        if size < self.mini_cutoff:
+            data = self._read_chain(start, self.minifat, self._mini_sector)
+        else:
+            data = self._read_chain(start, self.fat, self._sector)
+        return data[:size]
+
+
+def _strip_fields(text: str) -> str:
+    """Keep the displayed result of Word fields (\\x13 code \\x14 result \\x15) and drop their codes."""
+    out = []
+    in_code = []  # per open field: still inside its code part
+    for char in text:
+        if char == "\x13":
+            in_code.append(True)
+        elif char == "\x14" and in_code:
+            in_code[-1] = False
+        elif char == "\x15" and in_code:
+            in_code.pop()
+        elif not any(in_code):
+            out.append(char)
+    return "".join(out)
+
+
+DOC_CHARACTERS = str.maketrans({
+    "\r": "\n", "\x0b": "\n", "\x0c": "\n", "\x07": "\t", "\x1e": "-", "\x1f": None,
+    **{chr(code): None for code in range(32) if chr(code) not in "\t\n\r\x0b\x0c\x07\x1e\x1f"},
+})
+
+
+def extract_doc_text(data: bytes) -> str:
+    """
+    Extract the text of a Word 97-2003 .doc file by reading its piece table.
+    Table cells come out tab-separated. Formatting, images and embedded
+    objects are ignored.
+    """
+    compound = CompoundFile(data)
+    document = compound.stream("WordDocument")
+    ident, flags = struct.unpack_from("<H", document, 0)[0], struct.unpack_from("<H", document, 0x0A)[0]
+    if ident != 0xA5EC:
+        raise ValueError("Not a Word 97-2003 document.")
+    if flags & 0x0100:
+        raise ValueError("Encrypted .doc files are not supported.")
+    table = compound.stream("1Table" if flags & 0x0200 else "0Table")
+    fc_clx, lcb_clx = struct.unpack_from("<II", document, 0x1A2)
+    clx = table[fc_clx:fc_clx + lcb_clx]
+
+    # Skip formatting (Prc) entries up to the piece table (Pcdt)
+    position = 0
+    while position < len(clx) and clx[position] == 0x01:
+        position += 3 + struct.unpack_from("<h", clx, position + 1)[0]
+    if position >= len(clx) or clx[position] != 0x02:
+        raise ValueError("Piece table not found.")
+    (length,) = struct.unpack_from("<I", clx, position + 1)
+    plc = clx[position + 5:position + 5 + length]
+    pieces = (length - 4) // 12
+    cps = struct.unpack_from(f"<{pieces + 1}I", plc)
+
+    parts = []
+    for n in range(pieces):
+        (fc,) = struct.unpack_from("<I", plc, 4 * (pieces + 1) + 8 * n + 2)
+        count = cps[n + 1] - cps[n]
+        if fc & 0x40000000:  # 8-bit text
+            start = (fc & 0x3FFFFFFF) // 2
+            parts.append(document[start:start + count].decode("cp1252", errors="replace"))
+        else:
+            start = fc & 0x3FFFFFFF
+            parts.append(document[start:start + 2 * count].decode("utf-16-le", errors="replace"))
+    return _strip_fields("".join(parts)).translate(DOC_CHARACTERS).strip()
+
+
+RTF_SKIPPED_DESTINATIONS = {
+    "fonttbl", "colortbl", "stylesheet", "info", "pict", "header", "footer", "object", "listtable",
+    "listoverridetable", "rsidtbl", "generator", "themedata", "colorschememapping", "latentstyles",
+    "datastore", "xmlnstbl", "filetbl", "revtbl",
+}
+RTF_TOKEN = re.compile(r"\\([a-z]+)(-?\d+)? ?|\\'([0-9a-f]{2})|\\([^a-z])|([{}])|[\r\n]+|([^\\{}\r\n]+)", re.I)
+
+
+def extract_rtf_text(data: bytes) -> str:
+    """Extract plain text from RTF (often saved with a .doc extension)."""
+    out = []
+    skip_depth = None  # group depth at which a skipped destination started
+    depth = 0
+    skip_next = 0  # characters to skip after \\uN (its ANSI fallback)
+    for match in RTF_TOKEN.finditer(data.decode("latin-1")):
+        word, argument, hex_code, symbol, brace, text = match.groups()
+        if brace == "{":
+            depth += 1
+            continue
+        if brace == "}":
+            if skip_depth == depth:
+                skip_depth = None
+            depth -= 1
+            continue
+        if skip_depth is not None:
+            continue
+        if word:
+            word = word.lower()
+            if word in RTF_SKIPPED_DESTINATIONS:
+                skip_depth = depth
+            elif word in ("par", "line", "row", "sect", "page"):
+                out.append("\n")
+            elif word in ("tab", "cell"):
+                out.append("\t")
+            elif word == "u" and argument:
+                out.append(chr(int(argument) % 65536))
+                skip_next = 1
+        elif symbol == "*":
+            skip_depth = depth
+        elif symbol in ("\\", "{", "}"):
+            out.append(symbol)
+        elif symbol == "~":
+            out.append("\u00a0")
+        elif hex_code:
+            if skip_next:
+                skip_next -= 1
+            else:
+                out.append(bytes([int(hex_code, 16)]).decode("cp1252", errors="replace"))
+        elif text:
+            if skip_next:
+                text, skip_next = text[1:], 0
+            out.append(text)
+    return re.sub(r"\n{3,}", "\n\n", "".join(out)).strip()
+
+
+def extract_word_text(source: Union[bytes, str]) -> str:
+    """
+    Extract text from a Word document (bytes or a file path), recognizing
+    the format from its first bytes: DOCX, legacy .doc, or RTF.
+    DOCX files are streamed; .doc and RTF files are read whole.
+    """
+    with open_source(source) as stream:
+        signature = stream.read(8)
+        stream.seek(0)
+        if signature.startswith(ZIP_SIGNATURE):
+            return "\n".join(iter_docx_lines(stream)).strip()
+        if signature == OLE_SIGNATURE:
+            return extract_doc_text(stream.read())
+        if signature.startswith(RTF_SIGNATURE):
+            return extract_rtf_text(stream.read())
+    raise ValueError("Unrecognized Word document format.")
@@ -1,26 +1,21 @@
 import os
 import mimetypes
-import zipfile
 from PyPDF2 import PdfReader
-from docx import Document
+from app.services.docx_extraction import extract_word_text
 import chardet
 
 def extract_text_from_pdf(file_path: str) -> str:
     """Extract text from a PDF file."""
     try:
         reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()
-        return text
+        return "".join(page.extract_text() for page in reader.pages)
     except Exception as e:
         raise ValueError(f"Error extracting text from PDF: {str(e)}")
 
 def extract_text_from_docx(file_path: str) -> str:
     """Extract text from a DOCX file."""
     try:
-        doc = Document(file_path)
-        return "\n".join([paragraph.text for paragraph in doc.paragraphs])
+        return extract_word_text(file_path)
     except Exception as e:
         raise ValueError(f"Error extracting text from DOCX: {str(e)}")
 
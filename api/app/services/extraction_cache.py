@@ -0,0 +1,131 @@
+# app/services/extraction_cache.py
+
+from collections import OrderedDict
+from typing import Dict, Optional
+import json
+import logging
+
+import redis
+
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS_TOTAL
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever an extractor changes its output so stale results are ignored.
+EXTRACTOR_VERSION = "4"
+
+
+class ExtractionCache:
+    """
+    Two-tier cache for extracted text, keyed on the content hash (`file_id`),
+    MIME type and extractor version.
+
+    Tier 1 is an in-process LRU bounded by the total UTF-8 size of its
+    entries. Tier 2 is Redis with a TTL, shared by every worker.
+    """
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._size = 0
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0}
+        self._sync_redis: Optional[redis.Redis] = None
+
+    @staticmethod
+    def make_key(file_id: str, mime_type: str) -> str:
+        return f"extraction:v{EXTRACTOR_VERSION}:{mime_type}:{file_id}"
+
+    @property
+    def size(self) -> int:
+        """Bytes currently held by the in-process tier."""
+        return self._size
+
+    async def get(self, file_id: str, mime_type: str) -> Optional[str]:
+        """Look up extracted text, promoting Redis hits into the local tier."""
+        key = self.make_key(file_id, mime_type)
+
+        text = self._entries.get(key)
+        if text is not None:
+            self._entries.move_to_end(key)
+            self.stats["l1_hits"] += 1
+            CACHE_REQUESTS_TOTAL.inc("extraction", "l1")
+            return text
+
+        text = await redis_service.get(key)
+        if isinstance(text, str):
+            self.stats["l2_hits"] += 1
+            CACHE_REQUESTS_TOTAL.inc("extraction", "l2")
+            self._store_local(key, text)
+            return text
+
+        self.stats["misses"] += 1
+        CACHE_REQUESTS_TOTAL.inc("extraction", "miss")
+        return None
+
+    async def set(self, file_id: str, mime_type: str, text: str):
+        """Store extracted text in both tiers."""
+        key = self.make_key(file_id, mime_type)
+        self._store_local(key, text)
+        try:
+            await redis_service.set(key, text, expire=self.ttl)
+        except Exception as e:
+            logger.warning(f"Extraction cache write to Redis failed for '{key}': {e}")
+
+    def get_sync(self, file_id: str, mime_type: str) -> Optional[str]:
+        """Blocking Redis-tier lookup for worker processes without an event loop."""
+        try:
+            value = self._get_sync_redis().get(self.make_key(file_id, mime_type))
+            text = json.loads(value) if value else None
+        except Exception as e:
+            logger.warning(f"Extraction cache read from Redis failed: {e}")
+            return None
+        if isinstance(text, str):
+            self.stats["l2_hits"] += 1
+            return text
+        self.stats["misses"] += 1
+        return None
+
+    def set_sync(self, file_id: str, mime_type: str, text: str):
+        """Blocking Redis-tier write for worker processes without an event loop."""
+        try:
+            self._get_sync_redis().set(self.make_key(file_id, mime_type), json.dumps(text), ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"Extraction cache write to Redis failed: {e}")
+
+    def _get_sync_redis(self) -> redis.Redis:
+        if self._sync_redis is None:
+            self._sync_redis = redis.Redis.from_url(redis_service.redis_url, decode_responses=True)
+        return self._sync_redis
+
+    def clear(self):
+        """Drop the in-process tier."""
+        self._entries.clear()
+        self._sizes.clear()
+        self._size = 0
+
+    def _store_local(self, key: str, text: str):
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._size -= self._sizes[key]
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        self._sizes[key] = size
+        self._size += size
+
+        while self._size > self.max_bytes:
+            old_key, _ = self._entries.popitem(last=False)
+            self._size -= self._sizes.pop(old_key)
+
+
+# Initialize the extraction cache
+extraction_cache = ExtractionCache(
+    max_bytes=settings.EXTRACTION_CACHE_MAX_BYTES,
+    ttl=settings.EXTRACTION_CACHE_TTL,
+)
@@ -0,0 +1,165 @@
+# app/services/extraction_executor.py
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+import asyncio
+import logging
+import pickle
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionQueueFull(Exception):
+    """Raised when the extraction queue has no free slot for a new job."""
+
+
+class ExtractionTimeout(Exception):
+    """Raised when an extraction job does not finish within its deadline."""
+
+
+def _call(fn: Callable, *args: Any) -> Any:
+    """
+    Worker-side wrapper. Exceptions that cannot be rebuilt from their
+    pickled arguments (e.g. pytesseract's) would break the whole pool in
+    the parent, so they are re-raised as plain RuntimeErrors.
+    """
+    try:
+        return fn(*args)
+    except Exception as e:
+        try:
+            pickle.loads(pickle.dumps(e))
+        except Exception:
+            raise RuntimeError(f"{type(e).__name__}: {e}") from None
+        raise
+
+
+class ExtractionExecutor:
+    """
+    Runs CPU-bound extraction functions (OCR, PDF, DOCX) in a process pool
+    so they never block the event loop.
+
+    At most `max_workers + queue_size` jobs are admitted at once. Callers
+    either wait for a free slot (`block=True`) or get `ExtractionQueueFull`
+    immediately (`block=False`). A job keeps its slot until its worker
+    process actually finishes, so timed-out jobs still count against the
+    bound while they run.
+    """
+
+    def __init__(self, max_workers: int, queue_size: int, timeout: float):
+        self.max_workers = max(1, max_workers)
+        self.queue_size = max(0, queue_size)
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.queue_size
+
+    @property
+    def in_flight(self) -> int:
+        """Number of admitted jobs that are queued or running."""
+        return self._in_flight
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore belongs to the running loop.
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.capacity)
+        return self._slots
+
+    def _reset_pool(self):
+        """Drop a broken pool so the next job starts a fresh one."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def run(
+        self,
+        fn: Callable,
+        *args: Any,
+        timeout: Optional[float] = None,
+        block: bool = True,
+    ) -> Any:
+        """
+        Run `fn(*args)` in the process pool and return its result.
+        `fn` and its arguments must be picklable.
+        """
+        loop = asyncio.get_running_loop()
+        slots = self._get_slots()
+
+        if not block and slots.locked():
+            raise ExtractionQueueFull("Extraction queue is full. Please retry later.")
+        await slots.acquire()
+        self._in_flight += 1
+
+        def release_slot(_):
+            def release():
+                self._in_flight -= 1
+                slots.release()
+            try:
+                loop.call_soon_threadsafe(release)
+            except RuntimeError:
+                # Event loop already closed during shutdown.
+                pass
+
+        try:
+            future = self._get_pool().submit(_call, fn, *args)
+        except BrokenProcessPool:
+            self._reset_pool()
+            future = self._get_pool().submit(_call, fn, *args)
+        except Exception:
+            self._in_flight -= 1
+            slots.release()
+            raise
+        future.add_done_callback(release_slot)
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout=timeout or self.timeout
+            )
+        except asyncio.TimeoutError:
+            future.cancel()
+            logger.error(f"Extraction job {getattr(fn, '__name__', fn)} timed out")
+            raise ExtractionTimeout("Extraction timed out.")
+        except BrokenProcessPool:
+            self._reset_pool()
+            raise
+        except asyncio.CancelledError:
+            # Drops the job if it has not started; a running job finishes in
+            # its worker and its result is discarded.
+            future.cancel()
+            raise
+
+    async def warm_up(self, fn: Callable, *args: Any):
+        """
+        Start every worker process and run `fn(*args)` (e.g. an import) in
+        each, so the first real job does not pay for the process spawn.
+        """
+        await asyncio.gather(*(self.run(fn, *args) for _ in range(self.max_workers)))
+
+    def shutdown(self):
+        """Stop the worker processes, dropping any queued jobs."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        self._slots = None
+
+
+# Initialize the extraction executor
+extraction_executor = ExtractionExecutor(
+    max_workers=settings.EXTRACTION_WORKERS,
+    queue_size=settings.EXTRACTION_QUEUE_SIZE,
+    timeout=settings.EXTRACTION_TIMEOUT,
+)
+registry.gauge("extraction_jobs_in_flight", "Extraction jobs running or queued in the process pool.",
+               function=lambda: extraction_executor.in_flight)
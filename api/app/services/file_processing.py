@@ -1,151 +1,368 @@
 # app/services/file_processing.py
 
-from typing import List, Dict
+from types import ModuleType
+from typing import AsyncIterator, Callable, List, Dict, Optional, Tuple, Union
 import asyncio
-import base64
+import importlib
 import logging
-from PyPDF2 import PdfReader
-from docx import Document
-import pytesseract
-from PIL import Image
-import io
 import hashlib
+import os
+import time
+from app.core.config import settings
+from app.core.metrics import EXTRACTION_FAILURES_TOTAL, EXTRACTION_SECONDS, IMAGE_OCR_SKIPPED_TOTAL
+from app.services.extraction_cache import extraction_cache
+from app.services.extraction_executor import (
+    ExtractionQueueFull,
+    ExtractionTimeout,
+    extraction_executor,
+)
+from app.services.image_index import image_index
+from app.services.upload_store import upload_store
+from app.utils.file_utils import open_source
 
 logger = logging.getLogger(__name__)
 
-async def process_files(files: List[Dict]) -> List[Dict]:
+# Extractor modules by kind. They are imported on first use of a matching
+# MIME type, so a worker that only serves chat never loads PyPDF2, PIL or
+# Tesseract.
+EXTRACTOR_MODULES = {
+    "image": "app.services.ocr_engine",
+    "pdf": "app.services.pdf_extraction",
+    "docx": "app.services.docx_extraction",
+}
+
+# Fallback values returned by the extractors; never cached.
+EXTRACTION_FAILURES = {
+    "OCR failed",
+    "PDF text extraction failed",
+    "DOCX text extraction failed",
+}
+
+async def process_files(files: List[Dict], block: bool = True) -> List[Dict]:
     """
     Process uploaded files and extract text where applicable.
     Supports images (OCR), PDFs, DOC/DOCX, and plain text files.
+
+    With `block=False`, raises `ExtractionQueueFull` instead of waiting when
+    the extraction pool is saturated.
     """
     processed_results = []
 
-    tasks = [process_file(file, idx) for idx, file in enumerate(files)]
+    tasks = [process_file(file, idx, block) for idx, file in enumerate(files)]
     processed_results = await asyncio.gather(*tasks, return_exceptions=True)
 
+    for result in processed_results:
+        if isinstance(result, ExtractionQueueFull):
+            raise result
+
     # Log any exceptions and filter results
     for idx, result in enumerate(processed_results):
         if isinstance(result, Exception):
             logger.error(f"Error processing file at index {idx}: {result}")
-            processed_results[idx] = {
-                "type": "file",
-                "text": "Processing Failed",
-                "status": "Failed",
-                "file_name": files[idx].get("file_name", "Unknown"),
-                "error": str(result),
-            }
+            processed_results[idx] = build_failed_result(files[idx], result)
 
     return processed_results
 
 
-async def process_file(file: Dict, idx: int) -> Dict:
+async def iter_processed_files(files: List[Dict]) -> AsyncIterator[Dict]:
+    """
+    Process uploaded files concurrently and yield each result as soon as it
+    is ready, in completion order. Each result carries the file's `index`
+    in `files`; failures are yielded as failed results rather than raised.
+    Closing the iterator early cancels the files still being processed.
+
+    Files wait for a free extraction worker instead of failing when the
+    pool is saturated, since the caller already receives progress.
+    """
+    async def run(idx: int, file: Dict) -> Dict:
+        try:
+            result = await process_file(file, idx)
+        except Exception as e:
+            result = build_failed_result(file, e)
+        return {"index": idx, **result}
+
+    tasks = [asyncio.create_task(run(idx, file)) for idx, file in enumerate(files)]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def build_failed_result(file: Dict, error: Exception) -> Dict:
+    """
+    Build the result entry returned to clients for a file that failed.
+    """
+    return {
+        "type": "file",
+        "text": "Processing Failed",
+        "status": "Failed",
+        "file_name": file.get("file_name", "Unknown"),
+        "error": str(error),
+    }
+
+
+DOCX_MIME_TYPES = [
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/msword",
+    "application/rtf",
+    "text/rtf",
+]
+
+
+def load_extractor(kind: str) -> ModuleType:
+    """Import the extractor module for `kind` (once per process) and return it."""
+    name = EXTRACTOR_MODULES[kind]
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - started
+    if elapsed > 0.01:
+        logger.info(f"Loaded {kind} extractor ({name}) in {elapsed:.2f}s")
+    return module
+
+
+def load_extractors(kinds: List[str]):
+    """Import several extractor modules; run in pool workers during warm-up."""
+    for kind in kinds:
+        load_extractor(kind)
+
+
+async def process_file(file: Dict, idx: int, block: bool = True) -> Dict:
     """
     Process a single file based on its MIME type.
+    The file is given either as a stored `path` (with its `file_id`) or as
+    in-memory `data`.
     """
     file_name = file.get("file_name")
     if not file_name:
         raise ValueError(f"File name is missing for file at index {idx}")
 
     mime_type = file["mime_type"]
-    data = file["data"]
+    data = file.get("path") or file["data"]
+    file_id = file.get("file_id") or await asyncio.to_thread(generate_file_id, data)
+    extra: Dict = {}
 
     try:
         if mime_type.startswith("image/"):
-            extracted_text = await perform_ocr(data)
-            return {
-                "type": "image",
-                "text": f"Image file (OCR)",
-                "status": "Processed",
-                "file_name": file_name,
-                "extracted_text": extracted_text,
-                "image": f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}",
-            }
+            extracted_text, extra = await process_image(file, data, file_id, block)
 
         elif mime_type == "application/pdf":
-            extracted_text = await extract_text_from_pdf(data)
-            return {
-                "type": "file",
-                "text": "PDF Document",
-                "status": "Processed",
-                "file_name": file_name,
-                "extracted_text": extracted_text,
-                "file_id": generate_file_id(data),
-            }
-
-        elif mime_type in [
-            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            "application/msword",
-        ]:
-            extracted_text = await extract_text_from_docx(data)
-            return {
-                "type": "file",
-                "text": "Word Document",
-                "status": "Processed",
-                "file_name": file_name,
-                "extracted_text": extracted_text,
-                "file_id": generate_file_id(data),
-            }
+            extracted_text = await cached_extract(extract_text_from_pdf, data, mime_type, file_id, block)
+
+        elif mime_type in DOCX_MIME_TYPES:
+            extracted_text = await cached_extract(extract_text_from_docx, data, mime_type, file_id, block)
 
         elif mime_type == "text/plain":
-            extracted_text = data.decode("utf-8")
-            return {
-                "type": "file",
-                "text": "Text File",
-                "status": "Processed",
-                "file_name": file_name,
-                "extracted_text": extracted_text,
-                "file_id": generate_file_id(data),
-            }
+            extracted_text = await asyncio.to_thread(_read_text, data)
 
         else:
             raise ValueError(f"Unsupported file type: {mime_type}")
 
+        return build_file_result(file, file_id, extracted_text, extra)
+
     except Exception as e:
+        if not isinstance(e, ExtractionQueueFull):
+            EXTRACTION_FAILURES_TOTAL.inc(mime_type)
         logger.error(f"Error processing file at index {idx}: {e}")
         raise
 
 
-async def perform_ocr(image_data: bytes) -> str:
+def build_file_result(file: Dict, file_id: str, extracted_text: str, extra: Optional[Dict] = None) -> Dict:
+    """
+    Build the result entry returned to clients for a processed file, with
+    any type-specific `extra` fields.
+    """
+    mime_type = file["mime_type"]
+    if mime_type.startswith("image/"):
+        result = {"type": "image", "text": "Image file (OCR)"}
+    elif mime_type == "application/pdf":
+        result = {"type": "file", "text": "PDF Document"}
+    elif mime_type in DOCX_MIME_TYPES:
+        result = {"type": "file", "text": "Word Document"}
+    else:
+        result = {"type": "file", "text": "Text File"}
+
+    result.update({
+        "status": "Processed",
+        "file_name": file.get("file_name"),
+        "extracted_text": extracted_text,
+        "file_id": file_id,
+        "url": upload_store.url_for(file_id) if file.get("path") else None,
+    })
+    if mime_type == "application/pdf":
+        result["pages"] = load_extractor("pdf").page_offsets(extracted_text)
+    result.update(extra or {})
+    return result
+
+
+async def cached_extract(extractor, data: Union[bytes, str], mime_type: str, file_id: str, block: bool = True) -> str:
+    """
+    Return cached extracted text for `file_id`, running `extractor` on a miss.
+    """
+    extracted_text = await extraction_cache.get(file_id, mime_type)
+    if extracted_text is not None:
+        return extracted_text
+    return await extract_and_cache(extractor, data, mime_type, file_id, block)
+
+
+async def extract_and_cache(extractor, data: Union[bytes, str], mime_type: str, file_id: str, block: bool = True) -> str:
+    """
+    Run `extractor` and cache its text for `file_id`, unless it failed.
+    """
+    started = time.perf_counter()
+    extracted_text = await extractor(data, block)
+    EXTRACTION_SECONDS.observe(time.perf_counter() - started, mime_type)
+    if extracted_text in EXTRACTION_FAILURES:
+        EXTRACTION_FAILURES_TOTAL.inc(mime_type)
+    else:
+        await extraction_cache.set(file_id, mime_type, extracted_text)
+    return extracted_text
+
+
+async def process_image(file: Dict, data: Union[bytes, str], file_id: str, block: bool = True) -> Tuple[str, Dict]:
     """
-    Perform OCR on image data to extract text.
+    Extract the text of an image and thumbnail stored uploads.
+
+    Unless the text is cached, the image is first hashed and scored in the
+    extraction pool (a reduced-size decode, far cheaper than OCR). OCR is
+    then skipped when the image shows too little text-like content, or
+    when it is a copy of an image already OCR'd, whose text is reused: a
+    close perceptual hash picks the candidate and a pixel comparison with
+    its stored upload confirms it. Returns the text and the fields to add to the file result.
+    """
+    mime_type = file["mime_type"]
+    extra: Dict = {}
+    extracted_text = await extraction_cache.get(file_id, mime_type)
+    thumbnail_path = upload_store.thumbnail_path(file_id) if file.get("path") else None
+    has_thumbnail = bool(thumbnail_path) and await asyncio.to_thread(os.path.exists, thumbnail_path)
+
+    analysis = None
+    if extracted_text is None or (thumbnail_path and not has_thumbnail):
+        try:
+            analysis = await load_extractor("image").analyze_image(
+                data, None if has_thumbnail else thumbnail_path, block
+            )
+            has_thumbnail = bool(thumbnail_path)
+            extra.update({"width": analysis["width"], "height": analysis["height"]})
+        except (ExtractionQueueFull, ExtractionTimeout):
+            raise
+        except Exception as e:
+            logger.warning(f"Image analysis failed for '{file_id}': {e}")
+
+    if extracted_text is None and analysis is not None:
+        if analysis["text_score"] < settings.IMAGE_MIN_TEXT_SCORE:
+            IMAGE_OCR_SKIPPED_TOTAL.inc("no_text")
+            extracted_text = ""
+        else:
+            # The hash only finds a candidate; its text is reused once the pixels match
+            match = image_index.find(analysis["phash"])
+            original = await asyncio.to_thread(upload_store.path_for, match[0]) if match is not None else None
+            if original and await load_extractor("image").confirm_duplicate(data, original, block):
+                extracted_text = await extraction_cache.get(match[0], match[1])
+            if extracted_text is not None:
+                IMAGE_OCR_SKIPPED_TOTAL.inc("duplicate")
+                extra["duplicate_of"] = match[0]
+        if extracted_text is not None:
+            await extraction_cache.set(file_id, mime_type, extracted_text)
+
+    if extracted_text is None:
+        extracted_text = await extract_and_cache(perform_ocr, data, mime_type, file_id, block)
+        if analysis is not None and extracted_text not in EXTRACTION_FAILURES:
+            image_index.add(file_id, analysis["phash"], mime_type)
+
+    extra["thumbnail_url"] = upload_store.thumbnail_url(file_id) if has_thumbnail else None
+    return extracted_text, extra
+
+
+async def perform_ocr(image_data: Union[bytes, str], block: bool = True) -> str:
+    """
+    Perform OCR on image data in the extraction pool, tiling large images
+    across workers.
     """
     try:
-        image = Image.open(io.BytesIO(image_data))
-        extracted_text = pytesseract.image_to_string(image)
-        return extracted_text.strip()
+        return await load_extractor("image").ocr_image(image_data, block)
+    except (ExtractionQueueFull, ExtractionTimeout):
+        raise
     except Exception as e:
         logger.error(f"OCR failed: {e}")
         return "OCR failed"
 
 
-async def extract_text_from_pdf(pdf_data: bytes) -> str:
+async def extract_text_from_pdf(pdf_data: Union[bytes, str], block: bool = True) -> str:
     """
-    Extract text from PDF data.
+    Extract text from PDF data, splitting page ranges across the extraction
+    pool. Pages are separated by form feeds.
     """
+    pdf_extraction = load_extractor("pdf")
     try:
-        reader = PdfReader(io.BytesIO(pdf_data))
-        text = "\n".join(
-            page.extract_text() for page in reader.pages if page.extract_text()
-        )
-        return text.strip()
+        pages = await pdf_extraction.extract_pdf_pages(pdf_data, block)
+    except (ExtractionQueueFull, ExtractionTimeout):
+        raise
     except Exception as e:
         logger.error(f"PDF text extraction failed: {e}")
         return "PDF text extraction failed"
+    return pdf_extraction.join_pages(pages)
+
+
+async def extract_text_from_docx(docx_data: Union[bytes, str], block: bool = True) -> str:
+    """
+    Extract text from DOCX or DOC data in the extraction pool.
+    """
+    return await extraction_executor.run(_extract_text_from_docx, docx_data, block=block)
 
 
-async def extract_text_from_docx(docx_data: bytes) -> str:
+def extract_text_sync(
+    data: Union[bytes, str], mime_type: str, progress: Optional[Callable[[int, int], None]] = None
+) -> str:
     """
-    Extract text from DOCX or DOC data.
+    Extract text in the calling process, dispatching by MIME type.
+    Used by background workers; `progress(done, total)` reports PDF pages.
+    """
+    if mime_type.startswith("image/"):
+        return _perform_ocr(data)
+    if mime_type == "application/pdf":
+        pdf_extraction = load_extractor("pdf")
+        try:
+            return pdf_extraction.join_pages(pdf_extraction.extract_pdf_pages_sync(data, progress))
+        except Exception as e:
+            logger.error(f"PDF text extraction failed: {e}")
+            return "PDF text extraction failed"
+    if mime_type in DOCX_MIME_TYPES:
+        return _extract_text_from_docx(data)
+    if mime_type == "text/plain":
+        return _read_text(data)
+    raise ValueError(f"Unsupported file type: {mime_type}")
+
+
+def _perform_ocr(image_data: Union[bytes, str]) -> str:
+    """
+    Perform OCR on image data (bytes or a file path) to extract text.
     """
     try:
-        document = Document(io.BytesIO(docx_data))
-        text = "\n".join([para.text for para in document.paragraphs])
-        return text.strip()
+        return load_extractor("image").ocr_image_sync(image_data)
+    except Exception as e:
+        logger.error(f"OCR failed: {e}")
+        return "OCR failed"
+
+
+def _extract_text_from_docx(docx_data: Union[bytes, str]) -> str:
+    """
+    Extract text from DOCX, DOC or RTF data (bytes or a file path).
+    """
+    try:
+        return load_extractor("docx").extract_word_text(docx_data)
     except Exception as e:
         logger.error(f"DOCX text extraction failed: {e}")
         return "DOCX text extraction failed"
 
 
+def _read_text(data: Union[bytes, str]) -> str:
+    with open_source(data) as stream:
+        return stream.read().decode("utf-8")
+
+
 def generate_file_id(data: bytes) -> str:
     """
     Generate a unique file ID for storage and retrieval.
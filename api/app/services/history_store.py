@@ -0,0 +1,156 @@
+# app/services/history_store.py
+
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+
+from redis.exceptions import WatchError
+
+from app.core.config import settings
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryStore:
+    """
+    Conversation history kept as a Redis list, one JSON message per item.
+
+    Appends, trimming to `max_messages` and TTL refresh are sent as one
+    MULTI/EXEC pipeline, so concurrent turns never overwrite each other and
+    the cost of a turn does not grow with the conversation. Reads fetch
+    only the last N messages.
+
+    Conversations stored by earlier versions as a single JSON string under
+    the bare conversation ID are migrated on first read.
+    """
+
+    def __init__(self, max_messages: int, ttl: int, key_prefix: str = "history:"):
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+
+    def make_key(self, conversation_id) -> str:
+        return f"{self.key_prefix}{conversation_id}"
+
+    async def append(self, conversation_id, *messages: Dict):
+        """Atomically append messages, trim the list and refresh its TTL."""
+        if not messages:
+            return
+        redis = await redis_service.client()
+        key = self.make_key(conversation_id)
+        try:
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.rpush(key, *[json.dumps(message) for message in messages])
+                pipe.ltrim(key, -self.max_messages, -1)
+                pipe.incrby(f"{key}:count", len(messages))
+                if self.ttl > 0:
+                    pipe.expire(key, self.ttl)
+                    pipe.expire(f"{key}:count", self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logging.error(f"Error appending history for '{conversation_id}': {e}")
+            raise
+
+    async def get_recent(self, conversation_id, limit: Optional[int] = None) -> List[Dict]:
+        """Return the last `limit` messages (all stored messages if None)."""
+        messages, _ = await self.get_recent_with_offset(conversation_id, limit)
+        return messages
+
+    async def get_recent_with_offset(
+        self, conversation_id, limit: Optional[int] = None
+    ) -> Tuple[List[Dict], int]:
+        """
+        Return the last `limit` messages and the absolute position of the first
+        of them in the conversation, which stays stable as old messages are trimmed.
+        """
+        redis = await redis_service.client()
+        key = self.make_key(conversation_id)
+        start = -limit if limit else 0
+        try:
+            items, total = await self._read(redis, key, start)
+            if not items and await self.migrate(conversation_id):
+                items, total = await self._read(redis, key, start)
+        except Exception as e:
+            logging.error(f"Error reading history for '{conversation_id}': {e}")
+            return [], 0
+        return [json.loads(item) for item in items], max(0, total - len(items))
+
+    @staticmethod
+    async def _read(redis, key: str, start: int) -> Tuple[List[str], int]:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.lrange(key, start, -1)
+            pipe.llen(key)
+            pipe.get(f"{key}:count")
+            items, length, count = await pipe.execute()
+        return items, int(count) if count else length
+
+    async def delete(self, conversation_id):
+        redis = await redis_service.client()
+        key = self.make_key(conversation_id)
+        await redis.delete(key, f"{key}:count")
+
+    async def migrate(self, conversation_id) -> bool:
+        """
+        Move a legacy JSON-string history into the list representation.
+        Returns True if anything was migrated.
+        """
+        redis = await redis_service.client()
+        legacy_key = str(conversation_id)
+        key = self.make_key(conversation_id)
+        try:
+            async with redis.pipeline(transaction=True) as pipe:
+                await pipe.watch(legacy_key)
+                if await pipe.type(legacy_key) != "string":
+                    return False
+                messages = _parse_legacy(await pipe.get(legacy_key))
+                if messages is None:
+                    return False
+
+                pipe.multi()
+                if messages:
+                    pipe.rpush(key, *[json.dumps(message) for message in messages])
+                    pipe.ltrim(key, -self.max_messages, -1)
+                    pipe.incrby(f"{key}:count", len(messages))
+                    if self.ttl > 0:
+                        pipe.expire(key, self.ttl)
+                        pipe.expire(f"{key}:count", self.ttl)
+                pipe.delete(legacy_key)
+                await pipe.execute()
+        except WatchError:
+            # Another worker migrated (or rewrote) the key first.
+            return False
+
+        logger.info(f"Migrated {len(messages)} history messages for '{conversation_id}'")
+        return True
+
+    async def migrate_all(self) -> int:
+        """Migrate every legacy history key. Returns the number of conversations migrated."""
+        redis = await redis_service.client()
+        migrated = 0
+        async for key in redis.scan_iter(_type="string"):
+            if ":" in key:
+                continue  # namespaced keys (caches etc.) are never histories
+            if await self.migrate(key):
+                migrated += 1
+        return migrated
+
+
+def _parse_legacy(raw: Optional[str]) -> Optional[List[Dict]]:
+    """Decode a legacy history value, or None if it is not a message list."""
+    try:
+        value = json.loads(raw) if raw else None
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(value, list):
+        return None
+    if not all(isinstance(item, dict) and "role" in item for item in value):
+        return None
+    return value
+
+
+# Initialize the history store
+history_store = HistoryStore(
+    max_messages=settings.HISTORY_MAX_MESSAGES,
+    ttl=settings.HISTORY_TTL,
+)
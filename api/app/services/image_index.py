@@ -0,0 +1,66 @@
+# app/services/image_index.py
+
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+# Size of the perceptual hashes from `ocr_engine.perceptual_hash`.
+HASH_BYTES = 32
+
+
+class ImageHashIndex:
+    """
+    In-process index of the perceptual hashes of OCR'd images, used to find
+    near-duplicates (re-sent screenshots, rescans of the same page) whose
+    extracted text can be reused. Keeps the `max_entries` most recently
+    added images; lookups compare against all of them at once.
+    """
+
+    def __init__(self, max_entries: int, max_distance: int):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._entries: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._hashes: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, file_id: str, phash: int, mime_type: str):
+        if self.max_entries <= 0:
+            return
+        self._entries[file_id] = (phash.to_bytes(HASH_BYTES, "big"), mime_type)
+        self._entries.move_to_end(file_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._hashes = None
+
+    def find(self, phash: int) -> Optional[Tuple[str, str, int]]:
+        """Return `(file_id, mime_type, distance)` of the closest image within `max_distance` bits."""
+        if self.max_distance < 0 or not self._entries:
+            return None
+        if self._hashes is None:
+            self._hashes = np.frombuffer(b"".join(h for h, _ in self._entries.values()), dtype=np.uint8)
+            self._hashes = self._hashes.reshape(-1, HASH_BYTES)
+        query = np.frombuffer(phash.to_bytes(HASH_BYTES, "big"), dtype=np.uint8)
+        distances = np.unpackbits(self._hashes ^ query, axis=1).sum(axis=1)
+        best = int(np.argmin(distances))
+        if distances[best] > self.max_distance:
+            return None
+        file_id = list(self._entries)[best]
+        return file_id, self._entries[file_id][1], int(distances[best])
+
+    def clear(self):
+        self._entries.clear()
+        self._hashes = None
+
+
+# Initialize the image hash index
+image_index = ImageHashIndex(
+    max_entries=settings.IMAGE_INDEX_MAX_ENTRIES,
+    max_distance=settings.IMAGE_DUPLICATE_DISTANCE,
+)
+registry.gauge("image_index_entries", "Images in the near-duplicate hash index.", function=lambda: len(image_index))
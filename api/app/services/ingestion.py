@@ -0,0 +1,160 @@
+# app/services/ingestion.py
+
+from typing import Dict, Optional
+import asyncio
+import json
+import logging
+import uuid
+
+import redis
+import socketio
+
+from app.celery_app import celery
+from app.core.config import settings
+from app.services.redis_service import redis_service
+from app.sockets.base import sio
+
+logger = logging.getLogger(__name__)
+
+INGESTION_CHANNEL = "ingestion-events"
+CHAT_NAMESPACE = "/chat-socket"
+
+
+class IngestionEventRelay:
+    """
+    Carries ingestion events from Celery workers to the Socket.IO client
+    that submitted the job.
+
+    With a Socket.IO message queue (`message_queue`), workers emit through
+    it directly, like any other process sharing the queue. Without one,
+    workers publish events on a Redis channel; every API process subscribes
+    and emits them to the target `sid` (only the process holding that
+    connection delivers them). With eager Celery the task runs inside the
+    API process, so events are handed straight to its event loop instead.
+    """
+
+    def __init__(self, channel: str, message_queue: str = "", socketio_channel: str = "socketio"):
+        self.channel = channel
+        self.message_queue = message_queue
+        self.socketio_channel = socketio_channel
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._publisher: Optional[redis.Redis] = None
+        self._emitter: Optional[socketio.RedisManager] = None
+
+    def publish(self, sid: Optional[str], event: str, payload: Dict):
+        """Send an event to `sid`. Blocking; called from worker code."""
+        if not sid:
+            return
+        message = {"sid": sid, "event": event, "payload": payload}
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._emit(message), self._loop)
+            return
+        try:
+            if self.message_queue:
+                if self._emitter is None:
+                    self._emitter = socketio.RedisManager(
+                        self.message_queue, channel=self.socketio_channel, write_only=True
+                    )
+                self._emitter.emit(event, payload, room=sid, namespace=CHAT_NAMESPACE)
+                return
+            if self._publisher is None:
+                self._publisher = redis.Redis.from_url(redis_service.redis_url)
+            self._publisher.publish(self.channel, json.dumps(message))
+        except Exception as e:
+            logger.error(f"Failed to publish ingestion event '{event}': {e}")
+
+    async def start(self):
+        """Start relaying events. Called from the app startup event."""
+        if celery.conf.task_always_eager:
+            self._loop = asyncio.get_running_loop()
+        elif self._listener is None and not self.message_queue:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """Stop relaying events. Called from the app shutdown event."""
+        self._loop = None
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+    async def _listen(self):
+        while True:
+            try:
+                client = await redis_service.client()
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            await self._emit(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion event relay error, resubscribing: {e}")
+                await asyncio.sleep(1)
+
+    @staticmethod
+    async def _emit(message: Dict):
+        await sio.emit(message["event"], message["payload"], room=message["sid"], namespace=CHAT_NAMESPACE)
+
+
+async def submit_ingestion(file: Dict, sid: Optional[str] = None) -> str:
+    """
+    Queue a stored file for background extraction and return its job ID
+    without waiting for the job to run.
+    """
+    from app.tasks import ingest_file_task
+
+    job_id = str(uuid.uuid4())
+    submit = lambda: ingest_file_task.apply_async(args=[file, sid], task_id=job_id)
+    if celery.conf.task_always_eager:
+        # Eager tasks run where they are submitted: keep them off the event loop
+        # and do not wait for them.
+        running = asyncio.get_running_loop().run_in_executor(None, submit)
+        running.add_done_callback(lambda done: _report_submit_failure(done, job_id, file, sid))
+    else:
+        await asyncio.to_thread(submit)
+    return job_id
+
+
+def _report_submit_failure(done: asyncio.Future, job_id: str, file: Dict, sid: Optional[str]):
+    """
+    Mark an eager job whose submission raised as failed, so its status and
+    the submitting client see the error instead of a job that never ends.
+    """
+    if done.cancelled() or done.exception() is None:
+        return
+    error = done.exception()
+    logger.error(f"Failed to run ingestion job '{job_id}': {error}")
+    try:
+        celery.backend.mark_as_failure(job_id, error)
+    except Exception as e:
+        logger.error(f"Failed to record the failure of ingestion job '{job_id}': {e}")
+    ingestion_relay.publish(
+        sid, "ingestionFailed", {"job_id": job_id, "file_name": file.get("file_name"), "error": str(error)}
+    )
+
+
+async def get_job_status(job_id: str) -> Dict:
+    """Return the state, progress and (when finished) result of a job."""
+    def read() -> Dict:
+        result = celery.AsyncResult(job_id)
+        status = {"job_id": job_id, "state": result.state}
+        if result.state == "PROGRESS":
+            status["progress"] = result.info
+        elif result.state == "SUCCESS":
+            status["result"] = result.result
+        elif result.state == "FAILURE":
+            status["error"] = str(result.result)
+        return status
+
+    return await asyncio.to_thread(read)
+
+
+# Initialize the ingestion event relay
+ingestion_relay = IngestionEventRelay(
+    INGESTION_CHANNEL,
+    message_queue=settings.SOCKETIO_MESSAGE_QUEUE,
+    socketio_channel=settings.SOCKETIO_CHANNEL,
+)
@@ -0,0 +1,329 @@
+# app/services/llm_router.py
+
+from typing import AsyncIterator, Awaitable, Callable, Dict, FrozenSet, List, Optional
+import asyncio
+import logging
+import re
+import time
+
+import aiohttp
+
+from app.core.config import settings
+from app.core.metrics import OLLAMA_BACKEND_ERRORS_TOTAL, OLLAMA_BACKEND_HEALTHY, registry
+from app.services.ollama_client import OllamaBusy, OllamaClient, OllamaResponseError
+
+logger = logging.getLogger(__name__)
+
+
+def parse_backends(spec: str) -> List[Dict]:
+    """
+    Parse `url=model|model@capacity,...` into backend definitions. Models
+    and capacity are optional: a backend without models serves any model,
+    and one without capacity gets OLLAMA_MAX_CONCURRENCY.
+    """
+    backends = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        capacity = None
+        match = re.search(r"@(\d+)$", item)
+        if match:
+            capacity, item = int(match.group(1)), item[:match.start()]
+        url, _, models = item.partition("=")
+        backends.append({
+            "url": url.strip(),
+            "models": [model.strip() for model in models.split("|") if model.strip()],
+            "capacity": capacity,
+        })
+    return backends
+
+
+def is_backend_failure(error: Exception) -> bool:
+    """
+    Whether `error` says the backend is unwell (connection errors, timeouts
+    and 5xx answers) rather than that the request was bad. Only these count
+    towards ejection and are retried on another backend.
+    """
+    if isinstance(error, OllamaResponseError):
+        return error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+class Backend:
+    """One Ollama server: its client, the models it serves and its health."""
+
+    def __init__(self, client: OllamaClient, models: FrozenSet[str]):
+        self.client = client
+        self.models = models
+        self.healthy = True
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.last_error = ""
+
+    @property
+    def url(self) -> str:
+        return self.client.base_url
+
+    @property
+    def load(self) -> float:
+        """Outstanding requests (running and queued) per generation slot."""
+        return (self.client.in_flight + self.client.queue_depth) / self.client.max_concurrency
+
+    def serves(self, model: Optional[str]) -> bool:
+        return not self.models or not model or model in self.models
+
+    def available(self, now: float) -> bool:
+        # An ejected backend gets a trial request once its ejection expires,
+        # even when no health check has readmitted it yet.
+        return self.healthy or now >= self.ejected_until
+
+    def stats(self) -> Dict:
+        return {
+            "url": self.url,
+            "models": sorted(self.models),
+            "healthy": self.healthy,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            **self.client.stats(),
+        }
+
+
+class LLMRouter:
+    """
+    Spreads Ollama requests over several backends.
+
+    Each request goes to the backend serving its model with the fewest
+    outstanding requests per slot; ties go to the backend listed first.
+    Errors fail over to the next backend, and so do `OllamaBusy`
+    rejections. A streamed reply fails over only until its first chunk.
+    A backend is ejected after `eject_after` consecutive errors and
+    readmitted by a successful health check, or by a trial request
+    `eject_seconds` later. Health checks run every `health_interval`
+    seconds when there is more than one backend.
+
+    `choose_model` picks the model for a chat turn: `document_model` when
+    documents are attached, `small_model` for questions of at most
+    `small_max_chars` characters, `default_model` otherwise.
+    """
+
+    def __init__(
+        self,
+        backends: List[Backend],
+        default_model: str,
+        small_model: str = "",
+        small_max_chars: int = 0,
+        document_model: str = "",
+        eject_after: int = 2,
+        eject_seconds: float = 30.0,
+        health_interval: float = 10.0,
+    ):
+        self.backends = backends
+        self.default_model = default_model
+        self.small_model = small_model
+        self.small_max_chars = small_max_chars
+        self.document_model = document_model or default_model
+        self.eject_after = max(1, eject_after)
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+        self._health_task: Optional[asyncio.Task] = None
+        for backend in backends:
+            OLLAMA_BACKEND_HEALTHY.set(1, backend.url)
+
+    @property
+    def in_flight(self) -> int:
+        return sum(backend.client.in_flight for backend in self.backends)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(backend.client.queue_depth for backend in self.backends)
+
+    def stats(self) -> List[Dict]:
+        return [backend.stats() for backend in self.backends]
+
+    def models(self) -> List[str]:
+        """The models chat turns can be routed to."""
+        return list(dict.fromkeys(m for m in (self.default_model, self.document_model, self.small_model) if m))
+
+    def choose_model(self, question: str, has_documents: bool = False) -> str:
+        if has_documents:
+            return self.document_model
+        if self.small_model and len(question.strip()) <= self.small_max_chars:
+            return self.small_model
+        return self.default_model
+
+    def candidates(self, model: Optional[str]) -> List[Backend]:
+        """Backends serving `model`, least loaded first; ejected ones only as a last resort."""
+        serving = [backend for backend in self.backends if backend.serves(model)]
+        if not serving:
+            raise ValueError(f"No Ollama backend serves model '{model}'.")
+        now = time.monotonic()
+        available = [backend for backend in serving if backend.available(now)]
+        return sorted(available or serving, key=lambda backend: backend.load)
+
+    def _succeeded(self, backend: Backend):
+        backend.failures = 0
+        if not backend.healthy:
+            self._readmit(backend)
+
+    def _failed(self, backend: Backend, error: Exception):
+        OLLAMA_BACKEND_ERRORS_TOTAL.inc(backend.url)
+        backend.failures += 1
+        backend.last_error = str(error) or type(error).__name__
+        if backend.failures >= self.eject_after or not backend.healthy:
+            if backend.healthy:
+                logger.warning(f"Ejecting Ollama backend {backend.url}: {backend.last_error}")
+            backend.healthy = False
+            backend.ejected_until = time.monotonic() + self.eject_seconds
+            OLLAMA_BACKEND_HEALTHY.set(0, backend.url)
+
+    def _readmit(self, backend: Backend):
+        logger.info(f"Readmitting Ollama backend {backend.url}")
+        backend.healthy = True
+        backend.failures = 0
+        OLLAMA_BACKEND_HEALTHY.set(1, backend.url)
+
+    async def _route(self, model: Optional[str], request: Callable[[OllamaClient], Awaitable]):
+        busy, error = None, None
+        for backend in self.candidates(model):
+            try:
+                result = await request(backend.client)
+            except OllamaBusy as e:
+                busy = e
+                continue
+            except Exception as e:
+                if not is_backend_failure(e):
+                    raise
+                self._failed(backend, e)
+                error = e
+                logger.warning(f"Ollama backend {backend.url} failed ({e}); trying the next one")
+                continue
+            self._succeeded(backend)
+            return result
+        raise busy or error
+
+    async def chat(self, payload: Dict, timeout: Optional[float] = None) -> Dict:
+        return await self._route(payload.get("model"), lambda client: client.chat(payload, timeout))
+
+    async def post_json(self, path: str, payload: Dict, timeout: Optional[float] = None) -> Dict:
+        return await self._route(payload.get("model"), lambda client: client.post_json(path, payload, timeout))
+
+    async def stream_chat(self, payload: Dict, timeout: Optional[float] = None) -> AsyncIterator[Dict]:
+        """Stream a chat reply; call `aclose()` on the result if abandoning it early."""
+        busy, error = None, None
+        for backend in self.candidates(payload.get("model")):
+            stream = backend.client.stream_chat(payload, timeout)
+            started = False
+            try:
+                async for chunk in stream:
+                    started = True
+                    yield chunk
+            except OllamaBusy as e:
+                busy = e
+                continue
+            except Exception as e:
+                if not is_backend_failure(e):
+                    raise
+                self._failed(backend, e)
+                if started:
+                    raise
+                error = e
+                logger.warning(f"Ollama backend {backend.url} failed ({e}); trying the next one")
+                continue
+            finally:
+                await stream.aclose()
+            self._succeeded(backend)
+            return
+        raise busy or error
+
+    async def preload(self, model: str, timeout: Optional[float] = None) -> int:
+        """Load `model` on every backend serving it; returns how many loaded it."""
+        backends = [backend for backend in self.backends if backend.serves(model)]
+        results = await asyncio.gather(
+            *(backend.client.preload(model, timeout) for backend in backends), return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        for backend, result in zip(backends, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to load '{model}' on {backend.url}: {result}")
+        if len(errors) == len(backends):
+            raise errors[0] if errors else ValueError(f"No Ollama backend serves model '{model}'.")
+        return len(backends) - len(errors)
+
+    async def prime(self):
+        """Open pooled connections to every backend, one per generation slot."""
+        await asyncio.gather(*(backend.client.prime(backend.client.max_concurrency) for backend in self.backends))
+
+    async def check_health(self):
+        """Probe every backend once, ejecting or readmitting it."""
+        async def probe(backend: Backend):
+            try:
+                await backend.client.tags(timeout=5)
+            except Exception as e:
+                self._failed(backend, e)
+                return
+            if not backend.healthy:
+                self._readmit(backend)
+
+        await asyncio.gather(*(probe(backend) for backend in self.backends))
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.error(f"Ollama health check failed: {e}")
+
+    async def start(self):
+        """Open the pooled sessions and start health checks. Called from the app startup event."""
+        for backend in self.backends:
+            await backend.client.start()
+        if len(self.backends) > 1 and self.health_interval > 0 and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        """Stop health checks and close the sessions. Called from the app shutdown event."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        for backend in self.backends:
+            await backend.client.close()
+
+
+def create_backends(spec: str) -> List[Backend]:
+    """Build the backends from OLLAMA_BACKENDS, or the single OLLAMA_URL when it is empty."""
+    definitions = parse_backends(spec) or [{"url": settings.OLLAMA_URL, "models": [], "capacity": None}]
+    return [
+        Backend(
+            OllamaClient(
+                base_url=definition["url"],
+                max_concurrency=definition["capacity"] or settings.OLLAMA_MAX_CONCURRENCY,
+                max_queue=settings.OLLAMA_MAX_QUEUE,
+                timeout=settings.OLLAMA_TIMEOUT,
+                retries=settings.OLLAMA_RETRIES,
+                pool_size=settings.OLLAMA_POOL_SIZE,
+                keep_alive=settings.OLLAMA_KEEP_ALIVE,
+            ),
+            frozenset(definition["models"]),
+        )
+        for definition in definitions
+    ]
+
+
+# Initialize the LLM router
+llm_router = LLMRouter(
+    create_backends(settings.OLLAMA_BACKENDS),
+    default_model=settings.OLLAMA_MODEL,
+    small_model=settings.OLLAMA_SMALL_MODEL,
+    small_max_chars=settings.OLLAMA_SMALL_MAX_CHARS,
+    document_model=settings.OLLAMA_DOCUMENT_MODEL,
+    eject_after=settings.OLLAMA_EJECT_AFTER,
+    eject_seconds=settings.OLLAMA_EJECT_SECONDS,
+    health_interval=settings.OLLAMA_HEALTH_INTERVAL,
+)
+registry.gauge("ollama_requests_in_flight", "Requests holding an Ollama generation slot.",
+               function=lambda: llm_router.in_flight)
+registry.gauge("ollama_queue_depth", "Requests waiting for an Ollama generation slot.",
+               function=lambda: llm_router.queue_depth)
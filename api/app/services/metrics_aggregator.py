@@ -0,0 +1,105 @@
+# app/services/metrics_aggregator.py
+
+from typing import Dict, Optional
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+
+from app.core.config import settings
+from app.core.metrics import merge_renders, registry
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsAggregator:
+    """
+    Shares the metrics of each API worker through Redis, so a scrape that
+    lands on any worker reports all of them.
+
+    Every `interval` seconds a worker writes its metrics, each sample
+    labelled with its `worker` (`host:pid`), to a Redis hash. `render`
+    merges the entries written in the last `stale_after` seconds and drops
+    older ones, left by workers that have exited. With `interval` 0, or
+    when Redis fails, only this worker's metrics are reported.
+    """
+
+    KEY = "metrics:workers"
+
+    def __init__(self, interval: float, stale_after: float):
+        self.interval = interval
+        self.stale_after = stale_after
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def local(self) -> str:
+        """This worker's metrics, labelled with the worker."""
+        return registry.render({"worker": self.worker})
+
+    async def start(self):
+        """Start sharing this worker's metrics. Called from the app startup event."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._share())
+
+    async def stop(self):
+        """Stop sharing and withdraw this worker's entry. Called from the app shutdown event."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        try:
+            redis = await redis_service.client()
+            await redis.hdel(self.KEY, self.worker)
+        except Exception as e:
+            logger.warning(f"Failed to remove the metrics of worker {self.worker}: {e}")
+
+    async def publish(self):
+        redis = await redis_service.client()
+        await redis.hset(self.KEY, self.worker, json.dumps({"time": time.time(), "text": self.local()}))
+
+    async def _share(self):
+        while True:
+            try:
+                await self.publish()
+            except Exception as e:
+                logger.warning(f"Failed to share the metrics of worker {self.worker}: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def render(self) -> str:
+        """The metrics of every live worker, this one up to date."""
+        if not self.enabled:
+            return self.local()
+        try:
+            await self.publish()
+            redis = await redis_service.client()
+            entries: Dict[str, str] = await redis.hgetall(self.KEY)
+        except Exception as e:
+            logger.warning(f"Failed to read shared metrics, reporting worker {self.worker} only: {e}")
+            return self.local()
+
+        texts, stale = [], []
+        now = time.time()
+        for worker, raw in sorted(entries.items()):
+            entry = json.loads(raw)
+            if now - entry["time"] > self.stale_after:
+                stale.append(worker)
+            else:
+                texts.append(entry["text"])
+        if stale:
+            await redis.hdel(self.KEY, *stale)
+        return merge_renders(texts)
+
+
+# Initialize the metrics aggregator
+metrics_aggregator = MetricsAggregator(
+    interval=settings.METRICS_SHARE_INTERVAL,
+    stale_after=3 * settings.METRICS_SHARE_INTERVAL,
+)
@@ -0,0 +1,294 @@
+# app/services/ocr_engine.py
+
+from typing import Dict, List, Optional, Union
+import asyncio
+import logging
+import os
+import time
+
+import numpy as np
+from PIL import Image, ImageSequence
+import pytesseract
+
+from app.core.config import settings
+from app.core.metrics import OCR_SECONDS
+from app.services.extraction_executor import extraction_executor
+from app.utils.file_utils import create_temp_dir, delete_temp_dir, open_source
+
+try:  # In-process Tesseract: models are loaded once per worker process
+    import tesserocr
+except ImportError:  # pragma: no cover - optional dependency
+    tesserocr = None
+
+logger = logging.getLogger(__name__)
+
+# Longest side of the downscaled copy used for hashing and text scoring.
+ANALYSIS_SIDE = 1024
+# Perceptual hash: thumbnail side and frequencies kept per axis (16x16 = 256 bits).
+HASH_SIDE = 128
+HASH_FREQUENCIES = 16
+
+# One Tesseract instance per worker process, created on first use.
+_tesseract_api = None
+
+
+def _recognize(pixels: np.ndarray) -> str:
+    """Run Tesseract on a preprocessed grayscale array."""
+    global _tesseract_api
+    image = Image.fromarray(pixels)
+    if tesserocr is not None:
+        if _tesseract_api is None:
+            _tesseract_api = tesserocr.PyTessBaseAPI(lang=settings.OCR_LANG)
+        _tesseract_api.SetImage(image)
+        return _tesseract_api.GetUTF8Text()
+    return pytesseract.image_to_string(image, lang=settings.OCR_LANG)
+
+
+def binarize(pixels: np.ndarray) -> np.ndarray:
+    """Otsu threshold: text becomes 0, background 255."""
+    hist = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    omega = np.cumsum(hist) / pixels.size
+    mu = np.cumsum(hist * np.arange(256)) / pixels.size
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mu[-1] * omega - mu) ** 2 / (omega * (1 - omega))
+    threshold = int(np.nanargmax(between)) if np.isfinite(between).any() else 127
+    return np.where(pixels > threshold, 255, 0).astype(np.uint8)
+
+
+def estimate_skew(binary: np.ndarray, max_angle: float = 5.0, step: float = 0.25) -> float:
+    """
+    Estimate the text skew in degrees from the sharpness of the horizontal
+    projection profile of the ink pixels. Rotating the image by the returned
+    angle straightens it.
+    """
+    scale = max(1, binary.shape[1] // 800)
+    ys, xs = np.nonzero(binary[::scale, ::scale] == 0)
+    if len(ys) < 50:
+        return 0.0
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step, step):
+        shifted = ys - xs * np.tan(np.radians(angle))
+        profile = np.bincount((shifted - shifted.min()).astype(np.int64))
+        score = float(np.dot(profile, profile))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def preprocess(image: Image.Image) -> np.ndarray:
+    """
+    Prepare one frame for OCR: grayscale, resize towards the target DPI
+    within size bounds, binarize and deskew.
+    """
+    dpi = image.info.get("dpi", (0, 0))[0] or 0
+    gray = image.convert("L")
+    width, height = gray.size
+    longest = max(width, height)
+
+    # Camera metadata (72/96 DPI) says nothing about the scan resolution.
+    scale = settings.OCR_TARGET_DPI / dpi if dpi >= 150 else 1.0
+    if longest * scale > settings.OCR_MAX_SIDE:
+        scale = settings.OCR_MAX_SIDE / longest
+    elif longest * scale < settings.OCR_MIN_SIDE:
+        scale = settings.OCR_MIN_SIDE / longest
+    if abs(scale - 1.0) > 0.05:
+        gray = gray.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+
+    binary = binarize(np.asarray(gray))
+    angle = estimate_skew(binary)
+    if abs(angle) >= 0.25:
+        rotated = Image.fromarray(binary).rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+        binary = np.asarray(rotated)
+    return binary
+
+
+def tile_rows(binary: np.ndarray, tile_height: int) -> List[tuple]:
+    """
+    Split a frame into horizontal strips of about `tile_height` rows,
+    cutting on the emptiest row near each boundary so lines stay whole.
+    """
+    height = binary.shape[0]
+    if height <= tile_height * 1.25:
+        return [(0, height)]
+    ink = (binary == 0).sum(axis=1)
+    window = tile_height // 4
+    cuts = [0]
+    while height - cuts[-1] > tile_height * 1.25:
+        target = cuts[-1] + tile_height
+        low, high = target - window, min(height - 1, target + window)
+        candidates = np.flatnonzero(ink[low:high] == ink[low:high].min()) + low
+        cuts.append(int(candidates[np.argmin(np.abs(candidates - target))]))
+    cuts.append(height)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def _frames(source: Union[bytes, str]) -> List[np.ndarray]:
+    with open_source(source) as stream:
+        image = Image.open(stream)
+        return [preprocess(frame) for frame in ImageSequence.Iterator(image)]
+
+
+def _tiles(binary: np.ndarray) -> List[tuple]:
+    """
+    Strips of a frame to recognize separately. Only tiled with tesserocr:
+    through pytesseract every strip would start another `tesseract` process.
+    """
+    if tesserocr is None:
+        return [(0, binary.shape[0])]
+    return tile_rows(binary, settings.OCR_TILE_HEIGHT)
+
+
+def _recognize_tiles(binary: np.ndarray) -> List[str]:
+    return [_recognize(binary[top:bottom]).strip() for top, bottom in _tiles(binary)]
+
+
+def recognize_image(image: Image.Image) -> str:
+    """Preprocess and OCR a single already-open image in the calling process."""
+    return "\n".join(text for text in _recognize_tiles(preprocess(image)) if text)
+
+
+def ocr_image_sync(source: Union[bytes, str]) -> str:
+    """OCR every frame and tile in the calling process."""
+    texts = [text for binary in _frames(source) for text in _recognize_tiles(binary)]
+    return "\n".join(text for text in texts if text)
+
+
+def perceptual_hash(gray: Image.Image) -> int:
+    """
+    256-bit DCT hash: the signs of the lowest 16x16 frequencies of a
+    128x128 thumbnail relative to their median. Re-encoded, resized or
+    rescanned copies of an image differ in a few bits; the usual 64-bit
+    hash is too coarse to tell apart pages of text with the same layout.
+    """
+    pixels = np.asarray(gray.resize((HASH_SIDE, HASH_SIDE), Image.LANCZOS), dtype=np.float64)
+    n = np.arange(HASH_SIDE)
+    basis = np.cos(np.pi * np.outer(n[:HASH_FREQUENCIES], 2 * n + 1) / (2 * HASH_SIDE))
+    low = (basis @ pixels @ basis.T).ravel()
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def text_score(gray: Image.Image) -> float:
+    """
+    Share of rows crossing at least two separate strokes after binarizing,
+    taking the minority colour as ink so dark themes count too. Blank
+    pages, flat graphics and smooth photos score near 0; any line of text
+    raises it well above.
+    """
+    pixels = np.asarray(gray)
+    if pixels.size == 0 or int(pixels.max()) - int(pixels.min()) < 32:
+        return 0.0
+    ink = binarize(pixels) == 0
+    if ink.mean() > 0.5:
+        ink = ~ink
+    edges = np.count_nonzero(np.diff(ink, axis=1), axis=1)
+    return float(np.mean(edges >= 4))
+
+
+def _analyze(source: Union[bytes, str], thumbnail_path: Optional[str] = None) -> Dict:
+    """
+    Decode the first frame once at reduced size to compute its perceptual
+    hash and text score, writing a JPEG thumbnail to `thumbnail_path`.
+    """
+    with open_source(source) as stream:
+        image = Image.open(stream)
+        width, height = image.size
+        image.draft("RGB", (ANALYSIS_SIDE, ANALYSIS_SIDE))  # JPEG: decode at a fraction of full size
+        image = image.convert("RGB")
+    image.thumbnail((ANALYSIS_SIDE, ANALYSIS_SIDE))
+    gray = image.convert("L")
+
+    if thumbnail_path:
+        image.thumbnail((settings.IMAGE_THUMBNAIL_SIZE, settings.IMAGE_THUMBNAIL_SIZE))
+        os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+        partial = f"{thumbnail_path}.part"
+        image.save(partial, "JPEG", quality=80, optimize=True)
+        os.replace(partial, thumbnail_path)
+
+    return {
+        "phash": perceptual_hash(gray),
+        "text_score": text_score(gray),
+        "width": width,
+        "height": height,
+    }
+
+
+async def analyze_image(source: Union[bytes, str], thumbnail_path: Optional[str] = None, block: bool = True) -> Dict:
+    """
+    Hash, score and thumbnail an image in the extraction pool; much cheaper
+    than OCR, so it runs first to decide whether OCR is needed at all.
+    """
+    return await extraction_executor.run(_analyze, source, thumbnail_path, block=block)
+
+
+def same_pixels(source: Union[bytes, str], other: Union[bytes, str], tolerance: int) -> bool:
+    """
+    Whether two images have the same size and no grayscale pixel of the
+    first frame differs by more than `tolerance`. A changed character flips
+    some pixels almost from white to black, so it never passes; re-encoding
+    a lossless copy changes nothing.
+    """
+    pixels = []
+    for item in (source, other):
+        with open_source(item) as stream:
+            pixels.append(np.asarray(Image.open(stream).convert("L")))
+    first, second = pixels
+    if first.shape != second.shape:
+        return False
+    return int((np.maximum(first, second) - np.minimum(first, second)).max()) <= tolerance
+
+
+async def confirm_duplicate(source: Union[bytes, str], other: Union[bytes, str], block: bool = True) -> bool:
+    """Compare two images pixel by pixel in the extraction pool; see `same_pixels`."""
+    return await extraction_executor.run(
+        same_pixels, source, other, settings.IMAGE_DUPLICATE_PIXEL_TOLERANCE, block=block
+    )
+
+
+def _prepare(source: Union[bytes, str]) -> Dict:
+    """
+    Preprocess all frames. A single tile is recognized right away; larger
+    inputs are saved for `_ocr_tile` jobs and described as a tile list.
+    """
+    frames = _frames(source)
+    plan = [(binary, _tiles(binary)) for binary in frames]
+    if sum(len(rows) for _, rows in plan) == 1:
+        return {"text": _recognize(frames[0]).strip()}
+
+    directory = create_temp_dir()
+    tiles = []
+    for number, (binary, rows) in enumerate(plan):
+        path = os.path.join(directory, f"frame-{number}.npy")
+        np.save(path, binary)
+        tiles.extend({"path": path, "top": top, "bottom": bottom} for top, bottom in rows)
+    return {"dir": directory, "tiles": tiles}
+
+
+def _ocr_tile(path: str, top: int, bottom: int) -> str:
+    binary = np.load(path, mmap_mode="r")
+    return _recognize(np.ascontiguousarray(binary[top:bottom])).strip()
+
+
+async def ocr_image(source: Union[bytes, str], block: bool = True) -> str:
+    """
+    OCR an image (all frames of a multi-page TIFF) in the extraction pool.
+    With tesserocr, large frames are tiled and the tiles recognized in parallel.
+    """
+    started = time.monotonic()
+    plan = await extraction_executor.run(_prepare, source, block=block)
+    if "text" in plan:
+        text = plan["text"]
+    else:
+        try:
+            texts = await asyncio.gather(*[
+                extraction_executor.run(_ocr_tile, tile["path"], tile["top"], tile["bottom"], block=block)
+                for tile in plan["tiles"]
+            ])
+        finally:
+            await asyncio.to_thread(delete_temp_dir, plan["dir"])
+        text = "\n".join(t for t in texts if t)
+
+    elapsed = time.monotonic() - started
+    OCR_SECONDS.observe(elapsed)
+    logger.info(f"OCR finished in {elapsed:.3f}s")
+    return text
@@ -0,0 +1,199 @@
+# app/services/ollama_client.py
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+import aiohttp
+import asyncio
+import json
+import logging
+import random
+import time
+
+from app.core.metrics import OLLAMA_QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaBusy(Exception):
+    """Raised when too many requests are already waiting for Ollama."""
+
+
+class OllamaResponseError(ValueError):
+    """Raised when Ollama answers with an error status, kept in `status`."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class OllamaClient:
+    """
+    Long-lived HTTP client for the Ollama API.
+
+    One pooled `aiohttp.ClientSession` is shared by every request. At most
+    `max_concurrency` generations run at once; up to `max_queue` further
+    requests wait for a slot and any beyond that are rejected with
+    `OllamaBusy`. Each request has a deadline covering both its wait and
+    the generation, and connection errors are retried with jittered
+    exponential backoff while the deadline allows. Every request asks
+    Ollama to keep the model loaded for `keep_alive`.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_concurrency: int,
+        max_queue: int,
+        timeout: float,
+        retries: int,
+        pool_size: int,
+        keep_alive: str = "",
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self.retries = retries
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._in_flight = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Requests waiting for a generation slot."""
+        return self._waiting
+
+    @property
+    def in_flight(self) -> int:
+        """Requests currently holding a generation slot."""
+        return self._in_flight
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+    async def start(self):
+        """Open the pooled session. Called from the app startup event."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        """Close the pooled session. Called from the app shutdown event."""
+        if self._session is not None:
+            try:
+                await self._session.close()
+            except Exception as e:
+                logger.error(f"Failed to close Ollama session: {e}")
+            self._session = None
+        self._slots = None
+
+    @asynccontextmanager
+    async def _slot(self, deadline: float):
+        await self.start()
+        if self._slots.locked() and self._waiting >= self.max_queue:
+            raise OllamaBusy("The assistant is busy. Please try again shortly.")
+
+        self._waiting += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise OllamaBusy("Timed out waiting for the assistant.")
+        finally:
+            self._waiting -= 1
+        OLLAMA_QUEUE_WAIT_SECONDS.observe(time.monotonic() - started)
+
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+    async def _post(self, path: str, payload: Dict, deadline: float) -> aiohttp.ClientResponse:
+        """POST with retry on connection errors; the caller releases the response."""
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError("Ollama request deadline exceeded.")
+            try:
+                return await self._session.post(
+                    f"{self.base_url}{path}",
+                    json=payload,
+                    timeout=aiohttp.ClientTimeout(total=remaining),
+                )
+            except aiohttp.ClientConnectionError as e:
+                if attempt >= self.retries:
+                    raise
+                backoff = min(0.25 * (2 ** attempt), 5.0) * random.uniform(0.5, 1.5)
+                attempt += 1
+                logger.warning(f"Ollama connection error ({e}); retry {attempt} in {backoff:.2f}s")
+                await asyncio.sleep(min(backoff, max(0.0, deadline - time.monotonic())))
+
+    async def post_json(self, path: str, payload: Dict, timeout: Optional[float] = None) -> Dict:
+        """Send a non-streaming request and return the decoded JSON body."""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        async with self._slot(deadline):
+            response = await self._post(path, payload, deadline)
+            async with response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise OllamaResponseError(
+                        response.status, f"Ollama service returned status {response.status}: {error_text}"
+                    )
+                return await response.json()
+
+    async def stream_json(
+        self, path: str, payload: Dict, timeout: Optional[float] = None
+    ) -> AsyncIterator[Dict]:
+        """Send a streaming request and yield each NDJSON chunk."""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        async with self._slot(deadline):
+            response = await self._post(path, payload, deadline)
+            async with response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise OllamaResponseError(
+                        response.status, f"Ollama service returned status {response.status}: {error_text}"
+                    )
+                async for line in response.content:
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
+
+    def _with_keep_alive(self, payload: Dict) -> Dict:
+        return {"keep_alive": self.keep_alive, **payload} if self.keep_alive else payload
+
+    async def chat(self, payload: Dict, timeout: Optional[float] = None) -> Dict:
+        return await self.post_json("/api/chat", {**self._with_keep_alive(payload), "stream": False}, timeout)
+
+    def stream_chat(self, payload: Dict, timeout: Optional[float] = None) -> AsyncIterator[Dict]:
+        """Stream a chat reply; call `aclose()` on the result if abandoning it early."""
+        return self.stream_json("/api/chat", {**self._with_keep_alive(payload), "stream": True}, timeout)
+
+    async def preload(self, model: str, timeout: Optional[float] = None) -> Dict:
+        """Load `model` into Ollama's memory without generating, pinned for `keep_alive`."""
+        return await self.post_json("/api/generate", self._with_keep_alive({"model": model, "stream": False}), timeout)
+
+    async def tags(self, timeout: float = 10) -> Dict:
+        """List the models on the server; a cheap request used for health checks."""
+        await self.start()
+        async with self._session.get(f"{self.base_url}/api/tags", timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if response.status != 200:
+                raise OllamaResponseError(response.status, f"Ollama service returned status {response.status}")
+            return await response.json()
+
+    async def prime(self, connections: int):
+        """Open up to `connections` pooled keep-alive connections ahead of the first requests."""
+        await asyncio.gather(*(self.tags() for _ in range(max(1, min(connections, self.pool_size)))))
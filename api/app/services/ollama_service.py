@@ -1,62 +1,182 @@
-from typing import Dict, List
-import aiohttp
-import asyncio
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
 import logging
-import json
-from app.services.redis_service import redis_service  # Import Redis service for history management
+import time
+from app.core.metrics import (
+    OLLAMA_FAILURES_TOTAL,
+    OLLAMA_GENERATION_SECONDS,
+    OLLAMA_TIME_TO_FIRST_TOKEN_SECONDS,
+    OLLAMA_TOKENS_PER_SECOND,
+)
+from app.services.llm_router import llm_router
+from app.services.ollama_client import OllamaBusy
+from app.services.context_builder import context_builder
+from app.services.history_store import history_store
+from app.services.response_cache import response_cache
 
 logger = logging.getLogger(__name__)
 
-async def send_to_ollama_service(conversation_id: str, user_message: str, prompt: str = "") -> Dict:
+
+def record_generation(data: Dict, mode: str, started: float):
+    """Record generation time and Ollama's own tokens/sec for a finished reply."""
+    OLLAMA_GENERATION_SECONDS.observe(time.monotonic() - started, mode)
+    eval_count, eval_duration = data.get("eval_count"), data.get("eval_duration")
+    if eval_count and eval_duration:
+        OLLAMA_TOKENS_PER_SECOND.observe(eval_count / (eval_duration / 1e9))
+
+
+async def _prepare_request(
+    conversation_id: str,
+    user_message: str,
+    prompt: str,
+    question: Optional[str],
+    file_ids: Iterable[str],
+    use_cache: bool,
+    documents: Iterable[Dict] = (),
+) -> Tuple[Dict, Dict, Optional[str]]:
     """
-    Sends the user_message to the Ollama service with chat history from Redis.
-    Includes an optional prompt as a system-level message.
+    Build the Ollama payload for a turn. Returns the payload, the user entry
+    to store in history and the response cache key (None when bypassed).
     """
-    print("send_to_ollama_service")
-    ollama_api_url = "http://ollama:11434/api/chat"  # Updated to the chat endpoint
-    headers = {
-        "Content-Type": "application/json",
-        # "Authorization": "Bearer YOUR_API_TOKEN"  # Replace with actual token if required
+    model = llm_router.choose_model(question if question is not None else user_message, bool(file_ids))
+    # Fit the system prompt, recent history and the new message into the token budget
+    messages, user_entry = await context_builder.build(
+        conversation_id, user_message, prompt, model, question=question, documents=documents
+    )
+
+    payload = {
+        "model": model,
+        "messages": messages,
+        "options": {"num_ctx": context_builder.budget_for(model)},
     }
+    cache_key = None
+    if use_cache and response_cache.enabled:
+        cache_key = response_cache.make_key(
+            payload["model"], payload["options"], messages,
+            question if question is not None else user_message, file_ids,
+        )
+    return payload, user_entry, cache_key
 
-    # Fetch chat history from Redis
-    existing_history = await redis_service.get(conversation_id)
-    if not existing_history:
-        existing_history = []
 
-    # Add the new user message to the chat history
-    new_message = {"role": "user", "content": user_message}
-    if prompt:
-        # Add the system prompt if available
-        existing_history.append({"role": "system", "content": prompt})
-    existing_history.append(new_message)
+async def send_to_ollama_service(
+    conversation_id: str,
+    user_message: str,
+    prompt: str = "",
+    question: Optional[str] = None,
+    file_ids: Iterable[str] = (),
+    use_cache: bool = True,
+    documents: Iterable[Dict] = (),
+) -> Dict:
+    """
+    Sends the user_message to the Ollama service with recent chat history from Redis.
+    The optional prompt becomes the conversation's system message.
 
-    payload = {
-        "model": "llama3.1:8b",
-        "messages": existing_history,
-        "stream": False,
-    }
+    Replies are cached on `question` (the message without document excerpts)
+    and the `file_ids` of the attached documents; `use_cache=False` bypasses
+    the cache. With `documents` (`{file_id, name}` references), history
+    stores `question` and the references instead of the excerpts.
+    """
+    payload, user_entry, cache_key = await _prepare_request(
+        conversation_id, user_message, prompt, question, file_ids, use_cache, documents
+    )
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(ollama_api_url, json=payload, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    logger.info("Received response from Ollama service.")
-
-                    # Add Ollama's response to chat history
-                    assistant_message = data.get("message", {}).get("content", "")
-                    if assistant_message:
-                        existing_history.append({"role": "assistant", "content": assistant_message})
-
-                        # Save updated history back to Redis
-                        await redis_service.set(conversation_id, existing_history)
-
-                    return data
-                else:
-                    error_text = await response.text()
-                    logger.error(f"Ollama service returned status {response.status}: {error_text}")
-                    return {}
+        data = await response_cache.get(cache_key) if cache_key else None
+        context_builder.update_summary(conversation_id)
+        if data is None:
+            started = time.monotonic()
+            data = await llm_router.chat(payload)
+            logger.info("Received response from Ollama service.")
+            record_generation(data, "chat", started)
+        else:
+            logger.info("Answered from the response cache.")
+
+        # Add Ollama's response to chat history
+        assistant_message = data.get("message", {}).get("content", "")
+        if assistant_message:
+            # Append this turn to the history in Redis
+            await history_store.append(
+                conversation_id, user_entry, {"role": "assistant", "content": assistant_message}
+            )
+            if cache_key and not data.get("cached"):
+                await response_cache.set(cache_key, _cached_reply(data.get("model", payload["model"]), assistant_message))
+
+        return data
+    except OllamaBusy:
+        OLLAMA_FAILURES_TOTAL.inc("busy")
+        raise
     except Exception as e:
+        OLLAMA_FAILURES_TOTAL.inc("error")
         logger.error(f"Failed to communicate with Ollama service: {e}")
         return {}
+
+
+async def stream_from_ollama_service(
+    conversation_id: str,
+    user_message: str,
+    prompt: str = "",
+    question: Optional[str] = None,
+    file_ids: Iterable[str] = (),
+    use_cache: bool = True,
+    documents: Iterable[Dict] = (),
+) -> AsyncIterator[Dict]:
+    """
+    Streams the reply to user_message from the Ollama service.
+    Yields each NDJSON chunk as Ollama produces it; the last chunk has
+    `done` set. Chat history is saved to Redis once the reply is complete.
+    A cached reply is yielded as a single final chunk.
+    """
+    payload, user_entry, cache_key = await _prepare_request(
+        conversation_id, user_message, prompt, question, file_ids, use_cache, documents
+    )
+
+    cached = await response_cache.get(cache_key) if cache_key else None
+    context_builder.update_summary(conversation_id)
+    if cached is not None:
+        yield cached
+        await history_store.append(
+            conversation_id, user_entry, {"role": "assistant", "content": cached["message"]["content"]}
+        )
+        return
+
+    started = time.monotonic()
+    first_token = True
+    content_parts: List[str] = []
+
+    stream = llm_router.stream_chat(payload)
+    try:
+        async for chunk in stream:
+            if "error" in chunk:
+                OLLAMA_FAILURES_TOTAL.inc("error")
+                logger.error(f"Ollama service stream error: {chunk['error']}")
+                raise ValueError("Invalid response from Ollama service.")
+
+            delta = chunk.get("message", {}).get("content", "")
+            if delta and first_token:
+                first_token = False
+                OLLAMA_TIME_TO_FIRST_TOKEN_SECONDS.observe(time.monotonic() - started)
+            content_parts.append(delta)
+
+            yield chunk
+
+            if chunk.get("done"):
+                record_generation(chunk, "stream", started)
+                break
+    except OllamaBusy:
+        OLLAMA_FAILURES_TOTAL.inc("busy")
+        raise
+    finally:
+        # Release the generation slot even if the consumer stops early.
+        await stream.aclose()
+
+    assistant_message = "".join(content_parts)
+    if assistant_message:
+        await history_store.append(
+            conversation_id, user_entry, {"role": "assistant", "content": assistant_message}
+        )
+        if cache_key:
+            await response_cache.set(cache_key, _cached_reply(payload["model"], assistant_message))
+
+
+def _cached_reply(model: str, content: str) -> Dict:
+    """An Ollama-shaped reply as served from the response cache."""
+    return {"model": model, "message": {"role": "assistant", "content": content}, "done": True, "cached": True}
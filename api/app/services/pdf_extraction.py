@@ -0,0 +1,136 @@
+# app/services/pdf_extraction.py
+
+from typing import AsyncIterator, Callable, Dict, List, Optional, Union
+import asyncio
+import io
+import logging
+import math
+
+from PyPDF2 import PdfReader
+from PIL import Image
+
+from app.core.config import settings
+from app.services.extraction_executor import extraction_executor
+from app.services.ocr_engine import recognize_image
+from app.utils.file_utils import open_source
+
+logger = logging.getLogger(__name__)
+
+# Separates pages in the flat text form of a PDF (as pdftotext does).
+PAGE_SEPARATOR = "\f"
+
+
+def _count_pages(pdf_data: Union[bytes, str]) -> int:
+    with open_source(pdf_data) as stream:
+        return len(PdfReader(stream).pages)
+
+
+def _ocr_page_images(page) -> str:
+    """OCR every embedded image of a page that has no text layer."""
+    texts = []
+    for image_file in page.images:
+        try:
+            image = Image.open(io.BytesIO(image_file.data))
+            text = recognize_image(image)
+            if text:
+                texts.append(text)
+        except Exception as e:
+            logger.error(f"OCR of embedded PDF image {image_file.name} failed: {e}")
+    return "\n".join(texts)
+
+
+def _extract_page_range(pdf_data: Union[bytes, str], start: int, end: int) -> List[Dict]:
+    """
+    Extract pages `start` to `end - 1` (zero-based), reading each page once.
+    Pages without a text layer but with embedded images are sent to OCR.
+    `pdf_data` is the PDF content or the path of a stored PDF.
+    """
+    results = []
+    with open_source(pdf_data) as stream:
+        reader = PdfReader(stream)
+        for number in range(start, end):
+            page = reader.pages[number]
+            ocr = False
+            try:
+                text = (page.extract_text() or "").strip()
+                if not text and page.images:
+                    text = _ocr_page_images(page)
+                    ocr = True
+            except Exception as e:
+                logger.error(f"Text extraction of PDF page {number + 1} failed: {e}")
+                text = ""
+            results.append({"page": number + 1, "text": text, "ocr": ocr})
+    return results
+
+
+def page_ranges(page_count: int, workers: int, min_pages: int) -> List[range]:
+    """Split pages into about two ranges per worker, each at least `min_pages` long."""
+    size = max(min_pages, math.ceil(page_count / max(1, workers * 2)))
+    return [range(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+async def iter_pdf_pages(pdf_data: Union[bytes, str], block: bool = True) -> AsyncIterator[Dict]:
+    """
+    Yield `{"page", "text", "ocr"}` for every page as soon as the worker
+    handling its page range finishes. Pages arrive grouped by range, not
+    necessarily in order.
+    """
+    page_count = await extraction_executor.run(_count_pages, pdf_data, block=block)
+    ranges = page_ranges(page_count, extraction_executor.max_workers, settings.PDF_MIN_PAGES_PER_JOB)
+
+    tasks = [
+        asyncio.ensure_future(
+            extraction_executor.run(_extract_page_range, pdf_data, r.start, r.stop, block=block)
+        )
+        for r in ranges
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            for page in await next_done:
+                yield page
+    finally:
+        # Stop queued ranges if the consumer goes away or a range fails.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def extract_pdf_pages(pdf_data: Union[bytes, str], block: bool = True) -> List[Dict]:
+    """Extract all pages and return them ordered by page number."""
+    pages = [page async for page in iter_pdf_pages(pdf_data, block)]
+    pages.sort(key=lambda page: page["page"])
+    return pages
+
+
+def extract_pdf_pages_sync(
+    pdf_data: Union[bytes, str], progress: Optional[Callable[[int, int], None]] = None
+) -> List[Dict]:
+    """
+    Extract all pages in the calling process, for use inside worker processes
+    that cannot start a pool of their own. `progress(done, total)` is called
+    after each page range.
+    """
+    page_count = _count_pages(pdf_data)
+    pages: List[Dict] = []
+    for r in page_ranges(page_count, 1, settings.PDF_MIN_PAGES_PER_JOB):
+        pages.extend(_extract_page_range(pdf_data, r.start, r.stop))
+        if progress:
+            progress(len(pages), page_count)
+    return pages
+
+
+def join_pages(pages: List[Dict]) -> str:
+    return PAGE_SEPARATOR.join(page["text"] for page in pages)
+
+
+def page_offsets(text: str) -> List[Dict]:
+    """
+    Index the flat text form by page: `{"page", "start", "end"}` character
+    offsets into `text` for every page.
+    """
+    offsets = []
+    start = 0
+    for number, page in enumerate(text.split(PAGE_SEPARATOR), start=1):
+        offsets.append({"page": number, "start": start, "end": start + len(page)})
+        start += len(page) + len(PAGE_SEPARATOR)
+    return offsets
@@ -1,72 +1,346 @@
+from collections import OrderedDict
 from redis import asyncio as aioredis
-from typing import Any, Dict, Optional
-import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+import asyncio
 import logging
+import time
+
+from app.core.config import settings
+from app.core.metrics import (
+    CACHE_REQUESTS_TOTAL,
+    REDIS_ERRORS_TOTAL,
+    REDIS_OPERATION_SECONDS,
+    REDIS_VALUE_BYTES_TOTAL,
+    registry,
+)
+from app.services.codecs import Codec, JSONCodec
+
+
+class LocalCache:
+    """
+    In-process TTL/LRU cache of encoded Redis values for keys starting with
+    one of `prefixes`. Values are kept encoded and decoded on every hit, so
+    callers never share mutable objects.
+
+    `version` increases on every invalidation; a value read from Redis is
+    only cached if no invalidation happened while it was in flight.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, prefixes: Iterable[str]):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prefixes = tuple(prefix for prefix in prefixes if prefix)
+        self.version = 0
+        self.stats = {"hits": 0, "misses": 0}
+        self._entries: "OrderedDict[str, Tuple[float, Union[str, bytes]]]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and bool(self.prefixes)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def cacheable(self, key: str) -> bool:
+        return self.enabled and key.startswith(self.prefixes)
+
+    def get(self, key: str) -> Optional[Union[str, bytes]]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, raw: Union[str, bytes], version: int):
+        if version != self.version:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, raw)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        self.version += 1
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self.version += 1
+        self._entries.clear()
+
+    def hit_ratio(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
 
 class RedisService:
-    def __init__(self, redis_url: str = "redis://redis:6379"):
-        self.redis_url = redis_url
+    """
+    Redis access with values encoded by a pluggable codec (JSON by
+    default). `get` and `set` take a per-call codec; binary codecs go
+    through a second client that does not decode responses. Both clients
+    share the pool settings: at most `max_connections` connections (callers
+    wait up to `socket_timeout` for one when all are busy) with periodic
+    health checks on idle connections.
+
+    With a `local_cache`, hot keys are served from memory. Every `set` and
+    `delete` publishes the key on `invalidation_channel` in the same round
+    trip, and each worker evicts published keys from its own cache; the
+    cache is cleared whenever the subscription drops, since invalidations
+    may have been missed. The cache TTL bounds staleness regardless.
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        codec: Optional[Codec] = None,
+        max_connections: int = 50,
+        socket_timeout: float = 5.0,
+        health_check_interval: int = 30,
+        local_cache: Optional[LocalCache] = None,
+        invalidation_channel: str = "redis:invalidate",
+    ):
+        self.redis_url = redis_url or settings.REDIS_URL
+        self.codec = codec or JSONCodec()
+        self.max_connections = max_connections
+        self.socket_timeout = socket_timeout
+        self.health_check_interval = health_check_interval
+        self.local_cache = local_cache if local_cache is not None else LocalCache(0, 0, ())
+        self.invalidation_channel = invalidation_channel
         self.redis = None
+        self.binary_redis = None
+        self.stats = {"round_trips": 0, "round_trip_seconds": 0.0}
+        self._subscriber: Optional[asyncio.Task] = None
+
+    def _create_client(self, decode_responses: bool) -> aioredis.Redis:
+        pool = aioredis.BlockingConnectionPool.from_url(
+            self.redis_url,
+            max_connections=self.max_connections,
+            timeout=self.socket_timeout,
+            socket_timeout=self.socket_timeout,
+            socket_connect_timeout=self.socket_timeout,
+            health_check_interval=self.health_check_interval,
+            decode_responses=decode_responses,
+        )
+        return aioredis.Redis(connection_pool=pool)
 
     async def connect(self):
         """Initialize the Redis connection."""
         if not self.redis:
             try:
-                self.redis = aioredis.from_url(self.redis_url, decode_responses=True)
+                self.redis = self._create_client(decode_responses=True)
             except Exception as e:
                 logging.error(f"Failed to connect to Redis: {e}")
                 raise
 
+    async def client(self) -> aioredis.Redis:
+        """Return the underlying client for list, pipeline and other raw commands."""
+        if not self.redis:
+            await self.connect()
+        return self.redis
+
+    async def binary_client(self) -> aioredis.Redis:
+        """Return a client that hands back raw bytes, for binary codecs."""
+        if not self.binary_redis:
+            self.binary_redis = self._create_client(decode_responses=False)
+        return self.binary_redis
+
+    async def _client_for(self, codec: Codec) -> aioredis.Redis:
+        return await self.binary_client() if codec.binary else await self.client()
+
+    async def start(self):
+        """Subscribe to cache invalidations. Called from the app startup event."""
+        if self.local_cache.enabled and self._subscriber is None:
+            self._subscriber = asyncio.create_task(self._listen())
+
     async def disconnect(self):
-        """Close the Redis connection."""
-        if self.redis:
+        """Stop the invalidation listener and close the Redis connections."""
+        if self._subscriber is not None:
+            self._subscriber.cancel()
+            await asyncio.gather(self._subscriber, return_exceptions=True)
+            self._subscriber = None
+        for client in (self.redis, self.binary_redis):
+            if client:
+                try:
+                    await client.close()
+                except Exception as e:
+                    logging.error(f"Failed to close Redis connection: {e}")
+
+    async def _listen(self):
+        delay = 1.0
+        while True:
             try:
-                await self.redis.close()
+                pubsub = (await self.client()).pubsub()
+                await pubsub.subscribe(self.invalidation_channel)
+                self.local_cache.clear()
+                delay = 1.0
+                try:
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            self.local_cache.invalidate(message["data"])
+                finally:
+                    await pubsub.close()
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                logging.error(f"Failed to close Redis connection: {e}")
+                logging.warning(f"Redis invalidation listener failed ({e}); retrying in {delay:.0f}s")
+            self.local_cache.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
 
-    async def get(self, key: str) -> Optional[Any]:
-        """Retrieve a value from Redis."""
+    def _observe(self, operation: str, started: float):
+        elapsed = time.perf_counter() - started
+        REDIS_OPERATION_SECONDS.observe(elapsed, operation)
+        self.stats["round_trips"] += 1
+        self.stats["round_trip_seconds"] += elapsed
+
+    def _cached(self, key: str) -> Optional[Union[str, bytes]]:
+        if not self.local_cache.cacheable(key):
+            return None
+        raw = self.local_cache.get(key)
+        CACHE_REQUESTS_TOTAL.inc("redis", "l1" if raw is not None else "miss")
+        return raw
+
+    async def get(self, key: str, codec: Optional[Codec] = None) -> Optional[Any]:
+        """Retrieve a value from the local cache or Redis."""
+        codec = codec or self.codec
         try:
-            await self.connect()
-            value = await self.redis.get(key)
+            value = self._cached(key)
+            if value is None:
+                redis = await self._client_for(codec)
+                version = self.local_cache.version
+                started = time.perf_counter()
+                value = await redis.get(key)
+                self._observe("get", started)
+                if value and self.local_cache.cacheable(key):
+                    self.local_cache.put(key, value, version)
+                if value:
+                    REDIS_VALUE_BYTES_TOTAL.inc("get", amount=len(value))
             if value:
-                return json.loads(value)  # Deserialize JSON string to Python object
+                return codec.loads(value)
             return None
-        except json.JSONDecodeError as e:
-            logging.error(f"Failed to decode JSON for key '{key}': {e}")
+        except (ValueError, TypeError) as e:
+            logging.error(f"Failed to decode value for key '{key}': {e}")
             return None
         except Exception as e:
+            REDIS_ERRORS_TOTAL.inc("get")
             logging.error(f"Error retrieving key '{key}' from Redis: {e}")
             return None
 
-    async def set(self, key: str, value: Any, expire: int = 600):
+    async def mget(self, keys: List[str], codec: Optional[Codec] = None) -> List[Optional[Any]]:
+        """Retrieve several values in one round trip; missing or undecodable values are None."""
+        codec = codec or self.codec
+        raws: List[Optional[Union[str, bytes]]] = [self._cached(key) for key in keys]
+        missing = [n for n, raw in enumerate(raws) if raw is None]
+        if missing:
+            try:
+                redis = await self._client_for(codec)
+                version = self.local_cache.version
+                started = time.perf_counter()
+                fetched = await redis.mget([keys[n] for n in missing])
+                self._observe("mget", started)
+            except Exception as e:
+                REDIS_ERRORS_TOTAL.inc("mget")
+                logging.error(f"Error retrieving {len(missing)} keys from Redis: {e}")
+                fetched = [None] * len(missing)
+            for n, raw in zip(missing, fetched):
+                raws[n] = raw
+                if raw:
+                    REDIS_VALUE_BYTES_TOTAL.inc("get", amount=len(raw))
+                    if self.local_cache.cacheable(keys[n]):
+                        self.local_cache.put(keys[n], raw, version)
+
+        values = []
+        for key, raw in zip(keys, raws):
+            try:
+                values.append(codec.loads(raw) if raw else None)
+            except (ValueError, TypeError) as e:
+                logging.error(f"Failed to decode value for key '{key}': {e}")
+                values.append(None)
+        return values
+
+    async def set(self, key: str, value: Any, expire: int = 600, codec: Optional[Codec] = None):
         """
         Store a value in Redis with an optional expiration time.
         Default expiration is 600 seconds (10 minutes).
         """
+        await self.set_many({key: value}, expire, codec)
+
+    async def set_many(self, values: Dict[str, Any], expire: int = 600, codec: Optional[Codec] = None):
+        """Store several values, with the same expiration, in one pipelined round trip."""
+        if not values:
+            return
+        codec = codec or self.codec
+        operation = "set" if len(values) == 1 else "set_many"
         try:
-            await self.connect()
-            serialized_value = json.dumps(value)  # Serialize Python object to JSON string
-            if expire > 0:
-                await self.redis.set(key, serialized_value, ex=expire)
-            else:
-                await self.redis.set(key, serialized_value)
-        except json.JSONDecodeError as e:
-            logging.error(f"Failed to encode JSON for key '{key}': {e}")
+            redis = await self._client_for(codec)
+            encoded = {key: codec.dumps(value) for key, value in values.items()}
+            started = time.perf_counter()
+            async with redis.pipeline(transaction=False) as pipe:
+                for key, serialized_value in encoded.items():
+                    if expire > 0:
+                        pipe.set(key, serialized_value, ex=expire)
+                    else:
+                        pipe.set(key, serialized_value)
+                self._invalidate(pipe, encoded)
+                await pipe.execute()
+            self._observe(operation, started)
+            REDIS_VALUE_BYTES_TOTAL.inc("set", amount=sum(len(raw) for raw in encoded.values()))
+        except (ValueError, TypeError) as e:
+            logging.error(f"Failed to encode value for keys {list(values)}: {e}")
             raise
         except Exception as e:
-            logging.error(f"Error setting key '{key}' in Redis: {e}")
+            REDIS_ERRORS_TOTAL.inc(operation)
+            logging.error(f"Error setting keys {list(values)} in Redis: {e}")
             raise
 
     async def delete(self, key: str):
         """Delete a key from Redis."""
         try:
-            await self.connect()
-            await self.redis.delete(key)
+            redis = await self.client()
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.delete(key)
+                self._invalidate(pipe, [key])
+                await pipe.execute()
         except Exception as e:
             logging.error(f"Error deleting key '{key}' from Redis: {e}")
             raise
 
+    def _invalidate(self, pipe, keys: Iterable[str]):
+        """Evict `keys` locally and queue their invalidation for the other workers."""
+        for key in keys:
+            if self.local_cache.cacheable(key):
+                self.local_cache.invalidate(key)
+                pipe.publish(self.invalidation_channel, key)
+
+    def get_stats(self) -> Dict:
+        round_trips = self.stats["round_trips"]
+        return {
+            "round_trips": round_trips,
+            "round_trip_mean_seconds": self.stats["round_trip_seconds"] / round_trips if round_trips else 0.0,
+            "local_cache": {
+                "entries": len(self.local_cache),
+                "hit_ratio": self.local_cache.hit_ratio(),
+                **self.local_cache.stats,
+            },
+        }
+
+
 # Initialize the Redis service
-redis_service = RedisService()
+redis_service = RedisService(
+    redis_url=settings.REDIS_URL,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+    local_cache=LocalCache(
+        max_entries=settings.REDIS_L1_MAX_ENTRIES,
+        ttl=settings.REDIS_L1_TTL,
+        prefixes=[prefix.strip() for prefix in settings.REDIS_L1_PREFIXES.split(",")],
+    ),
+)
+registry.gauge("redis_l1_entries", "Values held in the in-process Redis cache.",
+               function=lambda: len(redis_service.local_cache))
+registry.gauge("redis_l1_hit_ratio", "Share of cacheable Redis reads served from the in-process cache.",
+               function=lambda: redis_service.local_cache.hit_ratio())
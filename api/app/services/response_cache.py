@@ -0,0 +1,134 @@
+# app/services/response_cache.py
+
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import re
+import time
+import unicodedata
+
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS_TOTAL
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Fold case, Unicode forms and whitespace so trivially different texts match."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip().casefold()
+
+
+class ResponseCache:
+    """
+    Cache of assistant replies keyed on everything that shapes them: model,
+    options, the normalized system message, the last `history_window`
+    history messages, the normalized question and the `file_id`s of the
+    attached documents (their text is not hashed; it is fixed by the ID).
+
+    Tier 1 is an in-process LRU of `max_entries` replies with a TTL. Tier 2
+    is Redis with the same TTL, shared by every worker.
+    """
+
+    def __init__(self, max_entries: int, ttl: int, history_window: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.history_window = history_window
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def make_key(
+        self,
+        model: str,
+        options: Dict,
+        messages: List[Dict],
+        question: str,
+        file_ids: Iterable[str] = (),
+    ) -> str:
+        """
+        Hash a request built by the context builder. `messages` ends with the
+        user entry, which is replaced by `question` and `file_ids`.
+        """
+        system = ""
+        history = []
+        for message in messages[:-1]:
+            if message.get("role") == "system":
+                system = message.get("content", "")
+            else:
+                history.append(message)
+        history = history[-self.history_window:] if self.history_window > 0 else []
+
+        material = {
+            "model": model,
+            "options": options,
+            "system": normalize_text(system),
+            "history": [[m.get("role"), normalize_text(m.get("content", ""))] for m in history],
+            "question": normalize_text(question),
+            "files": sorted(set(file_ids)),
+        }
+        digest = hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+        return f"response:v1:{digest}"
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """Return the cached reply for `key`, promoting Redis hits locally."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, reply = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["l1_hits"] += 1
+                CACHE_REQUESTS_TOTAL.inc("response", "l1")
+                return reply
+            del self._entries[key]
+
+        reply = await redis_service.get(key)
+        if isinstance(reply, dict):
+            self.stats["l2_hits"] += 1
+            CACHE_REQUESTS_TOTAL.inc("response", "l2")
+            self._store_local(key, reply)
+            return reply
+
+        self.stats["misses"] += 1
+        CACHE_REQUESTS_TOTAL.inc("response", "miss")
+        return None
+
+    async def set(self, key: str, reply: Dict):
+        """Store a reply in both tiers."""
+        self._store_local(key, reply)
+        try:
+            await redis_service.set(key, reply, expire=self.ttl)
+        except Exception as e:
+            logger.warning(f"Response cache write to Redis failed for '{key}': {e}")
+
+    def hit_rate(self) -> float:
+        hits = self.stats["l1_hits"] + self.stats["l2_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def clear(self):
+        """Drop the in-process tier."""
+        self._entries.clear()
+
+    def _store_local(self, key: str, reply: Dict):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, reply)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# Initialize the response cache
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=settings.RESPONSE_CACHE_TTL,
+    history_window=settings.RESPONSE_CACHE_HISTORY_MESSAGES,
+)
@@ -0,0 +1,131 @@
+# app/services/upload_store.py
+
+from typing import Dict, Optional
+import asyncio
+import glob
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import tempfile
+
+from fastapi import UploadFile
+
+from app.core.config import settings
+from app.utils.file_utils import delete_temp_file
+
+logger = logging.getLogger(__name__)
+
+_FILE_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the per-file or per-request size limit."""
+
+
+class UploadStore:
+    """
+    Content-addressed store for uploaded files on local disk.
+
+    Uploads are copied to disk in fixed-size chunks while their MD5 (the
+    `file_id`) is computed, so no file is ever held in memory whole. Files
+    are stored as `<file_id><ext>`; storing the same content twice keeps a
+    single copy. Image thumbnails are kept under `thumbnails/`.
+    """
+
+    def __init__(self, upload_dir: str, chunk_size: int):
+        self.upload_dir = upload_dir
+        self.chunk_size = chunk_size
+
+    async def save(self, file: UploadFile, max_bytes: int) -> Dict:
+        """
+        Stream `file` to disk and return `{"file_id", "path", "size",
+        "mime_type", "file_name"}`. Raises `UploadTooLarge` past `max_bytes`.
+        """
+        os.makedirs(self.upload_dir, exist_ok=True)
+        digest = hashlib.md5()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.upload_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = await file.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise UploadTooLarge(
+                            f"File {file.filename} exceeds the upload limit of {max_bytes} bytes."
+                        )
+                    digest.update(chunk)
+                    await asyncio.to_thread(out.write, chunk)
+            file_id = digest.hexdigest()
+            path = self._finalize(tmp_path, file_id, file.content_type)
+        except BaseException:
+            delete_temp_file(tmp_path)
+            raise
+
+        return {
+            "file_id": file_id,
+            "path": path,
+            "size": size,
+            "mime_type": file.content_type,
+            "file_name": file.filename,
+        }
+
+    async def save_bytes(self, data: bytes, mime_type: str) -> Dict:
+        """Store in-memory content (e.g. a base64 chat attachment)."""
+        os.makedirs(self.upload_dir, exist_ok=True)
+        file_id = hashlib.md5(data).hexdigest()
+        existing = self.path_for(file_id)
+        if existing:
+            return {"file_id": file_id, "path": existing, "size": len(data), "mime_type": mime_type}
+
+        def write() -> str:
+            fd, tmp_path = tempfile.mkstemp(dir=self.upload_dir, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    out.write(data)
+                return self._finalize(tmp_path, file_id, mime_type)
+            except BaseException:
+                delete_temp_file(tmp_path)
+                raise
+
+        path = await asyncio.to_thread(write)
+        return {"file_id": file_id, "path": path, "size": len(data), "mime_type": mime_type}
+
+    def path_for(self, file_id: str) -> Optional[str]:
+        """Return the stored path for `file_id`, or None."""
+        if not _FILE_ID_PATTERN.fullmatch(file_id):
+            return None
+        matches = [p for p in glob.glob(os.path.join(self.upload_dir, f"{file_id}*")) if not p.endswith(".part")]
+        return matches[0] if matches else None
+
+    def url_for(self, file_id: str) -> str:
+        return f"/api/v1/files/{file_id}"
+
+    def thumbnail_path(self, file_id: str) -> Optional[str]:
+        """Return where the thumbnail of an uploaded image is kept, or None for an invalid id."""
+        if not _FILE_ID_PATTERN.fullmatch(file_id):
+            return None
+        return os.path.join(self.upload_dir, "thumbnails", f"{file_id}.jpg")
+
+    def thumbnail_url(self, file_id: str) -> str:
+        return f"/api/v1/files/{file_id}/thumbnail"
+
+    def _finalize(self, tmp_path: str, file_id: str, mime_type: Optional[str]) -> str:
+        extension = mimetypes.guess_extension(mime_type or "") or ""
+        path = os.path.join(self.upload_dir, f"{file_id}{extension}")
+        if os.path.exists(path):
+            delete_temp_file(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+        return path
+
+
+# Initialize the upload store
+upload_store = UploadStore(
+    upload_dir=settings.UPLOAD_DIR,
+    chunk_size=settings.UPLOAD_CHUNK_BYTES,
+)
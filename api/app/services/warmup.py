@@ -0,0 +1,115 @@
+# app/services/warmup.py
+
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import time
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.services.extraction_executor import extraction_executor
+from app.services.file_processing import EXTRACTOR_MODULES, load_extractors
+from app.services.llm_router import llm_router
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class WarmUp:
+    """
+    Startup work that takes the cold-start cost off the first requests.
+
+    Runs in the background after startup: opens the Redis and Ollama
+    connection pools, loads the configured extractors in this process and
+    in every extraction worker, and loads each model into Ollama (pinned
+    with `keep_alive`). Model loads are retried until they succeed or
+    `timeout` runs out, since Ollama often starts after the API. The
+    service is ready once every model is loaded; the other steps only log
+    their failures.
+    """
+
+    def __init__(self, enabled: bool, models: List[str], extractors: List[str], timeout: float):
+        self.enabled = enabled
+        self.models = models
+        self.extractors = [kind for kind in extractors if kind in EXTRACTOR_MODULES]
+        self.timeout = timeout
+        self.steps: Dict[str, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._ready = not enabled
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def status(self) -> Dict:
+        return {"ready": self._ready, "steps": self.steps}
+
+    def start(self):
+        """Schedule the warm-up. Called from the app startup event."""
+        if self.enabled and self._task is None:
+            self._ready = False
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Cancel an unfinished warm-up. Called from the app shutdown event."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def run(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        await asyncio.gather(
+            self._step("redis", self._prime_redis()),
+            self._step("ollama_pool", llm_router.prime()),
+            self._step("extractors", self._load_extractors()),
+        )
+        loaded = await asyncio.gather(*(self._load_model(model, deadline) for model in self.models))
+        self._ready = all(loaded)
+        logger.info(f"Warm-up finished in {time.monotonic() - started:.1f}s (ready={self._ready})")
+
+    async def _step(self, name: str, work) -> bool:
+        started = time.monotonic()
+        try:
+            await work
+        except Exception as e:
+            self.steps[name] = {"status": "failed", "error": str(e)}
+            logger.warning(f"Warm-up step '{name}' failed: {e}")
+            return False
+        self.steps[name] = {"status": "ok", "seconds": round(time.monotonic() - started, 3)}
+        return True
+
+    @staticmethod
+    async def _prime_redis():
+        client = await redis_service.client()
+        await client.ping()
+
+    async def _load_extractors(self):
+        if not self.extractors:
+            return
+        # Loaded here first so that forked pool workers inherit the modules.
+        await asyncio.to_thread(load_extractors, self.extractors)
+        await extraction_executor.warm_up(load_extractors, self.extractors)
+
+    async def _load_model(self, model: str, deadline: float) -> bool:
+        delay = 1.0
+        while True:
+            remaining = deadline - time.monotonic()
+            if await self._step(f"model:{model}", llm_router.preload(model, timeout=max(1.0, remaining))):
+                return True
+            if remaining <= delay:
+                return False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+
+# Initialize the warm-up
+warmup = WarmUp(
+    enabled=settings.WARMUP_ENABLED,
+    models=[model.strip() for model in settings.WARMUP_MODELS.split(",") if model.strip()] or llm_router.models(),
+    extractors=[kind.strip() for kind in settings.WARMUP_EXTRACTORS.split(",") if kind.strip()],
+    timeout=settings.WARMUP_TIMEOUT,
+)
+registry.gauge("app_ready", "1 once the startup warm-up has finished and the models are loaded.",
+               function=lambda: int(warmup.ready))
@@ -1,9 +1,32 @@
 import socketio
+from app.core.config import settings
 from app.core.logger import logger
+from app.core.metrics import SOCKETIO_CONNECTED_CLIENTS
+from app.services.conversation_scheduler import conversation_scheduler
+
+
+def create_client_manager():
+    """
+    Share rooms and emits between worker processes through Redis when a
+    message queue is configured; otherwise keep them in memory.
+    """
+    if not settings.SOCKETIO_MESSAGE_QUEUE:
+        if settings.WEB_CONCURRENCY > 1:
+            logger.warning("WEB_CONCURRENCY > 1 without SOCKETIO_MESSAGE_QUEUE: emits will not reach other workers.")
+        return None
+    transports = settings.SOCKETIO_TRANSPORTS.split(",")
+    if settings.WEB_CONCURRENCY > 1 and "polling" in transports:
+        logger.warning(
+            "Long-polling needs session affinity across workers; "
+            "set SOCKETIO_TRANSPORTS=websocket or route clients stickily."
+        )
+    return socketio.AsyncRedisManager(settings.SOCKETIO_MESSAGE_QUEUE, channel=settings.SOCKETIO_CHANNEL)
 
 
 sio = socketio.AsyncServer(
     async_mode='asgi',
+    client_manager=create_client_manager(),
+    transports=settings.SOCKETIO_TRANSPORTS.split(","),
     cors_allowed_origins=[],
     logger=False,
     # engineio_logger=True,
@@ -16,16 +39,20 @@ sio = socketio.AsyncServer(
 @sio.event(namespace='/chat-socket')
 async def connect(sid, environ):
     # send welcome message to the client
+    SOCKETIO_CONNECTED_CLIENTS.inc()
     await sio.emit('response', {'data': 'Welcome!'}, to=sid)
-    print(f"Client connected: {sid}")
+    logger.info(f"Client connected: {sid}")
 
 @sio.event(namespace='/chat-socket')
 async def disconnect(sid):
-    print(f"Client disconnected: {sid}")
+    SOCKETIO_CONNECTED_CLIENTS.dec()
+    # Nobody is left to receive the replies; free the Ollama slots and extraction jobs
+    stopped = conversation_scheduler.cancel_sid(sid)
+    logger.info(f"Client disconnected: {sid} ({stopped} conversation(s) stopped)")
 
 @sio.event(namespace='/chat-socket')
 async def message(sid, data):
-    print(f"Message from {sid}: {data}")
+    logger.info(f"Message from {sid}: {data}")
     # Emit response back to the client
     await sio.emit('response', {'data': f'Server received: {data}'}, to=sid, namespace='/chat-socket')
 
@@ -1,10 +1,18 @@
 import asyncio
+import base64
 import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from fastapi import HTTPException
-from app.services.file_processing import process_files
-from app.services.ollama_service import send_to_ollama_service
+from app.services.conversation_scheduler import Turn, conversation_scheduler
+from app.services.document_index import document_index
+from app.services.document_store import document_store
+from app.services.document_summarizer import document_summarizer
+from app.services.file_processing import generate_file_id, process_files
+from app.services.ollama_client import OllamaBusy
+from app.services.upload_store import upload_store
+from app.services.ollama_service import send_to_ollama_service, stream_from_ollama_service
 from app.sockets.base import sio
+from app.core.config import settings
 from datetime import datetime
 import logging
 
@@ -21,6 +29,7 @@ ALLOWED_FILE_TYPES = {
     "application/pdf",
     "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
     "application/msword",
+    "application/rtf",
 }
 
 
@@ -50,12 +59,12 @@ def extract_prompts_from_text(text: str) -> Tuple[str, List[Dict[str, str]]]:
 async def handle_send_message(sid: str, data: Dict):
     """
     Handle incoming messages or file uploads from clients.
+    Turns run one at a time per conversation; see `process_turn`.
     """
     try:
         # Extract inputs
         user_message = data.get("message", {}).get("text", "").strip()
         files = data.get("message", {}).get("attachments", [])
-        prompt = data.get("prompt", "")
         conversation_id = data.get("conversationId")
         if not conversation_id:
             raise ValueError("Missing conversationId.")
@@ -63,9 +72,51 @@ async def handle_send_message(sid: str, data: Dict):
         if not user_message and not files:
             raise ValueError("No message or files provided.")
 
-        # Directly extract text and prepare file results
-        extracted_text, file_results = await process_preprocessed_files(files)
-        user_message = f"{user_message} {extracted_text}".strip()
+        turn = Turn(
+            sid=sid,
+            conversation_id=conversation_id,
+            text=user_message,
+            attachments=list(files),
+            prompt=data.get("prompt", ""),
+            stream=bool(data.get("stream", False)),
+            use_cache=data.get("cache", True) is not False,
+        )
+        conversation_scheduler.submit(turn, process_turn)
+
+    except ValueError as ve:
+        await emit_error(sid, str(ve))
+
+
+@sio.on("stopGeneration", namespace=chat_namespace)
+async def handle_stop_generation(sid: str, data: Dict):
+    """
+    Stop the reply being generated for a conversation and drop queued follow-ups.
+    """
+    conversation_id = (data or {}).get("conversationId")
+    if not conversation_id:
+        await emit_error(sid, "Missing conversationId.")
+        return
+    stopped = conversation_scheduler.cancel(conversation_id, sid)
+    await sio.emit(
+        "generationStopped",
+        {"conversationId": conversation_id, "stopped": stopped},
+        room=sid,
+        namespace=chat_namespace,
+    )
+
+
+async def process_turn(turn: Turn):
+    """
+    Extract and index the turn's attachments, then answer it with Ollama.
+    Runs under the conversation scheduler, which cancels it on disconnect or stop.
+    """
+    sid, conversation_id = turn.sid, turn.conversation_id
+    try:
+        # Index attached documents and keep only the passages relevant to the message
+        extracted_text, file_results, documents = await process_preprocessed_files(turn.attachments, turn.text)
+        question = turn.text
+        file_ids = [result["file_id"] for result in file_results if result.get("file_id")]
+        user_message = f"{turn.text} {extracted_text}".strip()
 
         # Default message if only files were uploaded
         if not user_message:
@@ -79,12 +130,18 @@ async def handle_send_message(sid: str, data: Dict):
             namespace=chat_namespace,
         )
 
-        # Limit user message length to 2000 characters
-        if len(user_message) > 2000:
-            user_message = user_message[:2000]
+        # The context builder trims the message to the model's token budget
+        if turn.stream:
+            await stream_reply(
+                sid, conversation_id, user_message, turn.prompt, file_results, question, file_ids, turn.use_cache,
+                documents,
+            )
+            return
 
         # Pass the conversationId, message, and prompt to Ollama service
-        ai_response = await send_to_ollama_service(conversation_id, user_message, prompt)
+        ai_response = await send_to_ollama_service(
+            conversation_id, user_message, turn.prompt, question, file_ids, turn.use_cache, documents
+        )
 
         if not ai_response or "message" not in ai_response:
             raise ValueError("Invalid response from Ollama service.")
@@ -103,34 +160,91 @@ async def handle_send_message(sid: str, data: Dict):
         # Emit the new message to the client
         await sio.emit("newMessage", chat_entry, room=sid, namespace=chat_namespace)
 
-    except ValueError as ve:
-        await emit_error(sid, str(ve))
+    except (ValueError, OllamaBusy) as ve:
+        await emit_error(sid, str(ve), conversation_id)
     except Exception as e:
         logger.error(f"Unexpected Error for sid={sid}: {e}")
-        await emit_error(sid, "An unexpected error occurred. Please try again later.")
+        await emit_error(sid, "An unexpected error occurred. Please try again later.", conversation_id)
 
 
-async def process_preprocessed_files(files: List[Dict]) -> Tuple[str, List[Dict]]:
+async def stream_reply(
+    sid: str,
+    conversation_id: str,
+    user_message: str,
+    prompt: str,
+    file_results: List[Dict],
+    question: str = None,
+    file_ids: List[str] = (),
+    use_cache: bool = True,
+    documents: List[Dict] = (),
+):
+    """
+    Forward the Ollama reply to the client as it is generated.
+    Emits `messageDelta` for each chunk and `messageDone` with the full entry.
+    """
+    content_parts = []
+    stream = stream_from_ollama_service(
+        conversation_id, user_message, prompt, question, file_ids, use_cache, documents
+    )
+    try:
+        async for chunk in stream:
+            delta = chunk.get("message", {}).get("content", "")
+            if delta:
+                content_parts.append(delta)
+                await sio.emit(
+                    "messageDelta",
+                    {"conversationId": conversation_id, "delta": delta},
+                    room=sid,
+                    namespace=chat_namespace,
+                )
+    finally:
+        await stream.aclose()
+
+    chat_entry = {
+        "conversationId": conversation_id,
+        "message": {
+            "type": "received",
+            "text": "".join(content_parts),
+            "time": datetime.now().isoformat() + "Z",
+            "attachments": file_results if file_results else [],
+        },
+    }
+    await sio.emit("messageDone", chat_entry, room=sid, namespace=chat_namespace)
+
+
+async def process_preprocessed_files(files: List[Dict], query: str = "") -> Tuple[str, List[Dict], List[Dict]]:
     """
     Handle already preprocessed files.
-    Extract text and prepare attachments from given file data.
+    Index and store their text by file_id and return the chunks most
+    relevant to `query`, the attachments to send back to the client and
+    `{file_id, name}` references to the documents for the chat history.
+    Attachments without a summary get the document's cached summary and
+    tags; a missing summary is started in the background for later turns.
     """
     if not files:
         logger.info("No files to process.")
-        return "", []
+        return "", [], []
+
+    files = await extract_raw_attachments(files)
 
-    extracted_text = []
+    documents = []
     attachments = []
+    texts = {}
 
     for file in files:
         try:
             # Extract necessary details
-            file_text = file.get("extracted_text", "").strip()
+            file_text = (file.get("extracted_text") or "").strip()
             file_name = file.get("file_name", "Uploaded File")
             file_summary = file.get("summary", "")
             file_tags = file.get("tags", [])
+            file_id = file.get("file_id") or generate_file_id(file_text.encode("utf-8"))
 
-            extracted_text.append(file_text)
+            if file_text:
+                await document_index.add(file_id, file_text)
+                await document_store.put(file_id, file_text)
+                documents.append({"file_id": file_id, "name": file_name})
+                texts[file_id] = file_text
 
             # Prepare attachment
             attachment = {
@@ -138,23 +252,85 @@ async def process_preprocessed_files(files: List[Dict]) -> Tuple[str, List[Dict]
                 "text": file_name,
                 "summary": file_summary,
                 "tags": file_tags,
-                "file_id": file.get("file_id"),
+                "file_id": file_id,
+                "image": file.get("image") or file.get("thumbnail_url"),
             }
             attachments.append(attachment)
         except Exception as e:
             logger.error(f"Error processing preprocessed file: {e}")
             continue
 
-    return " ".join(extracted_text).strip(), attachments
+    if settings.DOCUMENT_SUMMARY_ENABLED:
+        await summarize_attachments(attachments, texts)
+
+    extracted_text = await document_store.excerpts(documents, query) if documents else ""
+    return extracted_text, attachments, documents
+
+
+async def summarize_attachments(attachments: List[Dict], texts: Dict[str, str]):
+    """
+    Fill in the cached summary and tags of attachments that arrived without
+    them. Documents not summarized yet are summarized in the background;
+    the turn does not wait and answers from the excerpts.
+    """
+    pending = [
+        attachment for attachment in attachments
+        if not attachment["summary"] and attachment["file_id"] in texts
+    ]
+    results = await asyncio.gather(
+        *(
+            document_summarizer.summarize(
+                attachment["file_id"], texts[attachment["file_id"]], wait=0
+            )
+            for attachment in pending
+        ),
+        return_exceptions=True,
+    )
+    for attachment, result in zip(pending, results):
+        if isinstance(result, dict):
+            attachment["summary"] = result.get("summary", "")
+            attachment["tags"] = attachment["tags"] or result.get("tags", [])
+
+
+async def extract_raw_attachments(files: List[Dict]) -> List[Dict]:
+    """
+    Run attachments that arrive with raw base64 `data` and no `extracted_text`
+    through the extraction pool. Waits for a free slot when the pool is busy.
+    """
+    raw_indexes = [
+        idx for idx, file in enumerate(files)
+        if not file.get("extracted_text") and file.get("data") and file.get("mime_type")
+    ]
+    if not raw_indexes:
+        return files
+
+    raw_files = []
+    for idx in raw_indexes:
+        file = files[idx]
+        stored = await upload_store.save_bytes(base64.b64decode(file["data"]), file["mime_type"])
+        stored["file_name"] = file.get("file_name", "Uploaded File")
+        raw_files.append(stored)
+
+    results = await process_files(raw_files, block=True)
+
+    files = list(files)
+    for idx, result in zip(raw_indexes, results):
+        files[idx] = {**files[idx], **result}
+        files[idx].pop("data", None)
+    return files
 
 
-async def emit_error(sid: str, error_message: str):
+async def emit_error(sid: str, error_message: str, conversation_id: Optional[str] = None):
     """
-    Emit error messages to the client asynchronously.
+    Emit error messages to the client asynchronously, tagged with the
+    conversation they belong to when there is one.
     """
+    payload = {"error": error_message}
+    if conversation_id is not None:
+        payload["conversationId"] = conversation_id
     await sio.emit(
         "error",
-        {"error": error_message},
+        payload,
         room=sid,
         namespace=chat_namespace,
     )
@@ -1,12 +1,54 @@
 # app/tasks.py
+from typing import Dict, Optional
 from app.celery_app import celery
+from app.services.extraction_cache import extraction_cache
+from app.services.file_processing import (
+    EXTRACTION_FAILURES,
+    build_file_result,
+    extract_text_sync,
+)
+from app.services.ingestion import ingestion_relay
+
 
 @celery.task
-def perform_ocr_task(image_data: bytes) -> str:
-    # Implement OCR logic here
-    return "Extracted text from image."
+def perform_ocr_task(image_path: str, mime_type: str = "image/png") -> str:
+    return extract_text_sync(image_path, mime_type)
+
 
 @celery.task
-def extract_text_from_pdf_task(pdf_data: bytes) -> str:
-    # Implement PDF extraction logic here
-    return "Extracted text from PDF."
+def extract_text_from_pdf_task(pdf_path: str) -> str:
+    return extract_text_sync(pdf_path, "application/pdf")
+
+
+@celery.task(bind=True)
+def ingest_file_task(self, file: Dict, sid: Optional[str] = None) -> Dict:
+    """
+    Extract text from a stored upload (`file` as returned by the upload
+    store) and report progress and completion to the submitting client.
+    """
+    job_id = self.request.id
+    file_name = file.get("file_name")
+    mime_type = file["mime_type"]
+    file_id = file["file_id"]
+
+    def progress(done: int, total: int):
+        meta = {"file_name": file_name, "done": done, "total": total}
+        self.update_state(state="PROGRESS", meta=meta)
+        ingestion_relay.publish(sid, "ingestionProgress", {"job_id": job_id, **meta})
+
+    ingestion_relay.publish(sid, "ingestionStarted", {"job_id": job_id, "file_name": file_name})
+    try:
+        extracted_text = extraction_cache.get_sync(file_id, mime_type)
+        if extracted_text is None:
+            extracted_text = extract_text_sync(file["path"], mime_type, progress)
+            if extracted_text not in EXTRACTION_FAILURES:
+                extraction_cache.set_sync(file_id, mime_type, extracted_text)
+        result = build_file_result(file, file_id, extracted_text)
+    except Exception as e:
+        ingestion_relay.publish(
+            sid, "ingestionFailed", {"job_id": job_id, "file_name": file_name, "error": str(e)}
+        )
+        raise
+
+    ingestion_relay.publish(sid, "ingestionDone", {"job_id": job_id, "file": result})
+    return result
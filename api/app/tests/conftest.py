@@ -0,0 +1,14 @@
+import fakeredis
+import pytest
+
+from app.services.redis_service import redis_service
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Point `redis_service` at an in-memory Redis; both clients share one server."""
+    server = fakeredis.FakeServer()
+    redis = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(redis_service, "redis", redis)
+    monkeypatch.setattr(redis_service, "binary_redis", fakeredis.aioredis.FakeRedis(server=server))
+    return redis
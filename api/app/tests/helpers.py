@@ -0,0 +1,54 @@
+"""Builders shared by several test modules: page images and a context builder."""
+
+import io
+
+from PIL import Image, ImageDraw
+
+from app.services.context_builder import ContextBuilder
+
+
+def make_builder(budget=200):
+    """A context builder with a small token budget, so tests overflow it quickly."""
+    return ContextBuilder(
+        default_budget=budget,
+        model_budgets={},
+        response_reserve=20,
+        summary_tokens=20,
+        ttl=60,
+    )
+
+
+def make_page(width=1200, height=1200, lines=20, angle=0.0):
+    """A page of solid text-line bars, optionally rotated by `angle` degrees."""
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    for n in range(lines):
+        y = 60 + n * (height - 120) // lines
+        draw.rectangle([80, y, width - 80, y + 12], fill=20)
+    return image.rotate(angle, fillcolor=255) if angle else image
+
+
+def make_text_page(words="Invoice 4711 total due", size=(800, 600), background=255, ink=0):
+    """A page of twelve numbered lines of `words`."""
+    image = Image.new("L", size, background)
+    draw = ImageDraw.Draw(image)
+    for n in range(12):
+        draw.text((40, 30 + n * 45), f"{words} line {n}", fill=ink)
+    return image
+
+
+def make_invoice(total, size=(800, 600)):
+    """A fixed invoice layout where only the `total` field varies."""
+    image = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(image)
+    for n, line in enumerate(["ACME SUPPLIES LTD", "Invoice 2024-0117", "Customer: Northwind", "Item: Paper A4 x 40"]):
+        draw.text((40, 30 + n * 45), line, fill=0)
+    draw.text((40, 30 + 5 * 45), f"TOTAL DUE: {total}", fill=0)
+    return image
+
+
+def page_bytes(image, format="PNG", **options):
+    """Encode `image` as an upload would carry it."""
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **options)
+    return buffer.getvalue()
@@ -0,0 +1,30 @@
+import pytest
+
+from app.services.ollama_client import OllamaClient
+from benchmarks.fake_ollama import FakeOllama
+from benchmarks.run import percentile
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) is None
+
+
+@pytest.mark.asyncio
+async def test_fake_ollama_streams_tokens_with_eval_stats():
+    server = FakeOllama(latency=0.01, token_rate=500, tokens=5)
+    url = await server.start()
+    client = OllamaClient(url, max_concurrency=2, max_queue=2, timeout=5, retries=0, pool_size=2)
+    try:
+        chunks = [chunk async for chunk in client.stream_chat({"model": "m", "messages": []})]
+        reply = await client.chat({"model": "m", "messages": []})
+    finally:
+        await client.close()
+        await server.stop()
+
+    assert len(chunks) == 6 and chunks[-1]["done"]
+    assert chunks[-1]["eval_count"] == 5 and chunks[-1]["eval_duration"] > 0
+    assert reply["message"]["content"] == "".join(c["message"]["content"] for c in chunks)
+    assert server.requests == 2
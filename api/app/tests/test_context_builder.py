@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from app.services import context_builder as builder_module
+from app.services.context_builder import estimate_tokens, truncate_to_tokens
+from app.services.history_store import history_store
+from app.tests.helpers import make_builder
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    requests = []
+
+    async def chat(payload, timeout=None):
+        requests.append(payload)
+        return {"message": {"content": f"summary {len(requests)}"}}
+
+    monkeypatch.setattr(builder_module.llm_router, "chat", chat)
+    return requests
+
+
+def test_truncate_to_tokens():
+    text = "word " * 100
+    assert estimate_tokens(truncate_to_tokens(text, 10)) <= 10
+    assert truncate_to_tokens("short", 10) == "short"
+
+
+@pytest.mark.asyncio
+async def test_system_prompt_is_sent_once_and_remembered(fake_redis, summaries):
+    builder = make_builder()
+    messages, _ = await builder.build("c1", "hello", prompt="Be brief.")
+    assert messages == [
+        {"role": "system", "content": "Be brief."},
+        {"role": "user", "content": "hello"},
+    ]
+
+    messages, _ = await builder.build("c1", "again")
+    assert [m["role"] for m in messages] == ["system", "user"]
+    assert messages[0]["content"] == "Be brief."
+    assert summaries == []
+
+
+@pytest.mark.asyncio
+async def test_older_turns_are_folded_into_summary_once(fake_redis, summaries):
+    builder = make_builder(budget=200)
+    for i in range(10):
+        await history_store.append("c2", {"role": "user", "content": f"question {i} " + "x " * 20})
+
+    # The summary is updated in the background, never while building
+    messages, _ = await builder.build("c2", "latest")
+    assert summaries == []
+    assert messages[0]["role"] == "user"
+    builder.update_summary("c2")
+    builder.update_summary("c2")
+    await asyncio.gather(*builder._updating.values())
+    assert len(summaries) == 1
+
+    messages, _ = await builder.build("c2", "latest")
+    assert "summary 1" in messages[0]["content"]
+    assert messages[-1] == {"role": "user", "content": "latest"}
+    assert sum(estimate_tokens(m["content"]) for m in messages) <= 200 - 20
+
+    # Nothing new fell out of the window, so the cached summary is reused.
+    builder.update_summary("c2")
+    assert not builder._updating
+    assert len(summaries) == 1
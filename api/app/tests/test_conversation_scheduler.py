@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.services.conversation_scheduler import ConversationScheduler, Turn
+
+
+def turn(text, sid="s1", conversation_id="c1", **kwargs):
+    return Turn(sid=sid, conversation_id=conversation_id, text=text, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_turns_run_in_order_and_follow_ups_are_coalesced():
+    scheduler = ConversationScheduler(coalesce_window=0)
+    started, release, ran = asyncio.Event(), asyncio.Event(), []
+
+    async def run(t):
+        ran.append(t.text)
+        if len(ran) == 1:
+            started.set()
+            await release.wait()
+
+    scheduler.submit(turn("first"), run)
+    await started.wait()
+    # Both follow-ups arrive while the first turn is generating
+    scheduler.submit(turn("second", attachments=[{"file_id": "a"}]), run)
+    scheduler.submit(turn("third", use_cache=False), run)
+    assert scheduler._conversations["c1"].pending.merged == 2
+    release.set()
+    while scheduler.active():
+        await asyncio.sleep(0)
+
+    assert ran == ["first", "second\n\nthird"]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_window_merges_a_burst_into_one_turn():
+    scheduler = ConversationScheduler(coalesce_window=0.05)
+    ran = []
+
+    async def run(t):
+        ran.append((t.text, t.use_cache))
+
+    scheduler.submit(turn("a"), run)
+    scheduler.submit(turn("b", use_cache=False), run)
+    await asyncio.sleep(0.1)
+
+    assert ran == [("a\n\nb", False)]
+    assert not scheduler.active()
+
+
+@pytest.mark.asyncio
+async def test_cancel_sid_stops_running_turn_and_drops_pending():
+    scheduler = ConversationScheduler(coalesce_window=0)
+    started, cancelled, ran = asyncio.Event(), asyncio.Event(), []
+
+    async def run(t):
+        ran.append(t.text)
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    other = asyncio.Event()
+
+    async def run_other(t):
+        await other.wait()
+
+    scheduler.submit(turn("generating"), run)
+    scheduler.submit(turn("other socket", sid="s2", conversation_id="c2"), run_other)
+    await started.wait()
+    scheduler.submit(turn("queued"), run)
+
+    assert scheduler.cancel_sid("s1") == 1
+    await asyncio.wait_for(cancelled.wait(), 1)
+    await asyncio.sleep(0)
+
+    assert ran == ["generating"]
+    assert scheduler.active() == {"c2"}
+    other.set()
@@ -0,0 +1,66 @@
+import asyncio
+import re
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.services.diagnostics import LoopMonitor, sample_stacks
+
+client = TestClient(app)
+
+
+async def blocking_step():
+    time.sleep(0.4)
+
+
+def spin_for_profile(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.mark.asyncio
+async def test_monitor_measures_lag_and_logs_the_blocking_stack(caplog):
+    monitor = LoopMonitor(interval=0.05, threshold=0.15)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.12)
+        await asyncio.create_task(blocking_step(), name="blocker")
+        await asyncio.sleep(0.12)
+    finally:
+        await monitor.stop()
+
+    assert monitor.stats["stalls"] == 1
+    assert monitor.stats["max_lag"] >= 0.3
+    assert monitor.last_stall["task"] == "blocker"
+    assert "in blocking_step" in monitor.last_stall["stack"]
+    assert "Event loop blocked" in caplog.text
+
+
+def test_sampled_stacks_are_collapsed_per_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=spin_for_profile, args=(stop,), name="spinner")
+    worker.start()
+    try:
+        counts = sample_stacks(0.2, 0.005, [worker.ident])
+    finally:
+        stop.set()
+        worker.join()
+
+    assert sum(counts.values()) >= 10
+    assert all(stack.startswith("spinner;") for stack in counts)
+    assert any("spin_for_profile (app/tests/test_diagnostics.py:" in stack for stack in counts)
+
+
+def test_profile_endpoint_requires_the_admin_token(monkeypatch):
+    assert client.get("/debug/profile").status_code == 404
+
+    monkeypatch.setattr(settings, "DIAGNOSTICS_ADMIN_TOKEN", "secret")
+    assert client.get("/debug/profile", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    response = client.get("/debug/profile?seconds=0.2", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.text and all(re.fullmatch(r".+ \d+", line) for line in response.text.splitlines())
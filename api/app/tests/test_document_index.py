@@ -0,0 +1,95 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.services import document_index as index_module
+from app.services.document_index import DocumentIndex, chunk_text
+
+
+def make_index(index_dir, embed_model=""):
+    return DocumentIndex(
+        index_dir=str(index_dir),
+        chunk_words=10,
+        overlap=2,
+        top_k=2,
+        embed_model=embed_model,
+        max_loaded=4,
+    )
+
+
+def test_chunk_text_overlaps():
+    words = [f"w{i}" for i in range(20)]
+    chunks = chunk_text(" ".join(words), chunk_words=10, overlap=2)
+    assert chunks[0].split()[-2:] == chunks[1].split()[:2]
+    assert chunks[-1].split()[-1] == "w19"
+
+
+@pytest.mark.asyncio
+async def test_retrieve_relevant_chunks_and_persist(tmp_path):
+    text = " ".join(
+        ["filler text about nothing in particular here today"] * 5
+        + ["the termination clause requires ninety days written notice"]
+        + ["more filler text about nothing in particular here"] * 5
+    )
+    index = make_index(tmp_path)
+    await index.add("abc123", text)
+
+    results = await index.retrieve(["abc123"], "What notice does termination require?")
+    assert len(results) == 2
+    assert any("termination clause" in chunk for _, _, chunk in results)
+    assert [n for _, n, _ in results] == sorted(n for _, n, _ in results)
+
+    reloaded = make_index(tmp_path)
+    assert await reloaded.retrieve(["abc123"], "termination notice") == results
+
+
+@pytest.mark.asyncio
+async def test_rejects_unsafe_file_ids(tmp_path):
+    index = make_index(tmp_path)
+    with pytest.raises(ValueError):
+        await index.add("../escape", "text")
+
+
+@pytest.mark.asyncio
+async def test_embeddings_from_another_model_fall_back_to_bm25(tmp_path, monkeypatch):
+    dimensions = {"m1": 3, "m2": 5}
+    requests = []
+
+    async def post_json(path, payload):
+        requests.append(payload["model"])
+        return {"embeddings": np.ones((len(payload["input"]), dimensions[payload["model"]])).tolist()}
+
+    monkeypatch.setattr(index_module.llm_router, "post_json", post_json)
+    text = " ".join(["filler words"] * 20 + ["the termination clause requires notice"])
+    await make_index(tmp_path, "m1").add("abc123", text)
+    with open(tmp_path / "abc123.json", encoding="utf-8") as f:
+        stored = json.load(f)
+    assert (stored["embed_model"], stored["embed_dimensions"]) == ("m1", 3)
+
+    requests.clear()
+    results = await make_index(tmp_path, "m2").retrieve(["abc123"], "termination clause")
+    assert any("termination clause" in chunk for _, _, chunk in results)
+    assert requests == []
+
+
+@pytest.mark.asyncio
+async def test_documents_indexed_without_a_model_are_embedded_once_one_is_set(tmp_path, monkeypatch):
+    requests = []
+
+    async def post_json(path, payload):
+        requests.append(payload["input"])
+        return {"embeddings": np.ones((len(payload["input"]), 3)).tolist()}
+
+    monkeypatch.setattr(index_module.llm_router, "post_json", post_json)
+    text = " ".join(["filler words"] * 20 + ["the termination clause requires notice"])
+    chunks = len((await make_index(tmp_path).add("abc123", text)).chunks)
+    assert not (tmp_path / "abc123.npy").exists()
+
+    index = make_index(tmp_path, "m1")
+    await index.retrieve(["abc123"], "termination clause")
+    await index.retrieve(["abc123"], "termination clause")
+    assert [len(texts) for texts in requests] == [chunks, 1, 1]
+
+    document = await make_index(tmp_path, "m1").get("abc123")
+    assert document.embed_model == "m1" and document.embeddings.shape == (chunks, 3)
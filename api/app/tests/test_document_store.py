@@ -0,0 +1,75 @@
+import pytest
+
+from app.services import context_builder as builder_module
+from app.services import document_store as store_module
+from app.services.codecs import CompressedCodec, JSONCodec, make_codec
+from app.services.document_index import DocumentIndex
+from app.services.document_store import DocumentStore
+from app.services.history_store import history_store
+from app.services.redis_service import redis_service
+from app.tests.helpers import make_builder
+
+CONTRACT = " ".join(
+    ["filler text about nothing in particular here today"] * 20
+    + ["the termination clause requires ninety days written notice"]
+    + ["more filler text about nothing in particular here"] * 20
+)
+
+
+@pytest.fixture
+def store(fake_redis, tmp_path, monkeypatch):
+    index = DocumentIndex(str(tmp_path), chunk_words=10, overlap=2, top_k=2, embed_model="", max_loaded=4)
+    monkeypatch.setattr(store_module, "document_index", index)
+    store = DocumentStore(make_codec("msgpack+zstd"), ttl=60)
+    monkeypatch.setattr(builder_module, "document_store", store)
+    return store
+
+
+@pytest.mark.parametrize("spec", ["json", "msgpack", "json+zlib", "msgpack+zstd"])
+def test_codecs_round_trip(spec):
+    codec = make_codec(spec)
+    value = {"text": CONTRACT, "pages": [1, 2], "name": "Vertrag.pdf"}
+
+    assert codec.name == spec
+    assert codec.loads(codec.dumps(value)) == value
+    if "+" in spec:
+        assert len(codec.dumps(value)) < len(JSONCodec().dumps(value)) / 5
+
+
+def test_compressed_codec_reads_either_compression():
+    zlib_value = CompressedCodec(JSONCodec(), "zlib").dumps(["a"] * 100)
+    assert CompressedCodec(JSONCodec(), "zstd").loads(zlib_value) == ["a"] * 100
+
+
+@pytest.mark.asyncio
+async def test_text_is_stored_once_and_compressed(store, fake_redis):
+    assert await store.put("f1", CONTRACT)
+    assert not await store.put("f1", CONTRACT)
+
+    assert await store.get("f1") == CONTRACT
+    assert len(await redis_service.binary_redis.get("document:f1")) < len(CONTRACT) / 5
+    assert 0 < await fake_redis.ttl("document:f1") <= 60
+
+
+@pytest.mark.asyncio
+async def test_history_keeps_references_expanded_at_prompt_build(store, monkeypatch, tmp_path):
+    await store.put("f1", CONTRACT)
+    documents = [{"file_id": "f1", "name": "contract.pdf"}]
+    question = "What notice does termination require?"
+    excerpts = await store.excerpts(documents, question)
+    assert excerpts.startswith("[contract.pdf]\n") and "ninety days" in excerpts
+
+    builder = make_builder(budget=1000)
+    messages, entry = await builder.build("c1", f"{question} {excerpts}", question=question, documents=documents)
+    assert messages[-1]["content"] == f"{question} {excerpts}"
+    assert entry == {"role": "user", "content": question, "documents": documents}
+    await history_store.append("c1", entry, {"role": "assistant", "content": "Ninety days."})
+
+    # Another worker without a local index rebuilds it from the store
+    other_index = DocumentIndex(str(tmp_path / "other"), chunk_words=10, overlap=2, top_k=2, embed_model="", max_loaded=4)
+    monkeypatch.setattr(store_module, "document_index", other_index)
+    messages, _ = await builder.build("c1", "And for renewal?")
+    assert messages[:2] == [
+        {"role": "user", "content": f"{question} {excerpts}"},
+        {"role": "assistant", "content": "Ninety days."},
+    ]
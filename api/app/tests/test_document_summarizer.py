@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services import context_builder as builder_module
+from app.services import document_summarizer as summarizer_module
+from app.services.document_summarizer import DocumentSummarizer
+from app.services.history_store import history_store
+from app.services.redis_service import redis_service
+from app.sockets import chat_socket
+from app.tests.helpers import make_builder
+
+
+@pytest.fixture
+def model(monkeypatch):
+    calls = {"stages": [], "running": 0, "peak": 0}
+
+    async def chat(payload, timeout=None):
+        instructions = payload["messages"][0]["content"]
+        calls["running"] += 1
+        calls["peak"] = max(calls["peak"], calls["running"])
+        await asyncio.sleep(0.01)
+        calls["running"] -= 1
+        if payload.get("format") == "json":
+            calls["stages"].append("final")
+            content = json.dumps({"summary": "A supply contract.", "tags": ["Contract", "#supply", "contract"]})
+        else:
+            calls["stages"].append("map" if instructions == summarizer_module.MAP_INSTRUCTIONS else "reduce")
+            content = "part summary " * 10
+        return {"message": {"content": content}}
+
+    monkeypatch.setattr(summarizer_module.llm_router, "chat", chat)
+    return calls
+
+
+def make_summarizer(**options):
+    return DocumentSummarizer(**{
+        "model": "m", "chunk_words": 50, "summary_tokens": 20, "max_tags": 5, "concurrency": 2, "ttl": 60, **options,
+    })
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_is_bounded_and_cached_per_file(fake_redis, model):
+    summarizer = make_summarizer()
+    text = "word " * 500
+
+    results = await asyncio.gather(summarizer.summarize("f1", text), summarizer.summarize("f1", text))
+
+    assert results[0] == results[1] == {"summary": "A supply contract.", "tags": ["contract", "supply"]}
+    # 10 chunks mapped, their 20-word summaries merged in pairs down to one, then the final call
+    assert model["stages"] == ["map"] * 10 + ["reduce"] * 9 + ["final"]
+    assert model["peak"] == 2
+
+    assert await summarizer.summarize("f1", text) == results[0]
+    assert len(model["stages"]) == 20
+
+
+def test_slots_belong_to_the_loop_that_uses_them(fake_redis, model):
+    async def create():
+        return make_summarizer()
+
+    # Built under one loop (as the singleton is at import), used under another
+    summarizer = asyncio.run(create())
+    result = asyncio.run(summarizer.summarize("f1", "word " * 500))
+    assert result["summary"] == "A supply contract."
+    assert model["peak"] == 2
+
+
+@pytest.mark.asyncio
+async def test_summary_keeps_running_after_the_wait(fake_redis, model):
+    summarizer = make_summarizer()
+
+    assert await summarizer.summarize("f1", "word " * 500, wait=0.001) is None
+    await asyncio.gather(*summarizer._running.values())
+    assert (await summarizer.cached("f1"))["summary"] == "A supply contract."
+
+
+@pytest.mark.asyncio
+async def test_turns_do_not_wait_for_new_summaries(fake_redis, model, monkeypatch):
+    summarizer = make_summarizer()
+    monkeypatch.setattr(chat_socket, "document_summarizer", summarizer)
+    texts = {"f1": "word " * 500}
+    attachments = [{"file_id": "f1", "summary": "", "tags": []}]
+
+    await chat_socket.summarize_attachments(attachments, texts)
+    assert attachments[0]["summary"] == "" and model["stages"] == []
+
+    await asyncio.gather(*summarizer._running.values())
+    await chat_socket.summarize_attachments(attachments, texts)
+    assert attachments[0] == {"file_id": "f1", "summary": "A supply contract.", "tags": ["contract", "supply"]}
+
+
+@pytest.mark.asyncio
+async def test_history_falls_back_to_summaries_when_excerpts_do_not_fit(fake_redis, monkeypatch):
+    summarizer = make_summarizer()
+    monkeypatch.setattr(summarizer_module, "document_summarizer", summarizer)
+    await redis_service.set(summarizer.make_key("f1"), {"summary": "A supply contract.", "tags": []})
+
+    async def excerpts(documents, query):
+        return "long passage " * 500
+
+    monkeypatch.setattr(builder_module.document_store, "excerpts", excerpts)
+    documents = [{"file_id": "f1", "name": "contract.pdf"}]
+    await history_store.append(
+        "c1",
+        {"role": "user", "content": "Summarize it.", "documents": documents},
+        {"role": "assistant", "content": "Done."},
+    )
+
+    messages, _ = await make_builder(budget=200).build("c1", "Next question")
+    assert messages[0] == {"role": "user", "content": "Summarize it. [contract.pdf]\nA supply contract."}
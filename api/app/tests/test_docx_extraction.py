@@ -0,0 +1,76 @@
+import io
+import zipfile
+
+import pytest
+
+from app.services.docx_extraction import extract_word_text, iter_part_lines
+from benchmarks.corpus import make_doc, make_docx
+
+W_NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+MC_NS = 'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"'
+
+
+def test_docx_reading_order_with_tables_headers_and_footers():
+    data = make_docx(
+        ["Intro paragraph.", "Closing paragraph."],
+        rows=[["Party", "Role"], ["ACME", "Seller"]],
+        header="ACME Corp — Confidential",
+        footer="Page footer",
+    )
+
+    assert extract_word_text(data).split("\n") == [
+        "ACME Corp — Confidential",
+        "Intro paragraph.",
+        "Closing paragraph.",
+        "Party | Role",
+        "ACME | Seller",
+        "Page footer",
+    ]
+
+
+def test_part_lines_handle_runs_nested_tables_and_alternate_content():
+    xml = f"""<w:document {W_NS} {MC_NS}><w:body>
+        <w:p><w:pPr><w:tabs><w:tab w:val="left" w:pos="720"/></w:tabs></w:pPr>
+            <w:r><w:t>Name</w:t><w:tab/><w:t>Value</w:t></w:r></w:p>
+        <w:tbl><w:tr>
+            <w:tc><w:p><w:r><w:t>Outer</w:t></w:r></w:p></w:tc>
+            <w:tc><w:tbl><w:tr><w:tc><w:p><w:r><w:t>a</w:t></w:r></w:p></w:tc>
+                <w:tc><w:p><w:r><w:t>b</w:t></w:r></w:p></w:tc></w:tr></w:tbl></w:tc>
+        </w:tr></w:tbl>
+        <w:p><w:r><mc:AlternateContent>
+            <mc:Choice><w:p><w:r><w:t>Text box</w:t></w:r></w:p></mc:Choice>
+            <mc:Fallback><w:p><w:r><w:t>Text box</w:t></w:r></w:p></mc:Fallback>
+        </mc:AlternateContent></w:r></w:p>
+    </w:body></w:document>"""
+
+    assert list(iter_part_lines(io.BytesIO(xml.encode()))) == [
+        "Name\tValue", "Outer | a | b", "Text box", "",
+    ]
+
+
+def test_repeated_headers_are_kept_once():
+    buffer = io.BytesIO()
+    part = f'<w:hdr {W_NS}><w:p><w:r><w:t>Same header</w:t></w:r></w:p></w:hdr>'
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/header1.xml", part)
+        archive.writestr("word/header2.xml", part)
+        archive.writestr("word/document.xml", f'<w:document {W_NS}><w:body><w:p><w:r><w:t>Body</w:t></w:r></w:p></w:body></w:document>')
+
+    assert extract_word_text(buffer.getvalue()) == "Same header\nBody"
+
+
+def test_legacy_doc_keeps_field_results():
+    data = make_doc(["First paragraph.", "See \x13 HYPERLINK \"x\" \x14the link\x15 here.", "Café"])
+
+    assert extract_word_text(data) == "First paragraph.\nSee the link here.\nCafé"
+
+
+def test_rtf_saved_as_doc():
+    data = rb"{\rtf1\ansi{\fonttbl{\f0 Arial;}}{\*\generator Word;}Hello \b world\b0\par Caf\'e9\tab \u8364?5\par}"
+
+    assert extract_word_text(data) == "Hello world\nCafé\t€5"
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        extract_word_text(b"plain text, not a Word file")
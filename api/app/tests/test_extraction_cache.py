@@ -0,0 +1,40 @@
+import pytest
+
+from app.services.extraction_cache import ExtractionCache
+
+
+@pytest.mark.asyncio
+async def test_miss_then_local_hit(fake_redis):
+    cache = ExtractionCache(max_bytes=1024, ttl=60)
+
+    assert await cache.get("abc", "application/pdf") is None
+    await cache.set("abc", "application/pdf", "hello")
+
+    assert await cache.get("abc", "application/pdf") == "hello"
+    assert cache.stats == {"l1_hits": 1, "l2_hits": 0, "misses": 1}
+
+
+@pytest.mark.asyncio
+async def test_redis_hit_is_promoted(fake_redis):
+    cache = ExtractionCache(max_bytes=1024, ttl=60)
+    await cache.set("abc", "application/pdf", "hello")
+    cache.clear()
+
+    assert await cache.get("abc", "application/pdf") == "hello"
+    assert await cache.get("abc", "application/pdf") == "hello"
+    assert cache.stats["l2_hits"] == 1
+    assert cache.stats["l1_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_local_tier_evicts_least_recently_used(fake_redis):
+    cache = ExtractionCache(max_bytes=10, ttl=60)
+    await cache.set("a", "text/plain", "12345")
+    await cache.set("b", "text/plain", "12345")
+    await cache.get("a", "text/plain")
+    await cache.set("c", "text/plain", "12345")
+
+    assert cache.size == 10
+    await fake_redis.flushall()
+    assert await cache.get("a", "text/plain") == "12345"
+    assert await cache.get("b", "text/plain") is None
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.extraction_executor import (
+    ExtractionExecutor,
+    ExtractionQueueFull,
+    ExtractionTimeout,
+)
+
+
+def _square(value):
+    return value * value
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.mark.asyncio
+async def test_run_returns_result():
+    executor = ExtractionExecutor(max_workers=1, queue_size=0, timeout=10)
+    try:
+        assert await executor.run(_square, 7) == 49
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_non_blocking_run_rejects_when_full():
+    executor = ExtractionExecutor(max_workers=1, queue_size=0, timeout=10)
+    try:
+        busy = asyncio.create_task(executor.run(_sleep, 0.5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExtractionQueueFull):
+            await executor.run(_square, 2, block=False)
+        assert await busy == 0.5
+        assert executor.in_flight == 0
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_times_out():
+    executor = ExtractionExecutor(max_workers=1, queue_size=0, timeout=10)
+    try:
+        with pytest.raises(ExtractionTimeout):
+            await executor.run(_sleep, 1, timeout=0.1)
+    finally:
+        executor.shutdown()
+
+
+class _UnpicklableError(Exception):
+    def __init__(self):
+        super().__init__("needs no arguments")
+
+
+def _fail_unpicklable():
+    raise _UnpicklableError()
+
+
+@pytest.mark.asyncio
+async def test_unpicklable_worker_error_does_not_break_pool():
+    executor = ExtractionExecutor(max_workers=1, queue_size=1, timeout=10)
+    try:
+        with pytest.raises(RuntimeError, match="_UnpicklableError: needs no arguments"):
+            await executor.run(_fail_unpicklable)
+        assert await executor.run(_square, 3) == 9
+    finally:
+        executor.shutdown()
@@ -1,10 +1,147 @@
+import io
+import json
+
+import pytest
 from fastapi.testclient import TestClient
+from PIL import Image
+
 from app.main import app
+from app.services import file_processing
+from app.services.extraction_cache import extraction_cache
+from app.services.image_index import image_index
+from app.services.upload_store import upload_store
+from app.tests.helpers import make_invoice, make_text_page, page_bytes
+from benchmarks.corpus import make_pdf
 
 client = TestClient(app)
 
+
+@pytest.fixture(autouse=True)
+def isolated_storage(tmp_path, monkeypatch, fake_redis):
+    monkeypatch.setattr(upload_store, "upload_dir", str(tmp_path))
+    extraction_cache.clear()
+    image_index.clear()
+
+
 def test_upload_pdf_file():
-    with open("test_files/sample.pdf", "rb") as pdf_file:
-        response = client.post("/uploadfile/", files={"file": pdf_file})
+    pdf = make_pdf([["Quarterly report"], ["Revenue grew"]])
+    response = client.post(
+        "/api/v1/uploadfile/",
+        files=[("files", ("sample.pdf", pdf, "application/pdf"))],
+    )
+    assert response.status_code == 200
+    result = response.json()["files"][0]
+    assert result["status"] == "Processed"
+    assert result["extracted_text"] == "Quarterly report\fRevenue grew"
+    assert [page["page"] for page in result["pages"]] == [1, 2]
+
+
+def test_upload_stream_emits_each_file_then_a_summary():
+    files = [
+        ("files", ("sample.pdf", make_pdf([["Quarterly report"]]), "application/pdf")),
+        ("files", ("notes.txt", b"Meeting notes", "text/plain")),
+        ("files", ("archive.zip", b"PK", "application/zip")),
+    ]
+    response = client.post("/api/v1/uploadfile/?mode=stream", files=files)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    results = {line["index"]: line for line in lines[:-1]}
+    assert sorted(results) == [0, 1, 2]
+    assert results[0]["extracted_text"] == "Quarterly report"
+    assert results[1]["extracted_text"] == "Meeting notes"
+    assert results[2]["status"] == "Failed" and "Unsupported file type" in results[2]["error"]
+    assert lines[-1]["type"] == "summary"
+    assert (lines[-1]["files"], lines[-1]["processed"], lines[-1]["failed"]) == (3, 2, 1)
+
+
+def test_upload_stream_as_server_sent_events():
+    response = client.post(
+        "/api/v1/uploadfile/?mode=stream",
+        files=[("files", ("notes.txt", b"Meeting notes", "text/plain"))],
+        headers={"Accept": "text/event-stream"},
+    )
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert [event[0] for event in events] == ["event: file", "event: summary"]
+    assert json.loads(events[0][1][len("data: "):])["file_name"] == "notes.txt"
+
+
+def test_images_get_thumbnails_and_near_duplicates_reuse_ocr(monkeypatch):
+    ocr_calls = []
+
+    async def perform_ocr(data, block=True):
+        ocr_calls.append(data)
+        return "Invoice 4711"
+
+    monkeypatch.setattr(file_processing, "perform_ocr", perform_ocr)
+    page = make_text_page(size=(1600, 1200))
+    uploads = [
+        ("scan.png", page_bytes(page, "PNG"), "image/png"),
+        ("resent.png", page_bytes(page, "PNG", dpi=(150, 150)), "image/png"),
+        ("blank.png", page_bytes(Image.new("L", (800, 600), 255), "PNG"), "image/png"),
+    ]
+    results = []
+    for upload in uploads:
+        response = client.post("/api/v1/uploadfile/", files=[("files", upload)])
         assert response.status_code == 200
-        assert "extracted_text" in response.json()
+        results.append(response.json()["files"][0])
+
+    scan, resent, blank = results
+    assert len(ocr_calls) == 1
+    assert resent["file_id"] != scan["file_id"]
+    assert resent["extracted_text"] == "Invoice 4711" and resent["duplicate_of"] == scan["file_id"]
+    assert blank["extracted_text"] == ""
+    assert (scan["width"], scan["height"]) == (1600, 1200)
+
+    response = client.get(scan["thumbnail_url"])
+    assert response.headers["content-type"] == "image/jpeg"
+    assert Image.open(io.BytesIO(response.content)).size == (256, 192)
+    assert client.get("/api/v1/files/0123456789abcdef0123456789abcdef/thumbnail").status_code == 404
+
+
+def test_documents_from_the_same_template_are_not_merged(monkeypatch):
+    ocr_calls = []
+
+    async def perform_ocr(data, block=True):
+        ocr_calls.append(data)
+        return f"Invoice {len(ocr_calls)}"
+
+    monkeypatch.setattr(file_processing, "perform_ocr", perform_ocr)
+    results = []
+    for number in ("4711", "4712"):
+        page = make_text_page(words=f"Invoice {number} total due")
+        upload = (f"invoice-{number}.png", page_bytes(page, "PNG"), "image/png")
+        response = client.post("/api/v1/uploadfile/", files=[("files", upload)])
+        results.append(response.json()["files"][0])
+
+    assert len(ocr_calls) == 2
+    assert "duplicate_of" not in results[1]
+    assert [result["extracted_text"] for result in results] == ["Invoice 1", "Invoice 2"]
+
+
+def test_a_candidate_differing_in_one_field_is_ocrd_again(monkeypatch):
+    ocr_calls = []
+
+    async def perform_ocr(data, block=True):
+        ocr_calls.append(data)
+        return f"Invoice {len(ocr_calls)}"
+
+    monkeypatch.setattr(file_processing, "perform_ocr", perform_ocr)
+    # Every indexed image is a candidate: only the pixel comparison stands between them
+    monkeypatch.setattr(image_index, "max_distance", 256)
+    uploads = [
+        ("first.png", page_bytes(make_invoice("1,200.00")), "image/png"),
+        ("second.png", page_bytes(make_invoice("7,900.00")), "image/png"),
+        ("resized.png", page_bytes(make_invoice("1,200.00").resize((640, 480))), "image/png"),
+    ]
+    results = []
+    for upload in uploads:
+        response = client.post("/api/v1/uploadfile/", files=[("files", upload)])
+        results.append(response.json()["files"][0])
+
+    assert len(ocr_calls) == 3
+    assert not any("duplicate_of" in result for result in results)
+    assert [result["extracted_text"] for result in results] == ["Invoice 1", "Invoice 2", "Invoice 3"]
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from app.services.history_store import HistoryStore
+
+
+@pytest.mark.asyncio
+async def test_append_and_read_recent(fake_redis):
+    store = HistoryStore(max_messages=3, ttl=60)
+    await store.append("c1", {"role": "user", "content": "a"}, {"role": "assistant", "content": "b"})
+    await store.append("c1", {"role": "user", "content": "c"}, {"role": "assistant", "content": "d"})
+
+    assert [m["content"] for m in await store.get_recent("c1")] == ["b", "c", "d"]
+    assert [m["content"] for m in await store.get_recent("c1", 2)] == ["c", "d"]
+    assert 0 < await fake_redis.ttl("history:c1") <= 60
+
+
+@pytest.mark.asyncio
+async def test_legacy_string_history_is_migrated(fake_redis):
+    legacy = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    await fake_redis.set("7", json.dumps(legacy))
+    await fake_redis.set("extraction:v1:text/plain:abc", json.dumps("not a history"))
+    store = HistoryStore(max_messages=10, ttl=60)
+
+    assert await store.get_recent(7) == legacy
+    assert await fake_redis.exists("7") == 0
+    assert await fake_redis.exists("extraction:v1:text/plain:abc") == 1
+
+
+@pytest.mark.asyncio
+async def test_migrate_all(fake_redis):
+    await fake_redis.set("1", json.dumps([{"role": "user", "content": "x"}]))
+    await fake_redis.set("2", json.dumps({"not": "a list"}))
+    store = HistoryStore(max_messages=10, ttl=60)
+
+    assert await store.migrate_all() == 1
+    assert await fake_redis.llen("history:1") == 1
+    assert await fake_redis.exists("2") == 1
@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.celery_app import celery
+from app.main import app
+from app.services import ingestion
+from app.services.extraction_cache import extraction_cache
+from app.services.upload_store import upload_store
+from app.tasks import ingest_file_task
+
+
+@pytest.fixture
+def eager_celery(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_store, "upload_dir", str(tmp_path))
+    monkeypatch.setattr(extraction_cache, "get_sync", lambda file_id, mime_type: None)
+    monkeypatch.setattr(extraction_cache, "set_sync", lambda file_id, mime_type, text: None)
+    previous = {key: celery.conf[key] for key in ("task_always_eager", "result_backend")}
+    celery.conf.update(task_always_eager=True, result_backend="cache+memory://")
+    celery.__dict__.pop("backend", None)
+    yield celery
+    celery.conf.update(previous)
+    celery.__dict__.pop("backend", None)
+
+
+def test_async_upload_returns_job_ids_and_completes(eager_celery):
+    client = TestClient(app)
+    response = client.post(
+        "/api/v1/uploadfile/?mode=async",
+        files=[("files", ("note.txt", b"background text", "text/plain"))],
+    )
+    assert response.status_code == 202
+    job = response.json()["jobs"][0]
+    assert job["file_name"] == "note.txt"
+
+    deadline = time.monotonic() + 5
+    while True:
+        status = client.get(job["status_url"]).json()
+        if status["state"] == "SUCCESS" or time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+
+    assert status["state"] == "SUCCESS"
+    assert status["result"]["extracted_text"] == "background text"
+    assert status["result"]["file_id"] == job["file_id"]
+
+
+@pytest.mark.asyncio
+async def test_eager_submit_errors_fail_the_job(eager_celery, monkeypatch):
+    events = []
+    monkeypatch.setattr(ingestion.ingestion_relay, "publish", lambda *event: events.append(event))
+
+    def apply_async(args, task_id):
+        raise RuntimeError("broker unavailable")
+
+    monkeypatch.setattr(ingest_file_task, "apply_async", apply_async)
+    job_id = await ingestion.submit_ingestion({"file_id": "f1", "file_name": "note.txt"}, "sid-1")
+    for _ in range(100):
+        if events:
+            break
+        await asyncio.sleep(0.01)
+
+    status = await ingestion.get_job_status(job_id)
+    assert status["state"] == "FAILURE" and "broker unavailable" in status["error"]
+    payload = {"job_id": job_id, "file_name": "note.txt", "error": "broker unavailable"}
+    assert events == [("sid-1", "ingestionFailed", payload)]
+
+def test_relay_emits_through_socketio_message_queue(monkeypatch):
+    emitted = []
+
+    class RecordingManager:
+        def __init__(self, url, channel, write_only):
+            assert write_only
+            self.url, self.channel = url, channel
+
+        def emit(self, event, data, room=None, namespace=None):
+            emitted.append((self.url, self.channel, event, data, room, namespace))
+
+    monkeypatch.setattr(ingestion.socketio, "RedisManager", RecordingManager)
+    relay = ingestion.IngestionEventRelay("events", message_queue="redis://mq:6379/3", socketio_channel="sio")
+
+    relay.publish("sid-1", "ingestionDone", {"job_id": "j"})
+
+    assert emitted == [("redis://mq:6379/3", "sio", "ingestionDone", {"job_id": "j"}, "sid-1", "/chat-socket")]
@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from app.services.llm_router import Backend, LLMRouter, parse_backends
+from app.services.ollama_client import OllamaClient, OllamaResponseError
+from benchmarks.fake_ollama import FakeOllama
+
+
+class FlakyOllama(FakeOllama):
+    """Fake Ollama that answers `status` (500 by default) to everything while `failing` is set."""
+
+    failing = False
+    status = 500
+
+    async def _reply(self, request, make_chunk):
+        if self.failing:
+            return web.json_response({"error": "model crashed"}, status=self.status)
+        return await super()._reply(request, make_chunk)
+
+    async def tags(self, request):
+        if self.failing:
+            return web.json_response({"error": "down"}, status=500)
+        return await super().tags(request)
+
+
+def backend(url, models=(), capacity=1):
+    client = OllamaClient(url, max_concurrency=capacity, max_queue=8, timeout=5, retries=0, pool_size=4)
+    return Backend(client, frozenset(models))
+
+
+@pytest_asyncio.fixture
+async def servers():
+    started = []
+
+    async def start(count, cls=FakeOllama, **kwargs):
+        for _ in range(count):
+            server = cls(**kwargs)
+            await server.start()
+            started.append(server)
+        return started[-count:]
+
+    yield start
+    for server in started:
+        await server.stop()
+
+
+def test_parse_backends():
+    spec = "http://a:11434=llama3.1:8b|phi3:mini@4, http://b:11434@2,http://c:11434"
+
+    assert parse_backends(spec) == [
+        {"url": "http://a:11434", "models": ["llama3.1:8b", "phi3:mini"], "capacity": 4},
+        {"url": "http://b:11434", "models": [], "capacity": 2},
+        {"url": "http://c:11434", "models": [], "capacity": None},
+    ]
+
+
+def test_choose_model_routes_short_questions_and_documents():
+    router = LLMRouter([], default_model="big", small_model="small", small_max_chars=20, document_model="docs")
+
+    assert router.choose_model("What time is it?") == "small"
+    assert router.choose_model("Summarize the obligations of each party in this contract.") == "big"
+    assert router.choose_model("Is it valid?", has_documents=True) == "docs"
+    assert router.models() == ["big", "docs", "small"]
+
+
+@pytest.mark.asyncio
+async def test_requests_go_to_least_loaded_backend_serving_the_model(servers):
+    a, b, c = await servers(3, latency=0.1)
+    router = LLMRouter(
+        [backend(a.url, ["big"]), backend(b.url, ["big"]), backend(c.url, ["small"])], default_model="big"
+    )
+    try:
+        await asyncio.gather(*(router.chat({"model": "big", "messages": []}) for _ in range(4)))
+        await router.chat({"model": "small", "messages": []})
+    finally:
+        await router.close()
+
+    assert (a.requests, b.requests, c.requests) == (2, 2, 1)
+    assert a.max_in_flight == b.max_in_flight == 1
+    with pytest.raises(ValueError):
+        router.candidates("unknown")
+
+
+@pytest.mark.asyncio
+async def test_fails_over_ejects_and_readmits(servers):
+    (flaky,) = await servers(1, cls=FlakyOllama)
+    (healthy,) = await servers(1)
+    router = LLMRouter([backend(flaky.url), backend(healthy.url)], default_model="m", eject_after=2, eject_seconds=60)
+    flaky.failing = True
+    try:
+        for _ in range(3):
+            reply = await router.chat({"model": "m", "messages": []})
+            assert reply["done"]
+        # Ejected after two errors; the third request went straight to the healthy backend
+        assert not router.backends[0].healthy
+        assert router.backends[0].failures == 2
+
+        chunks = [chunk async for chunk in router.stream_chat({"model": "m", "messages": []})]
+        assert chunks[-1]["done"]
+
+        await router.check_health()
+        assert not router.backends[0].healthy
+        flaky.failing = False
+        await router.check_health()
+        assert router.backends[0].healthy
+    finally:
+        await router.close()
+
+    assert healthy.requests == 4
+
+
+@pytest.mark.asyncio
+async def test_stream_fails_over_before_the_first_chunk(servers):
+    (flaky,) = await servers(1, cls=FlakyOllama)
+    (healthy,) = await servers(1, tokens=3)
+    flaky.failing = True
+    router = LLMRouter([backend(flaky.url), backend(healthy.url)], default_model="m")
+    try:
+        chunks = [chunk async for chunk in router.stream_chat({"model": "m", "messages": []})]
+    finally:
+        await router.close()
+
+    assert "".join(chunk["message"]["content"] for chunk in chunks).split() == ["the", "quick", "brown"]
+    assert router.backends[0].failures == 1
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_raised_without_failover(servers):
+    (rejecting,) = await servers(1, cls=FlakyOllama)
+    (healthy,) = await servers(1)
+    rejecting.failing, rejecting.status = True, 400
+    router = LLMRouter([backend(rejecting.url), backend(healthy.url)], default_model="m", eject_after=1)
+    try:
+        with pytest.raises(OllamaResponseError) as raised:
+            await router.chat({"model": "m", "messages": []})
+        assert raised.value.status == 400
+        with pytest.raises(OllamaResponseError):
+            [chunk async for chunk in router.stream_chat({"model": "m", "messages": []})]
+    finally:
+        await router.close()
+
+    assert router.backends[0].healthy and router.backends[0].failures == 0
+    assert healthy.requests == 0
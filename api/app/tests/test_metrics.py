@@ -0,0 +1,83 @@
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.metrics import Registry, merge_renders
+from app.main import app
+from app.services.metrics_aggregator import MetricsAggregator, metrics_aggregator
+from app.services.warmup import warmup
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("op_seconds", "Op latency.", ["op"], buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value, "get")
+
+    lines = registry.render().splitlines()
+
+    assert 'op_seconds_bucket{op="get",le="0.1"} 2' in lines
+    assert 'op_seconds_bucket{op="get",le="1"} 3' in lines
+    assert 'op_seconds_bucket{op="get",le="+Inf"} 4' in lines
+    assert 'op_seconds_count{op="get"} 4' in lines
+    assert 'op_seconds_sum{op="get"} 3.65' in lines
+
+
+def test_counters_and_callback_gauges():
+    registry = Registry()
+    hits = registry.counter("hits_total", "Hits.", ["cache", "result"])
+    registry.gauge("depth", "Depth.", function=lambda: 7)
+    hits.inc("extraction", "l1")
+    hits.inc("extraction", "l1")
+
+    text = registry.render()
+
+    assert "# TYPE hits_total counter" in text
+    assert 'hits_total{cache="extraction",result="l1"} 2' in text
+    assert "depth 7" in text
+
+
+def test_worker_renders_merge_into_one_exposition():
+    registry = Registry()
+    hits = registry.counter("hits_total", "Hits.", ["cache"])
+    registry.gauge("depth", "Depth.", function=lambda: 7)
+    hits.inc("extraction")
+
+    text = merge_renders([registry.render({"worker": "a"}), registry.render({"worker": "b"})])
+
+    assert text.count("# TYPE hits_total counter") == 1
+    assert 'hits_total{cache="extraction",worker="a"} 1' in text
+    assert 'hits_total{cache="extraction",worker="b"} 1' in text
+    assert 'depth{worker="b"} 7' in text
+
+
+@pytest.mark.asyncio
+async def test_aggregator_reports_live_workers_and_drops_stale_ones(fake_redis):
+    aggregator = MetricsAggregator(interval=15, stale_after=45)
+    other = 'app_ready{worker="other:1"} 1'
+    await fake_redis.hset(aggregator.KEY, mapping={
+        "other:1": json.dumps({"time": time.time(), "text": f"# HELP app_ready x\n# TYPE app_ready gauge\n{other}\n"}),
+        "gone:2": json.dumps({"time": time.time() - 60, "text": 'app_ready{worker="gone:2"} 1\n'}),
+    })
+
+    text = await aggregator.render()
+
+    assert other in text
+    assert f'app_ready{{worker="{aggregator.worker}"}}' in text
+    assert text.count("# TYPE app_ready gauge") == 1
+    assert "gone:2" not in text
+    assert sorted(await fake_redis.hkeys(aggregator.KEY)) == sorted([aggregator.worker, "other:1"])
+
+
+def test_metrics_endpoint(monkeypatch):
+    monkeypatch.setattr(warmup, "enabled", False)
+    monkeypatch.setattr(metrics_aggregator, "interval", 0)
+    with TestClient(app) as client:
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE extraction_seconds histogram" in response.text
+    assert f'extraction_jobs_in_flight{{worker="{metrics_aggregator.worker}"}} 0' in response.text
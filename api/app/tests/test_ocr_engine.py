@@ -0,0 +1,104 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.core.metrics import OCR_SECONDS
+from app.services import ocr_engine
+from app.services.ocr_engine import binarize, estimate_skew, ocr_image_sync, preprocess, tile_rows
+from app.tests.helpers import make_page, make_text_page, page_bytes
+
+
+def test_binarize_separates_ink_from_background():
+    pixels = np.array([[10, 30, 200, 240]], dtype=np.uint8)
+    assert binarize(pixels).tolist() == [[0, 0, 255, 255]]
+
+
+def test_estimate_skew_straightens_rotated_page():
+    binary = binarize(np.asarray(make_page(angle=3)))
+    angle = estimate_skew(binary)
+    assert abs(angle + 3) <= 0.5
+    straightened = np.asarray(Image.fromarray(binary).rotate(angle, fillcolor=255))
+    assert abs(estimate_skew(straightened)) <= 0.5
+
+
+def test_preprocess_upscales_small_images():
+    binary = preprocess(make_page(width=400, height=300, lines=4))
+    assert max(binary.shape) == 1000
+    assert set(np.unique(binary)) <= {0, 255}
+
+
+def test_tile_rows_cut_between_lines():
+    binary = binarize(np.asarray(make_page(height=3200, lines=40)))
+    rows = tile_rows(binary, 800)
+    assert len(rows) > 1
+    assert rows[0][0] == 0 and rows[-1][1] == binary.shape[0]
+    ink = (binary == 0).sum(axis=1)
+    for _, bottom in rows[:-1]:
+        assert ink[bottom] == 0
+
+
+def test_ocr_image_sync_reads_every_tiff_frame(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ocr_engine, "_recognize", lambda pixels: calls.append(pixels.shape) or f"frame {len(calls)}")
+    buffer = io.BytesIO()
+    first, second = make_page(lines=5), make_page(lines=8)
+    first.save(buffer, format="TIFF", save_all=True, append_images=[second])
+
+    text = ocr_image_sync(buffer.getvalue())
+
+    assert text == "frame 1\nframe 2"
+    assert len(calls) == 2
+
+
+def test_tall_pages_are_tiled_only_with_in_process_tesseract(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ocr_engine, "_recognize", lambda pixels: calls.append(pixels.shape) or "text")
+    monkeypatch.setattr(ocr_engine.settings, "OCR_TILE_HEIGHT", 400)
+    page = make_page(width=1000, height=3000, lines=40)
+
+    monkeypatch.setattr(ocr_engine, "tesserocr", None)
+    ocr_image_sync(page_bytes(page))
+    assert len(calls) == 1
+
+    calls.clear()
+    monkeypatch.setattr(ocr_engine, "tesserocr", object())
+    ocr_image_sync(page_bytes(page))
+    assert len(calls) > 1
+
+
+@pytest.mark.asyncio
+async def test_ocr_time_is_recorded_per_image(monkeypatch):
+    async def run_inline(fn, *args, block=True):
+        return fn(*args)
+
+    monkeypatch.setattr(ocr_engine, "_recognize", lambda pixels: "text")
+    monkeypatch.setattr(ocr_engine.extraction_executor, "run", run_inline)
+    observed = OCR_SECONDS.count()
+
+    assert await ocr_engine.ocr_image(page_bytes(make_page(lines=5))) == "text"
+    assert OCR_SECONDS.count() == observed + 1
+
+
+def test_perceptual_hash_matches_near_duplicates_only():
+    page = make_text_page()
+    buffer = io.BytesIO()
+    page.resize((640, 480)).save(buffer, "JPEG", quality=60)
+    rescan = Image.open(buffer).convert("L")
+
+    rotated = page.rotate(0.5, fillcolor=255)
+    other_text = make_text_page(words="Completely different words here")
+
+    def distance(other):
+        return bin(ocr_engine.perceptual_hash(page) ^ ocr_engine.perceptual_hash(other)).count("1")
+
+    assert max(distance(rescan), distance(rotated)) <= 20 < distance(other_text)
+
+
+def test_text_score_separates_text_from_blank_and_smooth_images():
+    gradient = Image.fromarray(np.tile(np.linspace(0, 255, 400, dtype=np.uint8), (300, 1)))
+    assert ocr_engine.text_score(Image.new("L", (400, 300), 255)) == 0
+    assert ocr_engine.text_score(gradient) < 0.01
+    assert ocr_engine.text_score(make_text_page()) > 0.05
+    assert ocr_engine.text_score(make_text_page(background=30, ink=220)) > 0.05
@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+
+from app.services.ollama_client import OllamaBusy, OllamaClient
+
+
+async def start_stub_server(delay: float = 0.0):
+    async def chat(request):
+        payload = await request.json()
+        await asyncio.sleep(delay)
+        if payload.get("stream"):
+            response = web.StreamResponse()
+            await response.prepare(request)
+            for token in ["Hel", "lo"]:
+                chunk = {"message": {"role": "assistant", "content": token}, "done": False}
+                await response.write(json.dumps(chunk).encode() + b"\n")
+            await response.write(json.dumps({"message": {"content": ""}, "done": True}).encode() + b"\n")
+            await response.write_eof()
+            return response
+        return web.json_response({"message": {"role": "assistant", "content": "Hello"}, "done": True})
+
+    app = web.Application()
+    app.router.add_post("/api/chat", chat)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def make_client(base_url, max_concurrency=2, max_queue=4):
+    return OllamaClient(
+        base_url=base_url,
+        max_concurrency=max_concurrency,
+        max_queue=max_queue,
+        timeout=5,
+        retries=0,
+        pool_size=4,
+    )
+
+
+@pytest.mark.asyncio
+async def test_chat_and_stream():
+    runner, url = await start_stub_server()
+    client = make_client(url)
+    try:
+        data = await client.chat({"model": "m", "messages": []})
+        assert data["message"]["content"] == "Hello"
+
+        chunks = [chunk async for chunk in client.stream_chat({"model": "m", "messages": []})]
+        assert "".join(c["message"]["content"] for c in chunks) == "Hello"
+        assert chunks[-1]["done"]
+        assert client.in_flight == 0
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_rejects_when_queue_is_full():
+    runner, url = await start_stub_server(delay=0.3)
+    client = make_client(url, max_concurrency=1, max_queue=0)
+    try:
+        busy = asyncio.create_task(client.chat({"model": "m", "messages": []}))
+        await asyncio.sleep(0.05)
+        assert client.in_flight == 1
+        with pytest.raises(OllamaBusy):
+            await client.chat({"model": "m", "messages": []})
+        await busy
+    finally:
+        await client.close()
+        await runner.cleanup()
@@ -0,0 +1,32 @@
+import pytest
+
+from app.services.extraction_executor import ExtractionExecutor
+from app.services import pdf_extraction
+from app.services.pdf_extraction import extract_pdf_pages, join_pages, page_offsets, page_ranges
+from benchmarks.corpus import make_pdf
+
+
+def test_page_ranges_cover_every_page_once():
+    ranges = page_ranges(page_count=23, workers=2, min_pages=4)
+    assert [p for r in ranges for p in r] == list(range(23))
+    assert all(len(r) >= 4 for r in ranges[:-1])
+
+
+@pytest.mark.asyncio
+async def test_extract_pdf_pages_in_parallel(monkeypatch):
+    executor = ExtractionExecutor(max_workers=2, queue_size=8, timeout=30)
+    monkeypatch.setattr(pdf_extraction, "extraction_executor", executor)
+    monkeypatch.setattr(pdf_extraction.settings, "PDF_MIN_PAGES_PER_JOB", 2)
+    try:
+        pdf = make_pdf([[f"Page number {n}"] for n in range(1, 10)])
+        pages = await extract_pdf_pages(pdf)
+    finally:
+        executor.shutdown()
+
+    assert [page["page"] for page in pages] == list(range(1, 10))
+    assert pages[4]["text"] == "Page number 5"
+    assert not any(page["ocr"] for page in pages)
+
+    text = join_pages(pages)
+    offsets = page_offsets(text)
+    assert text[offsets[2]["start"]:offsets[2]["end"]] == "Page number 3"
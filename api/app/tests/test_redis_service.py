@@ -0,0 +1,92 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.core.metrics import REDIS_ERRORS_TOTAL
+from app.services.codecs import make_codec
+from app.services.redis_service import LocalCache, RedisService
+
+
+def make_service(server, **cache_options):
+    service = RedisService(local_cache=LocalCache(**{"max_entries": 8, "ttl": 60, "prefixes": ["system:"], **cache_options}))
+    service.redis = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    service.binary_redis = fakeredis.aioredis.FakeRedis(server=server)
+    return service
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+async def wait_for_subscriber(service):
+    for _ in range(200):
+        if (await service.redis.pubsub_numsub(service.invalidation_channel))[0][1]:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("No subscriber on the invalidation channel")
+
+
+def test_local_cache_evicts_least_recently_used_and_skips_stale_reads():
+    cache = LocalCache(max_entries=2, ttl=60, prefixes=["system:"])
+    assert not cache.cacheable("summary:c1")
+
+    cache.put("system:a", "1", cache.version)
+    cache.put("system:b", "2", cache.version)
+    assert cache.get("system:a") == "1"
+    cache.put("system:c", "3", cache.version)
+    assert cache.get("system:b") is None and cache.get("system:c") == "3"
+
+    version = cache.version
+    cache.invalidate("system:a")
+    cache.put("system:a", "old", version)
+    assert cache.get("system:a") is None
+
+
+@pytest.mark.asyncio
+async def test_mget_and_set_many_use_one_round_trip_each():
+    service = make_service(fakeredis.FakeServer())
+    codec = make_codec("msgpack+zstd")
+
+    await service.set_many({"a": {"n": 1}, "b": [2]}, expire=60, codec=codec)
+    assert await service.mget(["a", "missing", "b"], codec=codec) == [{"n": 1}, None, [2]]
+    assert 0 < await service.binary_redis.ttl("a") <= 60
+    assert service.get_stats()["round_trips"] == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("spec", ["json+zlib", "msgpack+zstd"])
+async def test_corrupt_compressed_values_read_as_missing(spec):
+    service = make_service(fakeredis.FakeServer())
+    codec = make_codec(spec)
+    stored = codec.dumps({"n": 1})
+    await service.binary_redis.set("a", stored[: len(stored) // 2])
+
+    with pytest.raises(ValueError):
+        codec.loads(stored[: len(stored) // 2])
+    errors = REDIS_ERRORS_TOTAL.value("get")
+    assert await service.get("a", codec=codec) is None
+    assert REDIS_ERRORS_TOTAL.value("get") == errors
+
+
+@pytest.mark.asyncio
+async def test_local_cache_serves_hot_keys_and_is_invalidated_across_workers():
+    server = fakeredis.FakeServer()
+    worker, other = make_service(server), make_service(server)
+    await worker.start()
+    try:
+        await wait_for_subscriber(other)
+        await other.set("system:c1", "first")
+        assert await worker.get("system:c1") == "first"
+        await worker.redis.set("system:c1", '"written behind the cache"')
+        assert await worker.get("system:c1") == "first"
+        assert worker.get_stats()["local_cache"]["hit_ratio"] == 0.5
+
+        await other.set("system:c1", "second")
+        await wait_for(lambda: len(worker.local_cache) == 0)
+        assert await worker.get("system:c1") == "second"
+    finally:
+        await worker.disconnect()
@@ -0,0 +1,69 @@
+import pytest
+
+from app.services import ollama_service
+from app.services.history_store import history_store
+from app.services.response_cache import ResponseCache, response_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_response_cache():
+    response_cache.clear()
+
+
+@pytest.fixture
+def ollama_calls(monkeypatch):
+    calls = []
+
+    async def chat(payload, timeout=None):
+        calls.append(payload)
+        return {"model": payload["model"], "message": {"role": "assistant", "content": f"answer {len(calls)}"}}
+
+    monkeypatch.setattr(ollama_service.llm_router, "chat", chat)
+    return calls
+
+
+def test_key_normalizes_text_and_references_documents_by_id():
+    cache = ResponseCache(max_entries=4, ttl=60, history_window=2)
+    system = {"role": "system", "content": "You are  a lawyer."}
+
+    def key(question, file_ids, document_text="excerpt", history=()):
+        messages = [system, *history, {"role": "user", "content": f"{question} {document_text}"}]
+        return cache.make_key("m", {"num_ctx": 4096}, messages, question, file_ids)
+
+    base = key("Is clause 4 valid?", ["a", "b"])
+    assert key("  is CLAUSE 4   valid? ", ["b", "a"], document_text="other excerpt") == base
+    assert key("Is clause 4 valid?", ["a", "c"]) != base
+    old = [{"role": "user", "content": "old"}, {"role": "assistant", "content": "older"}]
+    recent = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    assert key("Is clause 4 valid?", ["a", "b"], history=old + recent) == key(
+        "Is clause 4 valid?", ["a", "b"], history=recent
+    )
+
+
+@pytest.mark.asyncio
+async def test_local_tier_evicts_least_recently_used_and_expires(fake_redis, monkeypatch):
+    cache = ResponseCache(max_entries=2, ttl=60, history_window=0)
+    for key in ("k1", "k2"):
+        cache._store_local(key, {"message": {"content": key}})
+    await cache.get("k1")
+    cache._store_local("k3", {"message": {"content": "k3"}})
+    assert list(cache._entries) == ["k1", "k3"]
+
+    monkeypatch.setattr(cache, "ttl", -1)
+    cache._store_local("k4", {"message": {"content": "k4"}})
+    assert await cache.get("k4") is None
+    assert cache.stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_repeat_question_is_answered_from_cache(fake_redis, ollama_calls):
+    first = await ollama_service.send_to_ollama_service("c1", "Summarize it", question="Summarize it", file_ids=["f1"])
+    repeat = await ollama_service.send_to_ollama_service("c2", "summarize  it", question="summarize  it", file_ids=["f1"])
+    bypass = await ollama_service.send_to_ollama_service("c3", "Summarize it", use_cache=False)
+
+    assert len(ollama_calls) == 2
+    assert repeat["message"]["content"] == first["message"]["content"] == "answer 1"
+    assert repeat["cached"] and "cached" not in bypass
+    history = await history_store.get_recent("c2", 10)
+    assert [m["content"] for m in history] == ["summarize  it", "answer 1"]
+    assert response_cache.hit_rate() > 0
@@ -0,0 +1,81 @@
+import hashlib
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.middleware import RequestSizeLimitMiddleware
+from app.main import app
+from app.services.upload_store import upload_store
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_store, "upload_dir", str(tmp_path))
+    monkeypatch.setattr(upload_store, "chunk_size", 4)
+    return tmp_path
+
+
+def test_upload_spools_to_disk_and_returns_fetch_url():
+    content = b"hello spooled world"
+    response = client.post(
+        "/api/v1/uploadfile/",
+        files=[("files", ("note.txt", content, "text/plain"))],
+    )
+    assert response.status_code == 200
+    result = response.json()["files"][0]
+    assert result["extracted_text"] == "hello spooled world"
+    assert result["file_id"] == hashlib.md5(content).hexdigest()
+    assert "image" not in result
+
+    fetched = client.get(result["url"])
+    assert fetched.status_code == 200
+    assert fetched.content == content
+
+
+def test_upload_over_file_limit_is_rejected(upload_dir, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_FILE_BYTES", 8)
+    response = client.post(
+        "/api/v1/uploadfile/",
+        files=[("files", ("big.txt", b"x" * 32, "text/plain"))],
+    )
+    assert response.status_code == 413
+    assert list(upload_dir.iterdir()) == []
+
+
+def test_unknown_file_id_is_not_found():
+    assert client.get("/api/v1/files/../../etc/passwd").status_code == 404
+    assert client.get(f"/api/v1/files/{'0' * 32}").status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_chunked_body_over_request_limit_is_cut_off():
+    limited = FastAPI()
+
+    @limited.post("/upload")
+    async def upload(request: Request):
+        return {"size": len(await request.body())}
+
+    async def post(chunk_count):
+        received, sent = [], []
+
+        async def receive():
+            received.append(b"x" * 4)
+            return {"type": "http.request", "body": received[-1], "more_body": len(received) < chunk_count}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http", "method": "POST", "path": "/upload", "raw_path": b"/upload", "root_path": "",
+            "query_string": b"", "headers": [(b"transfer-encoding", b"chunked")], "http_version": "1.1",
+            "scheme": "http", "server": ("test", 80), "client": ("test", 1234),
+        }
+        await RequestSizeLimitMiddleware(limited, max_bytes=10, path_prefix="/upload")(scope, receive, send)
+        return sent[0]["status"], len(received)
+
+    assert await post(2) == (200, 2)
+    assert await post(100) == (413, 3)
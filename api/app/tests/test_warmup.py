@@ -0,0 +1,70 @@
+import subprocess
+import sys
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import warmup as warmup_module
+from app.services.llm_router import Backend, LLMRouter
+from app.services.ollama_client import OllamaClient
+from app.services.redis_service import redis_service
+from app.services.warmup import WarmUp, warmup
+from benchmarks.fake_ollama import FakeOllama
+
+
+def test_importing_the_app_does_not_load_extractors():
+    code = "import sys, app.main; print(sorted(m for m in ('PyPDF2', 'docx', 'pytesseract', 'PIL') if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+
+    assert output.strip() == "[]"
+
+
+def use_router(monkeypatch, url, keep_alive=""):
+    client = OllamaClient(url, max_concurrency=2, max_queue=2, timeout=5, retries=0, pool_size=2, keep_alive=keep_alive)
+    router = LLMRouter([Backend(client, frozenset())], default_model="llama3.1:8b")
+    monkeypatch.setattr(warmup_module, "llm_router", router)
+    monkeypatch.setattr(redis_service, "redis", fakeredis.aioredis.FakeRedis(decode_responses=True))
+    return router
+
+
+@pytest.mark.asyncio
+async def test_warm_up_preloads_models_with_keep_alive(monkeypatch):
+    server = FakeOllama()
+    router = use_router(monkeypatch, await server.start(), keep_alive="-1")
+    try:
+        service = WarmUp(enabled=True, models=["llama3.1:8b"], extractors=["pdf", "unknown"], timeout=5)
+        assert not service.ready
+
+        await service.run()
+
+        assert service.ready
+        assert server.last_payload == {"keep_alive": "-1", "model": "llama3.1:8b", "stream": False}
+        assert set(service.steps) == {"redis", "ollama_pool", "extractors", "model:llama3.1:8b"}
+        assert all(step["status"] == "ok" for step in service.steps.values())
+    finally:
+        await router.close()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_is_not_ready_until_models_load(monkeypatch):
+    router = use_router(monkeypatch, "http://127.0.0.1:9")
+    try:
+        service = WarmUp(enabled=True, models=["llama3.1:8b"], extractors=[], timeout=0.5)
+        await service.run()
+    finally:
+        await router.close()
+
+    assert not service.ready
+    assert service.steps["model:llama3.1:8b"]["status"] == "failed"
+
+
+def test_ready_endpoint(monkeypatch):
+    client = TestClient(app)
+    monkeypatch.setattr(warmup, "_ready", False)
+    assert client.get("/ready").status_code == 503
+    monkeypatch.setattr(warmup, "_ready", True)
+    assert client.get("/ready").json()["ready"] is True
+    assert client.get("/health").json() == {"status": "ok"}
@@ -1,6 +1,9 @@
+import io
 import os
 import tempfile
 import shutil
+from contextlib import contextmanager
+from typing import Union
 
 def save_temp_file(file):
     """Save an uploaded file to a temporary file."""
@@ -21,3 +24,16 @@ def delete_temp_dir(dir_path):
     """Delete a temporary directory."""
     if os.path.exists(dir_path):
         shutil.rmtree(dir_path)
+
+
+@contextmanager
+def open_source(source: Union[bytes, str]):
+    """
+    Open in-memory bytes or a file path as a seekable binary stream.
+    Files are read lazily, so readers only load the parts they touch.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        yield io.BytesIO(source)
+        return
+    with open(source, "rb") as f:
+        yield f
@@ -0,0 +1,173 @@
+"""
+Deterministic fixture corpus for benchmarks: PDFs, DOCX and .doc files,
+text files and images generated from a seed, so every run uploads the same bytes.
+"""
+
+from typing import List, Optional, Tuple
+import io
+import os
+import random
+import struct
+
+from docx import Document
+from docx.table import _Cell
+from PIL import Image, ImageDraw
+from PyPDF2 import PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+VOCABULARY = (
+    "invoice contract payment delivery schedule clause party agreement total amount due "
+    "shipment warehouse quarterly revenue forecast budget audit compliance report section "
+    "employee policy leave request approval manager department project milestone risk"
+).split()
+
+MIME_TYPES = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".txt": "text/plain",
+    ".png": "image/png",
+    ".doc": "application/msword",
+}
+
+
+def _sentences(rng: random.Random, count: int) -> List[str]:
+    return [
+        " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(8, 16))).capitalize() + "."
+        for _ in range(count)
+    ]
+
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """Build a PDF with a Helvetica text layer, one list of lines per page."""
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    for lines in pages:
+        writer.add_blank_page(width=612, height=792)
+        page = writer.pages[-1]
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)}),
+        })
+        text = " T* ".join(f"({line})" + " Tj" for line in lines)
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 10 Tf 14 TL 50 740 Td {text} ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def make_docx(
+    paragraphs: List[str], rows: Optional[List[List[str]]] = None, header: str = "", footer: str = ""
+) -> bytes:
+    """Build a DOCX with the given paragraphs, then a table of `rows`."""
+    document = Document()
+    if header:
+        document.sections[0].header.paragraphs[0].text = header
+    if footer:
+        document.sections[0].footer.paragraphs[0].text = footer
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    if rows:
+        table = document.add_table(rows=0, cols=len(rows[0]))
+        for row in rows:
+            # Row.cells walks the whole table; building cells from the row's own
+            # <w:tc> elements keeps large tables linear to generate.
+            table_row = table.add_row()
+            for tc, text in zip(table_row._tr.tc_lst, row):
+                _Cell(tc, table).text = text
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def make_doc(paragraphs: List[str]) -> bytes:
+    """
+    Build a minimal Word 97-2003 .doc: an OLE2 compound file whose
+    WordDocument stream holds the text as one 8-bit piece.
+    """
+    sector, end, free = 512, 0xFFFFFFFE, 0xFFFFFFFF
+    text = "\r".join(paragraphs).encode("cp1252", errors="replace") + b"\r"
+    text_offset = 0x800
+
+    fib = bytearray(text_offset)
+    struct.pack_into("<HH", fib, 0, 0xA5EC, 0x00C1)  # wIdent, nFib (Word 97)
+    struct.pack_into("<H", fib, 0x0A, 0x0200)  # fWhichTblStm: the table stream is 1Table
+    struct.pack_into("<I", fib, 0x4C, len(text))  # ccpText
+    piece_table = struct.pack("<II", 0, len(text)) + struct.pack("<HIH", 0, (text_offset * 2) | 0x40000000, 0)
+    clx = b"\x02" + struct.pack("<I", len(piece_table)) + piece_table
+    struct.pack_into("<II", fib, 0x1A2, 0, len(clx))  # fcClx, lcbClx
+    streams = [("WordDocument", bytes(fib) + text), ("1Table", clx)]
+
+    # Layout: sector 0 holds the FAT, sector 1 the directory, then the streams.
+    # Streams are padded to 4096 bytes so none lives in the mini stream.
+    fat, body, next_sector = [0xFFFFFFFD, end], [], 2
+    entries = [("Root Entry", 5, end, 0, 1)]
+    for index, (name, data) in enumerate(streams):
+        data = data.ljust(max(4096, -(-len(data) // sector) * sector), b"\0")
+        count = len(data) // sector
+        fat.extend(list(range(next_sector + 1, next_sector + count)) + [end])
+        entries.append((name, 2, next_sector, len(data), index + 2 if index + 1 < len(streams) else free))
+        body.append(data)
+        next_sector += count
+    if len(fat) > sector // 4:
+        raise ValueError("Document too large for a single FAT sector.")
+
+    directory = bytearray()
+    for name, kind, start, size, link in entries:
+        entry = bytearray(128)
+        encoded = name.encode("utf-16-le") + b"\0\0"
+        entry[:len(encoded)] = encoded
+        struct.pack_into("<HBB", entry, 64, len(encoded), kind, 1)
+        child, right = (link, free) if kind == 5 else (free, link)
+        struct.pack_into("<III", entry, 68, free, right, child)
+        struct.pack_into("<II", entry, 116, start, size)
+        directory += entry
+    directory = bytes(directory.ljust(sector, b"\0"))
+
+    header = bytearray(sector)
+    header[:8] = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+    struct.pack_into("<HHHHH", header, 0x18, 0x3E, 3, 0xFFFE, 9, 6)
+    struct.pack_into("<IIIIIIIII", header, 0x2C, 1, 1, 0, 4096, end, 0, end, 0, 0)
+    struct.pack_into("<108I", header, 0x50, *([free] * 108))
+    fat_sector = struct.pack(f"<{sector // 4}I", *(fat + [free] * (sector // 4 - len(fat))))
+    return bytes(header) + fat_sector + directory + b"".join(body)
+
+
+def make_image(lines: List[str], width: int = 1240) -> bytes:
+    image = Image.new("L", (width, 60 + 28 * len(lines)), 255)
+    draw = ImageDraw.Draw(image)
+    for n, line in enumerate(lines):
+        draw.text((40, 30 + 28 * n), line, fill=0)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def build_corpus(directory: str, files_per_type: int = 4, seed: int = 7) -> List[Tuple[str, str]]:
+    """
+    Write the corpus to `directory` (reusing files already there) and
+    return `(path, mime_type)` pairs in a stable order.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    corpus = []
+    for n in range(files_per_type):
+        builders = {
+            ".pdf": lambda: make_pdf([_sentences(rng, 40) for _ in range(rng.randint(2, 12))]),
+            ".docx": lambda: make_docx(_sentences(rng, rng.randint(30, 200))),
+            ".txt": lambda: "\n".join(_sentences(rng, rng.randint(50, 400))).encode("utf-8"),
+            ".png": lambda: make_image(_sentences(rng, rng.randint(10, 40))),
+            ".doc": lambda: make_doc(_sentences(rng, rng.randint(10, 30))),
+        }
+        for extension, build in builders.items():
+            content = build()  # always consume the RNG so files stay stable
+            path = os.path.join(directory, f"sample-{n}{extension}")
+            if not os.path.exists(path):
+                with open(path, "wb") as out:
+                    out.write(content)
+            corpus.append((path, MIME_TYPES[extension]))
+    return corpus
@@ -0,0 +1,100 @@
+"""
+Compare the streaming DOCX extractor with python-docx on a generated
+contract-sized document: extraction time, peak memory and how much of the
+text each one finds. Memory is the growth of the peak RSS in a fresh
+process, since both parse with lxml, whose trees tracemalloc cannot see.
+
+    python -m benchmarks.docx_bench --paragraphs 20000 --rows 2000
+"""
+
+from typing import Callable, Dict
+import argparse
+import importlib
+import io
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from docx import Document
+
+from benchmarks.corpus import _sentences, make_docx
+
+
+def python_docx_text(data: bytes) -> str:
+    """The previous implementation: build the document tree, join the paragraphs."""
+    document = Document(io.BytesIO(data))
+    return "\n".join(paragraph.text for paragraph in document.paragraphs).strip()
+
+
+EXTRACTORS = {
+    "python_docx": "benchmarks.docx_bench:python_docx_text",
+    "streaming": "app.services.docx_extraction:extract_word_text",
+}
+
+# Runs one extraction in a fresh interpreter and prints how much it raised
+# the peak RSS, in KiB. VmHWM is used rather than ru_maxrss, which a child
+# inherits from the process that started it. Linux only.
+PEAK_SCRIPT = """
+import importlib, re, sys
+def peak():
+    return int(re.search(r"VmHWM:\\s+(\\d+)", open("/proc/self/status").read()).group(1))
+module, name = sys.argv[1].split(":")
+extract = getattr(importlib.import_module(module), name)
+data = open(sys.argv[2], "rb").read()
+before = peak()
+extract(data)
+print(peak() - before)
+"""
+
+
+def peak_growth(target: str, path: str) -> int:
+    output = subprocess.run(
+        [sys.executable, "-c", PEAK_SCRIPT, target, path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return int(output.split()[-1]) * 1024
+
+
+def measure(target: str, data: bytes, path: str, repeat: int) -> Dict:
+    module, name = target.split(":")
+    extract: Callable[[bytes], str] = getattr(importlib.import_module(module), name)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text = extract(data)
+        timings.append(time.perf_counter() - started)
+    return {"seconds": min(timings), "peak_rss_growth_bytes": peak_growth(target, path), "characters": len(text)}
+
+
+def run(paragraphs: int, rows: int, repeat: int, seed: int = 7) -> Dict:
+    rng = random.Random(seed)
+    table = [[f"{n}", *_sentences(rng, 2)] for n in range(rows)]
+    data = make_docx(_sentences(rng, paragraphs), rows=table, header="Confidential", footer="Page")
+    with tempfile.NamedTemporaryFile(suffix=".docx") as file:
+        file.write(data)
+        file.flush()
+        results = {
+            "document_bytes": len(data),
+            **{name: measure(target, data, file.name, repeat) for name, target in EXTRACTORS.items()},
+        }
+    results["speedup"] = results["python_docx"]["seconds"] / results["streaming"]["seconds"]
+    results["memory_ratio"] = (
+        results["python_docx"]["peak_rss_growth_bytes"] / max(1, results["streaming"]["peak_rss_growth_bytes"])
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, default=20000)
+    parser.add_argument("--rows", type=int, default=2000, help="Rows of a three-column table after the text.")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run(args.paragraphs, args.rows, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
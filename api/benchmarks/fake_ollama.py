@@ -0,0 +1,147 @@
+"""
+Stand-in Ollama server for benchmarks and tests.
+
+Answers `/api/chat`, `/api/generate`, `/api/embed` and `/api/tags` like
+Ollama does, with a configurable delay before the first token and a fixed
+token rate, so the API can be load-tested without a GPU.
+
+    python -m benchmarks.fake_ollama --port 11434 --latency 0.2 --token-rate 40
+"""
+
+from typing import Dict, Optional
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+
+from aiohttp import web
+
+WORDS = "the quick brown fox jumps over the lazy dog while the report is summarized".split()
+
+
+class FakeOllama:
+    """
+    aiohttp application emulating Ollama.
+
+    Every reply waits `latency` seconds (prompt evaluation), then produces
+    `tokens` tokens at `token_rate` tokens per second. Final chunks carry
+    `eval_count` and `eval_duration` like the real server.
+    """
+
+    def __init__(self, latency: float = 0.0, token_rate: float = 0.0, tokens: int = 32, embed_dim: int = 32):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.tokens = tokens
+        self.embed_dim = embed_dim
+        self.requests = 0
+        self.last_payload: Optional[Dict] = None
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/api/chat", self.chat)
+        app.router.add_post("/api/generate", self.generate)
+        app.router.add_post("/api/embed", self.embed)
+        app.router.add_get("/api/tags", self.tags)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.url = f"http://{host}:{site._server.sockets[0].getsockname()[1]}"
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def chat(self, request: web.Request) -> web.StreamResponse:
+        return await self._reply(request, lambda token, done: {
+            "message": {"role": "assistant", "content": token}, "done": done,
+        })
+
+    async def generate(self, request: web.Request) -> web.StreamResponse:
+        return await self._reply(request, lambda token, done: {"response": token, "done": done})
+
+    async def embed(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        inputs = payload.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        return web.json_response({"model": payload.get("model"), "embeddings": [self._vector(text) for text in inputs]})
+
+    async def tags(self, request: web.Request) -> web.Response:
+        return web.json_response({"models": [{"name": "fake:latest"}]})
+
+    async def _reply(self, request: web.Request, make_chunk) -> web.StreamResponse:
+        payload = await request.json()
+        model = payload.get("model", "fake")
+        self.requests += 1
+        self.last_payload = payload
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            started = time.monotonic()
+            interval = 1 / self.token_rate if self.token_rate > 0 else 0.0
+            stream = payload.get("stream", True)
+
+            if not stream:
+                await asyncio.sleep(interval * self.tokens)
+                text = "".join(self._token(n) for n in range(self.tokens))
+                return web.json_response({"model": model, **make_chunk(text, True), **self._stats(started)})
+
+            response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+            await response.prepare(request)
+            for n in range(self.tokens):
+                await asyncio.sleep(interval)
+                await response.write(json.dumps({"model": model, **make_chunk(self._token(n), False)}).encode() + b"\n")
+            final = {"model": model, **make_chunk("", True), **self._stats(started)}
+            await response.write(json.dumps(final).encode() + b"\n")
+            await response.write_eof()
+            return response
+        finally:
+            self.in_flight -= 1
+
+    def _stats(self, started: float) -> Dict:
+        return {
+            "eval_count": self.tokens,
+            "eval_duration": max(1, int((time.monotonic() - started) * 1e9)),
+            "prompt_eval_count": 0,
+        }
+
+    @staticmethod
+    def _token(n: int) -> str:
+        return ("" if n == 0 else " ") + WORDS[n % len(WORDS)]
+
+    def _vector(self, text: str):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [(digest[i % len(digest)] - 128) / 128 for i in range(self.embed_dim)]
+
+
+async def _serve(args):
+    server = FakeOllama(latency=args.latency, token_rate=args.token_rate, tokens=args.tokens)
+    url = await server.start(args.host, args.port)
+    print(f"Fake Ollama listening on {url}", flush=True)
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds before the first token.")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Tokens per second (0 = unthrottled).")
+    parser.add_argument("--tokens", type=int, default=64, help="Tokens per reply.")
+    asyncio.run(_serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
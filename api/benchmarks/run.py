@@ -0,0 +1,336 @@
+"""
+Load-test the API end to end and write the results as JSON.
+
+Starts a fake Ollama server, a fake Redis (or uses --redis-url) and the
+API in a subprocess, then drives concurrent Socket.IO `sendMessage`
+clients and `/api/v1/uploadfile/` batches from a generated corpus.
+
+    python -m benchmarks.run --chat-clients 20 --upload-clients 4 --output results.json
+    python -m benchmarks.run --baseline results.json   # compare with an earlier run
+    python -m benchmarks.run --workers 4                 # multi-worker mode behind gunicorn
+"""
+
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import aiohttp
+import socketio
+
+from benchmarks.corpus import build_corpus
+from benchmarks.fake_ollama import FakeOllama
+
+CHAT_NAMESPACE = "/chat-socket"
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile, or None without samples."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": sum(latencies) / len(latencies) if latencies else None,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _peak_rss(pid: int) -> Dict:
+    """Peak RSS (VmHWM) of a process and the sum over its child processes, in bytes."""
+    def hwm(p: int) -> int:
+        try:
+            with open(f"/proc/{p}/status") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+
+    def children(p: int) -> List[int]:
+        try:
+            with open(f"/proc/{p}/task/{p}/children") as f:
+                direct = [int(c) for c in f.read().split()]
+        except OSError:
+            return []
+        return direct + [g for c in direct for g in children(c)]
+
+    return {"server": hwm(pid), "server_children": sum(hwm(c) for c in children(pid))}
+
+
+def start_fake_redis():
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"redis://127.0.0.1:{server.server_address[1]}"
+
+
+async def wait_for_server(url: str, process: subprocess.Popen, workers: int = 1, timeout: float = 60):
+    """Wait until `workers` distinct worker processes report `app_ready 1` on /metrics."""
+    deadline = time.monotonic() + timeout
+    seen = set()
+    connector = aiohttp.TCPConnector(force_close=True)  # new connection each time, to reach every worker
+    async with aiohttp.ClientSession(connector=connector) as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"API server exited with code {process.returncode}")
+            try:
+                async with session.get(f"{url}/metrics") as response:
+                    if response.status == 200:
+                        lines = (await response.text()).splitlines()
+                        if "app_ready 1" in lines:
+                            seen.update(line for line in lines if line.startswith("process_start_time_seconds"))
+                        if len(seen) >= workers:
+                            return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.05 if seen else 0.2)
+    raise RuntimeError("API server did not start in time")
+
+
+async def chat_client(url: str, client_id: int, args, latencies: List[float], ttfts: List[float], errors: List[str]):
+    sio = socketio.AsyncClient(reconnection=False)
+    reply: Optional[asyncio.Future] = None
+    first_token: Optional[float] = None
+
+    @sio.on("messageDelta", namespace=CHAT_NAMESPACE)
+    async def on_delta(data):
+        nonlocal first_token
+        if first_token is None:
+            first_token = time.perf_counter()
+
+    @sio.on("newMessage", namespace=CHAT_NAMESPACE)
+    @sio.on("messageDone", namespace=CHAT_NAMESPACE)
+    async def on_reply(data):
+        if reply is not None and not reply.done():
+            reply.set_result(data)
+
+    @sio.on("error", namespace=CHAT_NAMESPACE)
+    async def on_error(data):
+        if reply is not None and not reply.done():
+            reply.set_exception(RuntimeError(data.get("error", "error")))
+
+    await sio.connect(url, namespaces=[CHAT_NAMESPACE], transports=["websocket"])
+    try:
+        for n in range(args.chat_messages):
+            reply = asyncio.get_running_loop().create_future()
+            first_token = None
+            started = time.perf_counter()
+            await sio.emit("sendMessage", {
+                "conversationId": f"bench-{args.run_id}-{client_id}",
+                "message": {"text": f"Question {n}: summarize the quarterly report.", "attachments": []},
+                "stream": args.stream,
+                "cache": args.cache,
+            }, namespace=CHAT_NAMESPACE)
+            try:
+                await asyncio.wait_for(reply, timeout=args.request_timeout)
+                latencies.append(time.perf_counter() - started)
+                if first_token is not None:
+                    ttfts.append(first_token - started)
+            except Exception as e:
+                errors.append(str(e) or type(e).__name__)
+    finally:
+        await sio.disconnect()
+
+
+async def upload_client(
+    url: str, corpus, client_id: int, args, latencies: List[float], first_results: List[float], errors: List[str]
+):
+    rng = random.Random(args.seed + client_id)
+    endpoint = f"{url}/api/v1/uploadfile/" + ("?mode=stream" if args.upload_stream else "")
+    async with aiohttp.ClientSession() as session:
+        for _ in range(args.upload_batches):
+            form = aiohttp.FormData()
+            for path, mime_type in rng.sample(corpus, min(args.batch_size, len(corpus))):
+                with open(path, "rb") as f:
+                    form.add_field("files", f.read(), filename=os.path.basename(path), content_type=mime_type)
+            started = time.perf_counter()
+            try:
+                timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+                async with session.post(endpoint, data=form, timeout=timeout) as response:
+                    if response.status != 200:
+                        raise RuntimeError(f"HTTP {response.status}")
+                    # Streamed batches: note when the first file's result arrives
+                    first = None
+                    async for _ in response.content:
+                        first = first or time.perf_counter() - started
+                    if args.upload_stream and first is not None:
+                        first_results.append(first)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors.append(str(e) or type(e).__name__)
+
+
+async def run_benchmark(args) -> Dict:
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench-")
+    corpus = build_corpus(os.path.join(work_dir, "corpus"), args.files_per_type, args.seed)
+
+    ollamas = [
+        FakeOllama(latency=args.ollama_latency, token_rate=args.token_rate, tokens=args.tokens)
+        for _ in range(args.ollama_servers)
+    ]
+    ollama_urls = [await ollama.start() for ollama in ollamas]
+
+    redis_server = None
+    redis_url = args.redis_url
+    if not redis_url:
+        redis_server, redis_url = start_fake_redis()
+
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "OLLAMA_URL": ollama_urls[0],
+        "OLLAMA_BACKENDS": ",".join(ollama_urls) if len(ollama_urls) > 1 else "",
+        "OLLAMA_MODEL": "fake",
+        "UPLOAD_DIR": os.path.join(work_dir, "uploads"),
+        "INDEX_DIR": os.path.join(work_dir, "index"),
+        "CELERY_TASK_ALWAYS_EAGER": "true",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.server", "--port", str(port), "--redis-url", redis_url,
+         "--workers", str(args.workers)],
+        env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    results: Dict = {}
+    started = time.perf_counter()
+    try:
+        await wait_for_server(url, process, args.workers)
+        results["startup_seconds"] = time.perf_counter() - started
+
+        if args.chat_clients:
+            latencies, ttfts, errors = [], [], []
+            started = time.perf_counter()
+            await asyncio.gather(*[
+                chat_client(url, n, args, latencies, ttfts, errors) for n in range(args.chat_clients)
+            ])
+            results["chat"] = summarize(latencies, len(errors), time.perf_counter() - started)
+            results["chat"]["ttft_p50"] = percentile(ttfts, 50)
+            results["chat"]["ttft_p95"] = percentile(ttfts, 95)
+            results["chat"]["sample_errors"] = errors[:5]
+
+        if args.upload_clients:
+            latencies, first_results, errors = [], [], []
+            started = time.perf_counter()
+            await asyncio.gather(*[
+                upload_client(url, corpus, n, args, latencies, first_results, errors)
+                for n in range(args.upload_clients)
+            ])
+            elapsed = time.perf_counter() - started
+            results["upload"] = summarize(latencies, len(errors), elapsed)
+            results["upload"]["files_per_second"] = len(latencies) * args.batch_size / elapsed if elapsed else 0.0
+            if args.upload_stream:
+                results["upload"]["first_result_p50"] = percentile(first_results, 50)
+                results["upload"]["first_result_p95"] = percentile(first_results, 95)
+            results["upload"]["sample_errors"] = errors[:5]
+
+        results["peak_rss_bytes"] = _peak_rss(process.pid)
+        results["peak_rss_bytes"]["harness"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        results["ollama"] = [{"requests": ollama.requests, "max_in_flight": ollama.max_in_flight} for ollama in ollamas]
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        for ollama in ollamas:
+            await ollama.stop()
+        if redis_server is not None:
+            redis_server.shutdown()
+            redis_server.server_close()
+    return results
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(current: Dict, baseline: Dict) -> List[str]:
+    """Describe how latency and throughput moved relative to a baseline run."""
+    lines = []
+    for section in ("chat", "upload"):
+        now, before = current["results"].get(section), baseline.get("results", {}).get(section)
+        if not now or not before:
+            continue
+        for key in ("p50", "p95", "p99", "throughput"):
+            if now.get(key) and before.get(key):
+                change = (now[key] - before[key]) / before[key] * 100
+                lines.append(f"{section}.{key}: {before[key]:.4f} -> {now[key]:.4f} ({change:+.1f}%)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chat-clients", type=int, default=20, help="Concurrent Socket.IO clients.")
+    parser.add_argument("--chat-messages", type=int, default=5, help="Messages sent by each chat client.")
+    parser.add_argument("--stream", action="store_true", help="Request streamed replies.")
+    parser.add_argument("--cache", action="store_true", help="Allow answers from the response cache.")
+    parser.add_argument("--upload-clients", type=int, default=4, help="Concurrent upload clients.")
+    parser.add_argument("--upload-batches", type=int, default=3, help="Batches posted by each upload client.")
+    parser.add_argument("--batch-size", type=int, default=4, help="Files per upload batch.")
+    parser.add_argument("--upload-stream", action="store_true", help="Upload with mode=stream (NDJSON results).")
+    parser.add_argument("--files-per-type", type=int, default=4, help="Corpus files generated per type.")
+    parser.add_argument("--ollama-servers", type=int, default=1, help="Fake Ollama servers behind the LLM router.")
+    parser.add_argument("--ollama-latency", type=float, default=0.1, help="Fake Ollama delay before the first token.")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Fake Ollama tokens per second.")
+    parser.add_argument("--tokens", type=int, default=32, help="Tokens per fake reply.")
+    parser.add_argument("--redis-url", help="Use this Redis instead of an in-process fake.")
+    parser.add_argument("--workers", type=int, default=1, help="API worker processes (gunicorn when > 1).")
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--work-dir", help="Directory for the corpus, uploads and index (default: temporary).")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="Earlier results file to compare against.")
+    args = parser.parse_args()
+    args.run_id = int(time.time())
+
+    results = asyncio.run(run_benchmark(args))
+    report = {
+        "commit": _commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "work_dir", "run_id")},
+        "results": results,
+    }
+    with open(args.output, "w") as out:
+        json.dump(report, out, indent=2)
+    print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            for line in compare(report, json.load(f)):
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
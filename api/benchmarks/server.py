@@ -0,0 +1,57 @@
+"""
+Run the API for a benchmark against a given Redis URL.
+
+    python -m benchmarks.server --port 8001 --redis-url redis://127.0.0.1:6379
+    python -m benchmarks.server --port 8001 --redis-url redis://127.0.0.1:6379 --workers 4
+
+With more than one worker the app runs under gunicorn with the repository's
+gunicorn.conf.py and shares Socket.IO rooms through the same Redis.
+"""
+
+import argparse
+import os
+import sys
+
+import uvicorn
+
+BENCH_REDIS_URL = "BENCH_REDIS_URL"
+
+
+def create_app():
+    """App factory used by every worker: point Redis at the benchmark server."""
+    from app.services.redis_service import redis_service
+
+    redis_service.redis_url = os.environ[BENCH_REDIS_URL]
+
+    from app.main import app
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--redis-url", required=True)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    os.environ[BENCH_REDIS_URL] = args.redis_url
+
+    if args.workers <= 1:
+        uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+        return
+
+    os.environ.update({
+        "WEB_CONCURRENCY": str(args.workers),
+        "BIND": f"{args.host}:{args.port}",
+        "SOCKETIO_MESSAGE_QUEUE": os.environ.get("SOCKETIO_MESSAGE_QUEUE") or args.redis_url,
+        "SOCKETIO_TRANSPORTS": "websocket",
+    })
+    os.execvp(sys.executable, [
+        sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+        "--log-level", "warning", "benchmarks.server:create_app()",
+    ])
+
+
+if __name__ == "__main__":
+    main()
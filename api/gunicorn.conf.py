@@ -0,0 +1,19 @@
+# gunicorn.conf.py
+#
+# Multi-worker deployment: gunicorn -c gunicorn.conf.py app.main:app
+# Workers share Socket.IO rooms through SOCKETIO_MESSAGE_QUEUE (Redis), see README.
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Do not preload: each worker must create its own event loop objects,
+# Redis connections and extraction process pool after the fork.
+preload_app = False
+
+# Uvicorn workers stay responsive during long generations, so the timeout
+# only catches hung workers.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
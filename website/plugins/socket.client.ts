@@ -9,6 +9,8 @@ export default defineNuxtPlugin({
       const socketName = `${name}Socket`;
       const socket = io(`${host}/${name}-socket`, {
         autoConnect: true,
+        // WebSocket only: long-polling would need sticky sessions across API workers
+        transports: ['websocket'],
       });
 
       // Provide the socket instance to the app